@@ -0,0 +1,75 @@
+"""
+Point-budget decimation of dense time series for plotting.
+
+``lttb`` implements Largest-Triangle-Three-Buckets, which keeps the
+visual shape of a trace; ``minmax_decimate`` keeps the minimum and
+maximum of every bucket, which preserves spikes exactly. Both return
+indices into the input, which must not contain NaN values.
+"""
+
+import numpy as np
+
+
+def _bucket_edges(n, buckets):
+    """Return bucket boundaries splitting n points into roughly equal runs"""
+    return np.linspace(0, n, buckets + 1).astype(np.int64)
+
+
+def lttb(x, y, n_out):
+    """Return indices of the points kept by Largest-Triangle-Three-Buckets
+
+    The first and last points are always kept; the interior is split
+    into ``n_out - 2`` buckets and from each the point forming the
+    largest triangle with the previously kept point and the mean of the
+    next bucket is chosen.
+    """
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+
+    edges = _bucket_edges(n - 2, n_out - 2) + 1
+    # Mean of every bucket, used as the third triangle vertex
+    sums_x = np.add.reduceat(x[1:n - 1], edges[:-1] - 1)
+    sums_y = np.add.reduceat(y[1:n - 1], edges[:-1] - 1)
+    counts = np.diff(edges)
+    avg_x = np.append(sums_x / counts, x[-1])
+    avg_y = np.append(sums_y / counts, y[-1])
+
+    keep = np.empty(n_out, dtype=np.int64)
+    keep[0] = 0
+    keep[-1] = n - 1
+    a = 0
+    for i in range(n_out - 2):
+        start, stop = edges[i], edges[i + 1]
+        ax, ay = x[a], y[a]
+        area = np.abs((ax - avg_x[i + 1]) * (y[start:stop] - ay)
+                      - (ax - x[start:stop]) * (avg_y[i + 1] - ay))
+        a = start + int(np.argmax(area))
+        keep[i + 1] = a
+    return keep
+
+
+def minmax_decimate(x, y, n_out):
+    """Return indices of the min and max point of each of n_out/2 buckets"""
+    y = np.asarray(y, dtype=np.float64)
+    n = len(y)
+    buckets = max(n_out // 2, 1)
+    if n <= n_out:
+        return np.arange(n)
+
+    edges = _bucket_edges(n, buckets)
+    bucket = np.repeat(np.arange(buckets), np.diff(edges))
+    # Sorting by (bucket, value) puts each bucket's min first and max last
+    order = np.lexsort((y, bucket))
+    return np.unique(np.concatenate((order[edges[:-1]], order[edges[1:] - 1])))
+
+
+def decimate(x, y, n_out, method="lttb"):
+    """Return indices of at most ``n_out`` points chosen by ``method``"""
+    if method == "minmax":
+        return minmax_decimate(x, y, n_out)
+    if method == "lttb":
+        return lttb(x, y, n_out)
+    raise ValueError(f"Unknown decimation method: {method}")
@@ -0,0 +1,213 @@
+#!/usr/bin/env python3
+"""
+HTTP query API over the GPS time-series store.
+
+Serves TPV/SKY/PPS series for a time range, decimated server-side to a
+caller-provided point budget (LTTB or min/max) so a browser never has
+to receive weeks of 1 Hz data. Long ranges of rolled-up metrics are
+answered from the store's rollups. Responses carry an ETag derived from
+the query and the store's contents, are kept in a small in-process
+cache, and are streamed as JSON.
+
+    python gps_api.py --db gps.db --port 5000
+    curl 'http://localhost:5000/api/series/pps?fields=offset_ns&points=1000'
+"""
+
+import argparse
+import hashlib
+import json
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+from flask import Flask, Response, abort, jsonify, request
+from flask_cors import CORS
+
+from decimation import decimate
+from gps_store import METRICS, NSEC_PER_SEC, TABLE_COLUMNS, GpsStore
+
+DEFAULT_POINTS = 2000
+MAX_POINTS = 100000
+
+# Number of decimated responses kept in memory
+RESPONSE_CACHE_SIZE = 128
+
+# Values per chunk when streaming a JSON array
+STREAM_CHUNK = 8192
+
+
+def parse_time_ns(value, default):
+    """Parse a query time given as integer nanoseconds or an ISO 8601 string"""
+    if value is None or value == "":
+        return default
+    try:
+        return int(value)
+    except ValueError:
+        pass
+    try:
+        stamp = pd.Timestamp(value)
+    except ValueError:
+        abort(400, f"Invalid time: {value}")
+    if stamp.tzinfo is None:
+        stamp = stamp.tz_localize("UTC")
+    return int(stamp.as_unit("ns").value)
+
+
+def _json_array(values):
+    """Yield a JSON array in chunks, writing NaN as null"""
+    yield "["
+    for start in range(0, len(values), STREAM_CHUNK):
+        chunk = values[start:start + STREAM_CHUNK]
+        text = ",".join("null" if value != value else repr(value) for value in chunk.tolist())
+        yield ("," if start else "") + text
+    yield "]"
+
+
+def stream_series(header, columns):
+    """Yield a JSON object with header fields and column arrays"""
+    yield json.dumps(header)[:-1]
+    for name, values in columns.items():
+        yield f', "{name}": '
+        yield from _json_array(values)
+    yield "}"
+
+
+class SeriesCache:
+    """Small LRU cache of decimated series keyed by ETag"""
+
+    def __init__(self, size=RESPONSE_CACHE_SIZE):
+        self.size = size
+        self.entries = OrderedDict()
+
+    def get(self, key):
+        entry = self.entries.get(key)
+        if entry is not None:
+            self.entries.move_to_end(key)
+        return entry
+
+    def put(self, key, value):
+        self.entries[key] = value
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.size:
+            self.entries.popitem(last=False)
+
+
+def store_version(store, table):
+    """Return a value that changes whenever the table's contents change"""
+    sources = store.conn.execute("SELECT COUNT(*), MAX(mtime_ns) FROM sources").fetchone()
+    latest = store.conn.execute(f"SELECT MAX(time_ns) FROM {table}").fetchone()
+    return f"{sources[0]}:{sources[1]}:{latest[0]}"
+
+
+def load_series(store, table, fields, start_ns, end_ns, points, method):
+    """Return (header, columns) for a decimated series query"""
+    span = max(end_ns - start_ns, 1)
+    rolled = [field for field in fields if field in METRICS and METRICS[field][0] == table]
+
+    # A single rolled-up metric over a long range is served from the rollups
+    if len(fields) == 1 and rolled and span > points * NSEC_PER_SEC:
+        resolution, frame = store.query_metric(fields[0], start_ns, end_ns, points)
+        value = "value" if resolution == "raw" else "mean"
+        time_ns = frame["time_ns" if resolution == "raw" else "bucket_ns"].to_numpy()
+        keep = np.arange(len(time_ns))
+        if len(time_ns) > points:
+            # Even the coarsest rollup can exceed the budget over a long enough range
+            values = frame[value].to_numpy(dtype=np.float64)
+            finite = np.flatnonzero(np.isfinite(values))
+            keep = finite[decimate(time_ns[finite], values[finite], points, method)]
+        header = {"table": table, "resolution": resolution, "points": int(len(keep)), "total": int(len(time_ns))}
+        if resolution == "raw":
+            return header, {"time_ns": time_ns[keep], fields[0]: frame["value"].to_numpy()[keep]}
+        return header, {
+            "time_ns": time_ns[keep],
+            f"{fields[0]}_min": frame["min"].to_numpy()[keep],
+            f"{fields[0]}_max": frame["max"].to_numpy()[keep],
+            f"{fields[0]}_mean": frame["mean"].to_numpy()[keep],
+            f"{fields[0]}_p99": frame["p99"].to_numpy()[keep],
+        }
+
+    frame = store.query_raw(table, start_ns, end_ns, fields)
+    time_ns = frame["time_ns"].to_numpy()
+    keep = np.arange(len(time_ns))
+    if len(time_ns) > points:
+        # Decimate on the first field; the others are sampled at the same rows
+        values = frame[fields[0]].to_numpy(dtype=np.float64)
+        finite = np.flatnonzero(np.isfinite(values))
+        keep = finite[decimate(time_ns[finite], values[finite], points, method)]
+    columns = {"time_ns": time_ns[keep]}
+    for field in fields:
+        columns[field] = frame[field].to_numpy()[keep]
+    header = {"table": table, "resolution": "raw", "points": int(len(keep)), "total": int(len(time_ns))}
+    return header, columns
+
+
+def create_app(db_path):
+    """Create the Flask application serving the store at ``db_path``"""
+    app = Flask(__name__)
+    CORS(app, expose_headers=["ETag"])
+    cache = SeriesCache()
+
+    def open_store():
+        return GpsStore(db_path)
+
+    @app.route("/api/range")
+    def time_ranges():
+        with open_store() as store:
+            ranges = {table: store.time_range(table) for table in TABLE_COLUMNS}
+        return jsonify({table: None if span is None else {"start_ns": span[0], "end_ns": span[1]}
+                        for table, span in ranges.items()})
+
+    @app.route("/api/series/<table>")
+    def series(table):
+        if table not in TABLE_COLUMNS:
+            abort(404, f"Unknown series: {table}")
+        fields = [field for field in request.args.get("fields", "").split(",") if field]
+        fields = fields or list(TABLE_COLUMNS[table])
+        unknown = [field for field in fields if field not in TABLE_COLUMNS[table]]
+        if unknown:
+            abort(400, f"Unknown fields for {table}: {', '.join(unknown)}")
+        method = request.args.get("method", "lttb")
+        if method not in ("lttb", "minmax"):
+            abort(400, f"Unknown decimation method: {method}")
+        try:
+            points = min(max(int(request.args.get("points", DEFAULT_POINTS)), 3), MAX_POINTS)
+        except ValueError:
+            abort(400, "points must be an integer")
+
+        with open_store() as store:
+            first_last = store.time_range(table) or (0, 0)
+            start_ns = parse_time_ns(request.args.get("start"), first_last[0])
+            end_ns = parse_time_ns(request.args.get("end"), first_last[1] + 1)
+            key = json.dumps([table, fields, start_ns, end_ns, points, method, store_version(store, table)])
+            etag = hashlib.sha1(key.encode("utf-8")).hexdigest()
+
+            if etag in request.if_none_match:
+                return Response(status=304, headers={"ETag": f'"{etag}"'})
+
+            cached = cache.get(etag)
+            if cached is None:
+                cached = load_series(store, table, fields, start_ns, end_ns, points, method)
+                cache.put(etag, cached)
+
+        header, columns = cached
+        header = dict(header, start_ns=start_ns, end_ns=end_ns)
+        response = Response(stream_series(header, columns), mimetype="application/json")
+        response.headers["ETag"] = f'"{etag}"'
+        response.headers["Cache-Control"] = "no-cache"
+        return response
+
+    return app
+
+
+def main(argv=None):
+    """Command line entry point"""
+    parser = argparse.ArgumentParser(description="Serve GPS/PPS series from a gps_store database")
+    parser.add_argument("--db", required=True, help="SQLite database written by gps_store")
+    parser.add_argument("--host", default="127.0.0.1", help="address to listen on")
+    parser.add_argument("--port", type=int, default=5000, help="port to listen on")
+    args = parser.parse_args(argv)
+    create_app(args.db).run(host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,327 @@
+#!/usr/bin/env python3
+"""
+Benchmark the gpsd log pipeline on synthetic captures.
+
+Generates logs of the requested sizes with ``gpsd_synth`` (reusing them
+between runs, since they are deterministic), then times every pipeline
+stage from parsing to rendering the figures. Each stage records wall
+and CPU time, throughput relative to the log size, the peak Python heap
+allocation (tracemalloc, measured in a separate run so it does not skew
+the timings) and the process's peak RSS so far. Results are written as
+JSON that ``--compare`` can diff against a run from another commit.
+
+    python gps_benchmark.py --sizes 1MB,100MB --output before.json
+    python gps_benchmark.py --sizes 1MB,100MB --compare before.json
+"""
+
+import argparse
+import io
+import json
+import os
+import tempfile
+import time
+import tracemalloc
+from collections import namedtuple
+
+import matplotlib
+
+matplotlib.use("Agg")
+
+import matplotlib.pyplot as plt  # noqa: E402
+import numpy as np  # noqa: E402
+
+from gps_mvp_visualize import (  # noqa: E402
+    columns_to_frames,
+    create_combined_visualization,
+    extract_data_from_entries,
+    parse_json_file,
+    plot_aggregate_data,
+    plot_gps_data,
+    plot_sky_analysis,
+    plot_stability,
+)
+from gps_profile import environment, peak_rss_bytes  # noqa: E402
+from gpsd_cache import read_columns_cached  # noqa: E402
+from gpsd_stream import read_columns  # noqa: E402
+from gpsd_synth import format_size, parse_size, write_log  # noqa: E402
+from pps_analysis import analyze_pps  # noqa: E402
+from sketches import summarize_columns  # noqa: E402
+from stability import pps_stability  # noqa: E402
+
+DEFAULT_SIZES = "1MB,10MB,100MB"
+
+# Stages that hold every decoded record as a Python dict; they are skipped
+# above --max-materialize so large runs do not exhaust memory
+MATERIALIZING_STAGES = ("parse_json_file", "extract_data_from_entries")
+
+RESULT_FORMAT = 1
+
+
+def _render(fig):
+    """Draw a figure to an in-memory PNG and close it"""
+    if fig is None:
+        return 0
+    buffer = io.BytesIO()
+    fig.savefig(buffer, format="png", dpi=72)
+    plt.close(fig)
+    return buffer.tell()
+
+
+def _all_data(frames):
+    """Wrap one file's frames in the per-kind lists the aggregate plots take"""
+    df_tpv, df_sky, df_pps = frames
+    return {"tpv": [df_tpv], "sky": [df_sky], "pps": [df_pps]}
+
+
+def _combined(ctx):
+    """Build and render the combined figure for one file"""
+    return _render(create_combined_visualization(ctx["summary"], [(ctx["path"], ctx["frames"])]))
+
+
+def _clear_cache(cache_dir):
+    """Remove every entry of a benchmark cache directory"""
+    for root, dirs, files in os.walk(cache_dir, topdown=False):
+        for name in files:
+            os.remove(os.path.join(root, name))
+        for name in dirs:
+            os.rmdir(os.path.join(root, name))
+
+
+def _clear_cache_dir(ctx):
+    """Stage preparation: start from an empty column cache"""
+    _clear_cache(ctx["cache_dir"])
+
+
+class Stage(namedtuple("Stage", "name run produces requires prepare")):
+    """One benchmarked step: ``run(ctx)`` may store its result as ``ctx[produces]``"""
+
+    def __new__(cls, name, run, produces=None, requires=(), prepare=None):
+        return super().__new__(cls, name, run, produces, requires, prepare)
+
+
+STAGES = [
+    Stage("parse_json_file", lambda ctx: parse_json_file(ctx["path"]), "records"),
+    Stage("extract_data_from_entries", lambda ctx: extract_data_from_entries(ctx["records"]),
+          requires=("records",)),
+    Stage("read_columns", lambda ctx: read_columns(ctx["path"]), "columns"),
+    Stage("read_columns_pps_only", lambda ctx: read_columns(ctx["path"], kinds=("pps",))),
+    Stage("cache_cold", lambda ctx: read_columns_cached(ctx["path"], ctx["cache_dir"]),
+          prepare=_clear_cache_dir),
+    Stage("cache_warm", lambda ctx: read_columns_cached(ctx["path"], ctx["cache_dir"])),
+    Stage("columns_to_frames", lambda ctx: columns_to_frames(ctx["columns"]), "frames",
+          requires=("columns",)),
+    Stage("analyze_pps", lambda ctx: analyze_pps(ctx["columns"]["pps"]), requires=("columns",)),
+    Stage("pps_stability", lambda ctx: pps_stability(ctx["frames"][2]["real_sec"].to_numpy(),
+                                                     ctx["frames"][2]["offset_ns"].to_numpy()),
+          requires=("frames",)),
+    Stage("plot_gps_data", lambda ctx: _render(plot_gps_data(ctx["path"], frames=ctx["frames"])),
+          requires=("frames",)),
+    Stage("summarize_columns", lambda ctx: summarize_columns(ctx["columns"]), "summary",
+          requires=("columns",)),
+    Stage("plot_aggregate_data", lambda ctx: _render(plot_aggregate_data(ctx["summary"])),
+          requires=("summary",)),
+    Stage("plot_stability", lambda ctx: _render(plot_stability(_all_data(ctx["frames"]))),
+          requires=("frames",)),
+    Stage("plot_sky_analysis", lambda ctx: _render(plot_sky_analysis(ctx["columns"]["sat"])),
+          requires=("columns",)),
+    Stage("create_combined_visualization", _combined, requires=("frames", "summary")),
+]
+
+
+def stages_to_run(selected):
+    """Return the selected stage names plus the stages producing their inputs"""
+    if not selected:
+        return {stage.name for stage in STAGES}
+    producers = {stage.produces: stage for stage in STAGES if stage.produces}
+    needed = set()
+    pending = list(selected)
+    while pending:
+        name = pending.pop()
+        if name in needed:
+            continue
+        needed.add(name)
+        stage = next(stage for stage in STAGES if stage.name == name)
+        pending.extend(producers[key].name for key in stage.requires)
+    return needed
+
+
+def measure(function, ctx, repeat=1, memory=True, prepare=None):
+    """Run a stage and return (result, metrics)
+
+    Timings are the best of ``repeat`` runs; the heap peak comes from one
+    extra run under tracemalloc.
+    """
+    walls = []
+    cpus = []
+    result = None
+    for _ in range(max(1, repeat)):
+        if prepare is not None:
+            prepare(ctx)
+        wall = time.perf_counter()
+        cpu = time.process_time()
+        result = function(ctx)
+        cpus.append(time.process_time() - cpu)
+        walls.append(time.perf_counter() - wall)
+        plt.close("all")
+
+    metrics = {
+        "wall_s": min(walls),
+        "wall_median_s": float(np.median(walls)),
+        "cpu_s": min(cpus),
+        "runs": len(walls),
+    }
+    if memory:
+        if prepare is not None:
+            prepare(ctx)
+        tracemalloc.start()
+        try:
+            function(ctx)
+            metrics["peak_alloc_bytes"] = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+            plt.close("all")
+    metrics["max_rss_bytes"] = peak_rss_bytes()
+    return result, metrics
+
+
+def _row_counts(columns):
+    """Return the number of rows per record kind"""
+    return {kind: int(len(next(iter(kind_columns.values()), [])))
+            for kind, kind_columns in columns.items()}
+
+
+def synthetic_log(data_dir, size, satellites, seed, gap_rate, corrupt_rate):
+    """Return the path of a synthetic log, generating it if missing"""
+    name = f"synthetic-{format_size(size)}-sat{satellites}-seed{seed}-gap{gap_rate:g}-bad{corrupt_rate:g}.json"
+    path = os.path.join(data_dir, name)
+    if not os.path.exists(path):
+        print(f"Generating {path}")
+        tmp_path = path + ".tmp"
+        write_log(tmp_path, size, satellites=satellites, seed=seed,
+                  gap_rate=gap_rate, corrupt_rate=corrupt_rate)
+        os.replace(tmp_path, path)
+    return path
+
+
+def run_size(path, label, selected, repeat, memory, max_materialize, cache_dir):
+    """Benchmark the selected stages (all if empty) on one log file
+
+    Stages that only provide inputs for a selected stage are run once
+    and not reported.
+    """
+    size = os.path.getsize(path)
+    needed = stages_to_run(selected)
+    ctx = {"path": path, "cache_dir": cache_dir}
+    results = []
+    for stage in STAGES:
+        if stage.name not in needed:
+            continue
+        if any(key not in ctx for key in stage.requires):
+            continue
+        if stage.name in MATERIALIZING_STAGES and size > max_materialize:
+            results.append({"stage": stage.name, "size": label, "bytes": size, "skipped": "larger than --max-materialize"})
+            continue
+        reported = not selected or stage.name in selected
+        result, metrics = measure(stage.run, ctx, repeat if reported else 1, memory and reported,
+                                  stage.prepare)
+        if stage.produces:
+            ctx[stage.produces] = result
+        if not reported:
+            continue
+        metrics = dict(stage=stage.name, size=label, bytes=size,
+                       mb_per_s=size / (1 << 20) / metrics["wall_s"] if metrics["wall_s"] else None,
+                       **metrics)
+        if stage.name == "read_columns":
+            metrics["rows"] = _row_counts(result)
+        results.append(metrics)
+        print(f"  {stage.name:32s} {metrics['wall_s']:9.3f} s  {metrics['mb_per_s'] or 0:9.1f} MB/s"
+              + (f"  {metrics['peak_alloc_bytes'] / (1 << 20):9.1f} MB peak" if memory else ""))
+    return results
+
+
+def compare(results, baseline):
+    """Print wall time and heap peak ratios against a baseline run"""
+    def key(entry):
+        return entry["size"], entry["stage"]
+
+    before = {key(entry): entry for entry in baseline["results"] if "wall_s" in entry}
+    print(f"\nCompared with {baseline['environment'].get('revision')} "
+          f"({baseline['environment'].get('timestamp')}):")
+    print(f"  {'size':>7s} {'stage':32s} {'time':>9s} {'ratio':>7s} {'memory':>7s}")
+    for entry in results:
+        old = before.get(key(entry))
+        if old is None or "wall_s" not in entry:
+            continue
+        ratio = entry["wall_s"] / old["wall_s"] if old["wall_s"] else float("nan")
+        memory = ""
+        if entry.get("peak_alloc_bytes") and old.get("peak_alloc_bytes"):
+            memory = f"{entry['peak_alloc_bytes'] / old['peak_alloc_bytes']:7.2f}"
+        print(f"  {entry['size']:>7s} {entry['stage']:32s} "
+              f"{entry['wall_s']:9.3f} {ratio:7.2f} {memory:>7s}")
+
+
+def parse_args(argv=None):
+    """Parse command line options"""
+    parser = argparse.ArgumentParser(description="Benchmark the gpsd log pipeline on synthetic logs")
+    parser.add_argument("--sizes", default=DEFAULT_SIZES,
+                        help="comma-separated log sizes to generate (e.g. 1MB,100MB,10GB)")
+    parser.add_argument("--stages", default="",
+                        help="comma-separated stages to run (default all): "
+                             + ", ".join(stage.name for stage in STAGES))
+    parser.add_argument("--repeat", type=int, default=3, help="timed runs per stage (best is kept)")
+    parser.add_argument("--no-memory", action="store_true", help="skip the tracemalloc run")
+    parser.add_argument("--max-materialize", default="1GB",
+                        help="largest log for stages that hold every record in memory")
+    parser.add_argument("--satellites", type=int, default=40, help="satellites per SKY report")
+    parser.add_argument("--gap-rate", type=float, default=1e-4, help="probability per second of an outage")
+    parser.add_argument("--corrupt-rate", type=float, default=1e-4, help="probability per line of corruption")
+    parser.add_argument("--seed", type=int, default=0, help="random seed of the synthetic logs")
+    parser.add_argument("--data-dir", default=os.path.join(tempfile.gettempdir(), "gps-benchmark"),
+                        help="directory where synthetic logs are generated and reused")
+    parser.add_argument("--output", help="write results to this JSON file")
+    parser.add_argument("--compare", metavar="JSON", help="print ratios against an earlier results file")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    """Command line entry point"""
+    args = parse_args(argv)
+    stages = {name for name in args.stages.split(",") if name}
+    unknown = stages - {stage.name for stage in STAGES}
+    if unknown:
+        raise SystemExit(f"Unknown stages: {', '.join(sorted(unknown))}")
+
+    os.makedirs(args.data_dir, exist_ok=True)
+    results = []
+    with tempfile.TemporaryDirectory(prefix="gps-benchmark-cache-") as cache_dir:
+        for size in (parse_size(text) for text in args.sizes.split(",")):
+            path = synthetic_log(args.data_dir, size, args.satellites, args.seed,
+                                 args.gap_rate, args.corrupt_rate)
+            print(f"{format_size(size)}: {path}")
+            results.extend(run_size(path, format_size(size), stages, args.repeat, not args.no_memory,
+                                    parse_size(args.max_materialize), cache_dir))
+
+    report = {
+        "format": RESULT_FORMAT,
+        "environment": environment(),
+        "parameters": {
+            "sizes": args.sizes,
+            "satellites": args.satellites,
+            "gap_rate": args.gap_rate,
+            "corrupt_rate": args.corrupt_rate,
+            "seed": args.seed,
+            "repeat": args.repeat,
+        },
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Wrote {args.output}")
+    if args.compare:
+        with open(args.compare) as f:
+            compare(results, json.load(f))
+
+
+if __name__ == "__main__":
+    main()
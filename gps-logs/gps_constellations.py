@@ -0,0 +1,17 @@
+"""
+GNSS constellation names shared by the live exporter and the SKY analytics.
+
+Kept free of imports so the gpsd client tools can use it without numpy.
+"""
+
+# gnssid values used by gpsd for u-blox receivers
+CONSTELLATIONS = {
+    0: "GPS",
+    1: "SBAS",
+    2: "Galileo",
+    3: "BeiDou",
+    4: "IMES",
+    5: "QZSS",
+    6: "GLONASS",
+    7: "NavIC",
+}
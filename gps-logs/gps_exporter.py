@@ -0,0 +1,240 @@
+#!/usr/bin/env python3
+"""
+Prometheus exporter for gpsd PPS, satellite and fix metrics.
+
+Reads gpsd through the persistent ``gpsd_client`` connection and updates
+metrics as each report arrives: a cumulative histogram of |PPS offset|,
+a ring buffer of recent offsets, per-constellation satellite counts,
+DOPs and fix state. A scrape only formats these fixed-size structures,
+so its cost does not grow with uptime.
+
+``gpsd_up`` and the per-class report age tell a dead receiver from a
+quiet one. Gauges that describe the latest report of a class are only
+exported while the client holds a current report of that class, so
+they disappear when gpsd goes away instead of freezing, and the PPS
+offset window starts over with the new connection.
+
+Serves ``/metrics`` directly, replacing the Telegraf exec hop.
+"""
+
+import argparse
+import asyncio
+import bisect
+import math
+from collections import deque
+
+from gps_constellations import CONSTELLATIONS
+from gpsd_client import (
+    DEFAULT_HOST,
+    DEFAULT_PORT,
+    TRACKED_CLASSES,
+    GpsdClient,
+    GpsdState,
+    timing_offset_ns,
+)
+
+DEFAULT_LISTEN_PORT = 9274
+
+# Upper bounds of the |PPS offset| histogram buckets in seconds
+OFFSET_BUCKETS = (
+    50e-9, 100e-9, 250e-9, 500e-9,
+    1e-6, 2.5e-6, 5e-6, 10e-6, 25e-6, 50e-6, 100e-6, 250e-6,
+    1e-3, 10e-3, 100e-3,
+)
+
+DOP_KEYS = ("hdop", "vdop", "pdop", "tdop", "gdop", "xdop", "ydop")
+
+
+class Histogram:
+    """Cumulative Prometheus-style histogram with fixed buckets"""
+
+    def __init__(self, bounds):
+        self.bounds = tuple(bounds)
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        """Add one observation"""
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def samples(self, name, labels=""):
+        """Return exposition lines for the buckets, sum and count"""
+        lines = []
+        cumulative = 0
+        separator = "," if labels else ""
+        for bound, count in zip(self.bounds, self.counts):
+            cumulative += count
+            lines.append(f'{name}_bucket{{{labels}{separator}le="{bound:g}"}} {cumulative}')
+        lines.append(f'{name}_bucket{{{labels}{separator}le="+Inf"}} {self.count}')
+        suffix = f"{{{labels}}}" if labels else ""
+        lines.append(f"{name}_sum{suffix} {self.sum!r}")
+        lines.append(f"{name}_count{suffix} {self.count}")
+        return lines
+
+
+class GpsMetrics:
+    """Pre-aggregated metrics updated from the reports of a GpsdState"""
+
+    def __init__(self, state, window=300):
+        self.state = state
+        self.offset_histogram = Histogram(OFFSET_BUCKETS)
+        self.recent_offsets = deque(maxlen=window)
+        self.last_offset = None
+        self.last_toff = None
+        self.reports = {}
+        self.fix_mode = 0
+        self.position = {}
+        self.dops = {}
+        self.visible = {}
+        self.used = {}
+        state.listeners.append(self.update)
+        state.clear_listeners.append(self.reset)
+
+    def reset(self):
+        """Forget the per-connection PPS state (the window must not span a gpsd outage)"""
+        self.recent_offsets.clear()
+        self.last_offset = None
+        self.last_toff = None
+
+    def update(self, record):
+        """Fold one gpsd report into the metrics"""
+        entry_class = record.get("class")
+        self.reports[entry_class] = self.reports.get(entry_class, 0) + 1
+        if entry_class == "PPS":
+            offset = timing_offset_ns(record) / 1e9
+            self.offset_histogram.observe(abs(offset))
+            self.recent_offsets.append(offset)
+            self.last_offset = offset
+        elif entry_class == "TOFF":
+            self.last_toff = timing_offset_ns(record) / 1e9
+        elif entry_class == "TPV":
+            self.fix_mode = record.get("mode", 0)
+            self.position = {key: record[key] for key in ("lat", "lon", "alt", "eph", "epv")
+                             if record.get(key) is not None}
+        elif entry_class == "SKY":
+            self.dops = {key: record[key] for key in DOP_KEYS if record.get(key) is not None}
+            satellites = record.get("satellites")
+            if satellites:
+                visible = {}
+                used = {}
+                for sat in satellites:
+                    name = CONSTELLATIONS.get(sat.get("gnssid"), "unknown")
+                    visible[name] = visible.get(name, 0) + 1
+                    used[name] = used.get(name, 0) + (1 if sat.get("used") else 0)
+                self.visible = visible
+                self.used = used
+
+    def _current(self, entry_class):
+        """Whether the client holds a report of a class from the current connection"""
+        return self.state.age(entry_class) is not None
+
+    def render(self):
+        """Return the metrics in Prometheus text exposition format"""
+        lines = []
+
+        def metric(name, kind, help_text, samples):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            lines.extend(samples)
+
+        metric("gpsd_up", "gauge", "Whether the gpsd connection is up",
+               [f"gpsd_up {1 if self.state.connected else 0}"])
+        ages = {cls: self.state.age(cls) for cls in TRACKED_CLASSES}
+        metric("gps_report_age_seconds", "gauge", "Seconds since the last report of each class",
+               [f'gps_report_age_seconds{{class="{cls}"}} {age:.3f}'
+                for cls, age in ages.items() if age is not None])
+        metric("gps_reports_total", "counter", "gpsd reports received by class",
+               [f'gps_reports_total{{class="{cls}"}} {count}' for cls, count in sorted(self.reports.items())])
+        metric("gps_pps_offset_abs_seconds", "histogram",
+               "Absolute system clock offset at each PPS edge",
+               self.offset_histogram.samples("gps_pps_offset_abs_seconds"))
+        if self.last_offset is not None and self._current("PPS"):
+            metric("gps_pps_offset_seconds", "gauge", "System clock offset at the last PPS edge",
+                   [f"gps_pps_offset_seconds {self.last_offset!r}"])
+            recent = self.recent_offsets
+            mean = sum(recent) / len(recent)
+            rms = math.sqrt(sum(value * value for value in recent) / len(recent))
+            metric("gps_pps_offset_window_seconds", "gauge",
+                   f"PPS offset statistics over the last {recent.maxlen} pulses",
+                   [f'gps_pps_offset_window_seconds{{stat="mean"}} {mean!r}',
+                    f'gps_pps_offset_window_seconds{{stat="rms"}} {rms!r}',
+                    f'gps_pps_offset_window_seconds{{stat="min"}} {min(recent)!r}',
+                    f'gps_pps_offset_window_seconds{{stat="max"}} {max(recent)!r}'])
+        if self.last_toff is not None and self._current("TOFF"):
+            metric("gps_toff_offset_seconds", "gauge", "System clock offset at the last serial time report",
+                   [f"gps_toff_offset_seconds {self.last_toff!r}"])
+        metric("gps_fix_mode", "gauge", "gpsd fix mode (0 unknown, 1 none, 2 2D, 3 3D)",
+               [f"gps_fix_mode {self.fix_mode if self._current('TPV') else 0}"])
+        if self.position and self._current("TPV"):
+            metric("gps_position", "gauge", "Latest TPV position and error estimates",
+                   [f'gps_position{{field="{key}"}} {value!r}' for key, value in self.position.items()])
+        if self.dops and self._current("SKY"):
+            metric("gps_dop", "gauge", "Dilution of precision from the latest SKY report",
+                   [f'gps_dop{{type="{key}"}} {value!r}' for key, value in self.dops.items()])
+        if self.visible and self._current("SKY"):
+            metric("gps_satellites_visible", "gauge", "Visible satellites per constellation",
+                   [f'gps_satellites_visible{{constellation="{name}"}} {count}'
+                    for name, count in sorted(self.visible.items())])
+            metric("gps_satellites_used", "gauge", "Satellites used in the fix per constellation",
+                   [f'gps_satellites_used{{constellation="{name}"}} {count}'
+                    for name, count in sorted(self.used.items())])
+        return "\n".join(lines) + "\n"
+
+
+async def _handle_scrape(metrics, reader, writer):
+    """Answer one HTTP request with the current metrics"""
+    try:
+        request_line = await reader.readline()
+        # Drain the headers; the request body (if any) is ignored
+        while (await reader.readline()) not in (b"\r\n", b"\n", b""):
+            pass
+        parts = request_line.split()
+        if len(parts) >= 2 and parts[0] == b"GET" and parts[1].split(b"?")[0] == b"/metrics":
+            status = "200 OK"
+            body = metrics.render().encode("utf-8")
+        else:
+            status = "404 Not Found"
+            body = b"Metrics are served at /metrics\n"
+        writer.write(
+            f"HTTP/1.0 {status}\r\n"
+            "Content-Type: text/plain; version=0.0.4; charset=utf-8\r\n"
+            f"Content-Length: {len(body)}\r\n\r\n".encode("ascii") + body
+        )
+        await writer.drain()
+    finally:
+        writer.close()
+
+
+async def serve(host, port, listen_host, listen_port, window=300):
+    """Run the gpsd client and the /metrics HTTP server"""
+    state = GpsdState()
+    metrics = GpsMetrics(state, window)
+    client = GpsdClient(state, host, port)
+    server = await asyncio.start_server(
+        lambda reader, writer: _handle_scrape(metrics, reader, writer), listen_host, listen_port)
+    async with server:
+        await asyncio.gather(client.run(), server.serve_forever())
+
+
+def main(argv=None):
+    """Command line entry point"""
+    parser = argparse.ArgumentParser(description="Export gpsd metrics for Prometheus")
+    parser.add_argument("--host", default=DEFAULT_HOST, help="gpsd host")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help="gpsd port")
+    parser.add_argument("--listen", default="0.0.0.0", help="address to serve /metrics on")
+    parser.add_argument("--listen-port", type=int, default=DEFAULT_LISTEN_PORT,
+                        help="port to serve /metrics on")
+    parser.add_argument("--window", type=int, default=300,
+                        help="number of recent PPS pulses kept for window statistics")
+    args = parser.parse_args(argv)
+    try:
+        asyncio.run(serve(args.host, args.port, args.listen, args.listen_port, args.window))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,422 @@
+#!/usr/bin/env python3
+"""
+Fleet mode: collect gpsd logs from many time servers and compare them.
+
+Each host has a log root, either a local directory or an rsync source
+(``[user@]host:path``). Roots are mirrored into a per-host directory
+under the fleet directory, concurrently and incrementally: only files
+whose size or modification time changed are copied, and copies keep
+their mtime so the column cache still recognises files parsed before.
+All hosts' logs are then parsed in one process pool and summarised per
+host side by side: PPS offset and stability, satellites used and DOP.
+
+Hosts come from ``--host NAME=ROOT`` options or the Ansible inventory,
+where ``gps_log_root`` (default ``~/captures``) sets the remote log directory and
+``pps_source`` labels the PPS wiring (e.g. ``gpio18`` or ``macpin``) so
+setups can be compared:
+
+    python gps_fleet.py --inventory ../ptp-time-server/ansible/inventory.ini
+    python gps_fleet.py --host pi1=/srv/logs/pi1 --host pi2=/srv/logs/pi2 --output-dir fleet
+"""
+
+import argparse
+import glob
+import json
+import os
+import shlex
+import shutil
+import subprocess
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import matplotlib.pyplot as plt
+
+from gps_profile import stage
+from gpsd_cache import DEFAULT_CACHE_DIR
+from gpsd_capture import CAPTURE_SUFFIXES, INDEX_SUFFIX
+from gpsd_ingest import default_workers, ingest_files
+from gpsd_stream import collect_columns
+from pps_analysis import analyze_pps, pps_offset_ns, summarize_offsets
+from sky_analysis import constellation_name, constellation_usage
+from stability import pps_stability
+
+DEFAULT_FLEET_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".fleet")
+
+# Where save_almanac.sh records capture segments on each host
+DEFAULT_REMOTE_ROOT = "~/captures"
+
+# Plain logs and capture segments are read; segment indexes are mirrored alongside
+LOG_SUFFIXES = (".json",) + tuple(CAPTURE_SUFFIXES.values())
+LOG_PATTERNS = tuple(f"*{suffix}" for suffix in LOG_SUFFIXES)
+SYNC_PATTERNS = LOG_PATTERNS + tuple(f"*{suffix}{INDEX_SUFFIX}" for suffix in CAPTURE_SUFFIXES.values())
+
+# Concurrent host transfers (network bound, so threads are enough)
+DEFAULT_SYNC_JOBS = 4
+
+# Averaging times reported in the comparison table
+REPORT_TAUS = (1, 10, 100, 1000)
+
+HostSource = namedtuple("HostSource", ["name", "root", "label", "ssh_key"])
+
+
+def read_inventory(inventory_path):
+    """Return the hosts of an Ansible INI inventory as HostSources
+
+    Hosts are read from the plain group sections (and any lines before
+    the first section); ``[group:vars]`` sections supply defaults for the
+    hosts of that group (``all`` for every host) and ``[group:children]``
+    sections are skipped. The SSH target is built from ``ansible_host``
+    and ``ansible_user``; ``gps_log_root`` and ``pps_source`` are optional
+    host variables.
+    """
+    host_vars = {}
+    host_groups = {}
+    group_vars = {}
+    section = None
+    with open(inventory_path) as f:
+        for line in f:
+            line = line.split("#", 1)[0].split(";", 1)[0].strip()
+            if not line:
+                continue
+            if line.startswith("["):
+                section = line.strip("[]").strip()
+                continue
+            group, _, kind = (section or "").partition(":")
+            if kind == "vars":
+                key, sep, value = line.partition("=")
+                if sep:
+                    group_vars.setdefault(group, {})[key.strip()] = value.strip().strip("\"'")
+                continue
+            if kind:
+                continue
+            name, *assignments = shlex.split(line)
+            host_vars.setdefault(name, {}).update(item.split("=", 1) for item in assignments if "=" in item)
+            host_groups.setdefault(name, []).append(group)
+
+    hosts = []
+    for name, own_vars in host_vars.items():
+        merged = dict(group_vars.get("all", {}))
+        for group in host_groups[name]:
+            merged.update(group_vars.get(group, {}))
+        merged.update(own_vars)
+        address = merged.get("ansible_host", name)
+        if "ansible_user" in merged:
+            address = f"{merged['ansible_user']}@{address}"
+        root = f"{address}:{merged.get('gps_log_root', DEFAULT_REMOTE_ROOT)}"
+        hosts.append(HostSource(name, root, merged.get("pps_source", ""),
+                                merged.get("ansible_ssh_private_key_file")))
+    return hosts
+
+
+def parse_host(spec, labels=None):
+    """Return a HostSource from a ``NAME=ROOT`` command line value"""
+    name, sep, root = spec.partition("=")
+    if not sep or not name or not root:
+        raise argparse.ArgumentTypeError(f"expected NAME=ROOT, got {spec!r}")
+    return HostSource(name, root, (labels or {}).get(name, ""), None)
+
+
+def is_remote(root):
+    """Return True if a root is an rsync ``host:path`` source rather than a directory"""
+    head, sep, _ = root.partition(":")
+    return bool(sep) and "/" not in head and not os.path.exists(root)
+
+
+def _find_files(root, patterns):
+    """Return the files under ``root`` matching any of ``patterns``, sorted"""
+    return sorted({path for pattern in patterns
+                   for path in glob.glob(os.path.join(root, "**", pattern), recursive=True)})
+
+
+def _sync_local(root, mirror_dir):
+    """Copy new or changed logs from a local root, returning their mirror paths"""
+    changed = []
+    for source_path in _find_files(root, SYNC_PATTERNS):
+        relative = os.path.relpath(source_path, root)
+        target_path = os.path.join(mirror_dir, relative)
+        source = os.stat(source_path)
+        try:
+            target = os.stat(target_path)
+            if target.st_size == source.st_size and target.st_mtime_ns == source.st_mtime_ns:
+                continue
+        except FileNotFoundError:
+            pass
+        os.makedirs(os.path.dirname(target_path), exist_ok=True)
+        tmp_path = target_path + ".part"
+        shutil.copy2(source_path, tmp_path)
+        os.replace(tmp_path, target_path)
+        if target_path.endswith(LOG_SUFFIXES):
+            changed.append(target_path)
+    return changed
+
+
+def _sync_rsync(source, mirror_dir):
+    """Pull new or changed logs with rsync, returning their mirror paths"""
+    command = (["rsync", "-a", "--prune-empty-dirs", "--include=*/"]
+               + [f"--include={pattern}" for pattern in SYNC_PATTERNS] + ["--exclude=*", "--out-format=%n"])
+    if source.ssh_key:
+        command += ["-e", f"ssh -i {shlex.quote(os.path.expanduser(source.ssh_key))}"]
+    command += [source.root.rstrip("/") + "/", mirror_dir + "/"]
+    output = subprocess.run(command, capture_output=True, text=True, check=True).stdout
+    return [os.path.join(mirror_dir, name) for name in output.splitlines() if name.endswith(LOG_SUFFIXES)]
+
+
+def sync_host(source, fleet_dir):
+    """Bring a host's mirror up to date, returning (mirror dir, changed files, error)"""
+    mirror_dir = os.path.join(fleet_dir, source.name)
+    os.makedirs(mirror_dir, exist_ok=True)
+    try:
+        if is_remote(source.root):
+            changed = _sync_rsync(source, mirror_dir)
+        else:
+            changed = _sync_local(os.path.expanduser(source.root), mirror_dir)
+    except (OSError, subprocess.CalledProcessError) as e:
+        detail = getattr(e, "stderr", None) or e
+        return mirror_dir, [], str(detail).strip()
+    return mirror_dir, changed, None
+
+
+def sync_fleet(sources, fleet_dir, jobs=DEFAULT_SYNC_JOBS):
+    """Sync every host concurrently, returning {host name: mirror dir}
+
+    A host that cannot be reached keeps its previous mirror, so the
+    comparison still covers the data collected so far.
+    """
+    with ThreadPoolExecutor(max_workers=max(1, jobs)) as pool:
+        outcomes = list(pool.map(lambda source: sync_host(source, fleet_dir), sources))
+    mirrors = {}
+    for source, (mirror_dir, changed, error) in zip(sources, outcomes):
+        if error is not None:
+            print(f"Error syncing {source.name} from {source.root}: {error}")
+        else:
+            print(f"{source.name}: {len(changed)} new or changed files")
+        mirrors[source.name] = mirror_dir
+    return mirrors
+
+
+def mirror_files(mirror_dir):
+    """Return the logs held in a host mirror, sorted"""
+    return _find_files(mirror_dir, LOG_PATTERNS)
+
+
+def _at_taus(stability, name, taus=REPORT_TAUS):
+    """Return {tau: value} of a stability curve at the report averaging times
+
+    Curves are computed at octave averaging times, so values in between
+    are interpolated log-log; taus outside the measured range are left out.
+    """
+    valid = np.isfinite(stability[name]) & (stability[name] > 0)
+    tau = stability["tau"][valid]
+    if not len(tau):
+        return {}
+    log_values = np.log(stability[name][valid])
+    return {str(t): float(np.exp(np.interp(np.log(t), np.log(tau), log_values)))
+            for t in taus if tau[0] <= t <= tau[-1]}
+
+
+def host_summary(columns):
+    """Return (summary dict, stability curves) of one host's merged columns"""
+    summary = {}
+    stability = None
+    pps = columns["pps"]
+    if len(pps["real_sec"]):
+        timing = analyze_pps(pps)
+        summary["pps"] = summarize_offsets(timing["offset_ns"])
+        jitter = timing["jitter_ns"][np.isfinite(timing["jitter_ns"])]
+        summary["pps"]["jitter_std_ns"] = float(jitter.std()) if len(jitter) else None
+        span = int((timing["edge_ns"][-1] - timing["edge_ns"][0]) // 1_000_000_000) + 1
+        summary["pps"]["missing"] = span - len(timing["edge_ns"])
+        stability = pps_stability(pps["real_sec"], pps_offset_ns(pps["real_sec"], pps["real_nsec"],
+                                                                  pps["clock_sec"], pps["clock_nsec"]))
+        summary["adev"] = _at_taus(stability, "adev")
+        summary["tdev_ns"] = {tau: value * 1e9 for tau, value in _at_taus(stability, "tdev").items()}
+
+    sky = columns["sky"]
+    if len(sky["uSat"]):
+        summary["sky"] = {
+            "reports": int(len(sky["uSat"])),
+            "mean_used": float(np.mean(sky["uSat"])),
+            "mean_visible": float(np.mean(sky["nSat"])),
+            "mean_hdop": float(np.nanmean(sky["hdop"])) if np.isfinite(sky["hdop"]).any() else None,
+        }
+    tpv = columns["tpv"]
+    if len(tpv["mode"]):
+        summary["fix_3d_ratio"] = float(np.mean(tpv["mode"] >= 3))
+    if len(columns["sat"]["gnssid"]):
+        usage = constellation_usage(columns["sat"])
+        summary["constellations"] = {constellation_name(gnssid): float(used)
+                                     for gnssid, used in zip(usage["gnssid"], usage["used"])}
+    return summary, stability
+
+
+def compare_fleet(sources, mirrors, workers=None, cache_dir=None):
+    """Parse every host's mirror in one pool and summarise each host
+
+    Returns {host name: (summary, stability)} in source order.
+    """
+    files = {source.name: mirror_files(mirrors[source.name]) for source in sources}
+    all_files = [path for source in sources for path in files[source.name]]
+    parsed = dict(ingest_files(all_files, workers, cache_dir))
+
+    results = {}
+    for source in sources:
+        with stage("fleet_summary"):
+            host_columns = collect_columns((kind, parsed[path][kind])
+                                           for path in files[source.name] if path in parsed
+                                           for kind in ("tpv", "sky", "pps", "sat"))
+            summary, stability = host_summary(host_columns)
+        summary["files"] = len(files[source.name])
+        summary["label"] = source.label
+        results[source.name] = (summary, stability)
+    return results
+
+
+def _host_label(name, summary):
+    """Return a host's display name including its PPS source label"""
+    return f"{name} ({summary['label']})" if summary.get("label") else name
+
+
+def _fmt(value, spec):
+    """Format a table value, showing missing values as a dash"""
+    return format(value, spec) if value is not None else "-"
+
+
+def print_comparison(results):
+    """Print one row of key metrics per host"""
+    print(f"{'host':24s} {'files':>5s} {'pulses':>8s} {'missing':>7s} {'rms ns':>8s} {'p99 ns':>8s} "
+          f"{'jitter':>7s} {'ADEV 1s':>9s} {'ADEV 100s':>9s} {'used':>5s} {'hdop':>5s}")
+    for name, (summary, _) in results.items():
+        pps = summary.get("pps", {})
+        sky = summary.get("sky", {})
+        adev = summary.get("adev", {})
+        print(f"{_host_label(name, summary):24s} {summary['files']:5d} {_fmt(pps.get('count'), '8d')} "
+              f"{_fmt(pps.get('missing'), '7d')} {_fmt(pps.get('rms_ns'), '8.0f')} "
+              f"{_fmt(pps.get('p99_abs_ns'), '8.0f')} {_fmt(pps.get('jitter_std_ns'), '7.0f')} "
+              f"{_fmt(adev.get('1'), '9.2e')} {_fmt(adev.get('100'), '9.2e')} "
+              f"{_fmt(sky.get('mean_used'), '5.1f')} {_fmt(sky.get('mean_hdop'), '5.2f')}")
+
+
+def plot_fleet(results):
+    """Plot the hosts' PPS stability and satellite statistics side by side"""
+    if not results:
+        print("No hosts to compare")
+        return None
+
+    fig, axes = plt.subplots(2, 2, figsize=(15, 10))
+    fig.suptitle("Fleet Comparison", fontsize=16)
+    names = list(results)
+    labels = [_host_label(name, results[name][0]) for name in names]
+    positions = np.arange(len(names))
+
+    ax = axes[0, 0]
+    ax2 = axes[0, 1]
+    for label, name in zip(labels, names):
+        stability = results[name][1]
+        if stability is not None and len(stability["tau"]):
+            ax.loglog(stability["tau"], stability["adev"], marker="o", label=label)
+            ax2.loglog(stability["tau"], stability["tdev"] * 1e9, marker="o", label=label)
+    ax.set_title("Allan Deviation")
+    ax.set_xlabel("Averaging Time τ (s)")
+    ax.set_ylabel("ADEV")
+    ax2.set_title("Time Deviation")
+    ax2.set_xlabel("Observation Interval τ (s)")
+    ax2.set_ylabel("TDEV (nanoseconds)")
+    for axis in (ax, ax2):
+        if axis.lines:
+            axis.legend()
+        axis.grid(True, which="both")
+
+    ax = axes[1, 0]
+    width = 0.4
+    pps = [results[name][0].get("pps", {}) for name in names]
+    ax.bar(positions - width / 2, [p.get("median_abs_ns", np.nan) for p in pps], width, label="median |offset|")
+    ax.bar(positions + width / 2, [p.get("p99_abs_ns", np.nan) for p in pps], width, label="p99 |offset|")
+    ax.set_title("PPS Offset")
+    ax.set_ylabel("Offset (nanoseconds)")
+    ax.set_xticks(positions, labels, rotation=20, ha="right")
+    ax.legend()
+    ax.grid(True, axis="y")
+
+    ax = axes[1, 1]
+    sky = [results[name][0].get("sky", {}) for name in names]
+    ax.bar(positions - width / 2, [s.get("mean_visible", np.nan) for s in sky], width, label="visible")
+    ax.bar(positions + width / 2, [s.get("mean_used", np.nan) for s in sky], width, label="used")
+    ax.set_title("Satellites per SKY Report")
+    ax.set_ylabel("Satellites")
+    ax.set_xticks(positions, labels, rotation=20, ha="right")
+    ax.legend()
+    ax.grid(True, axis="y")
+
+    fig.tight_layout(rect=[0, 0, 1, 0.95])  # Adjust for the suptitle
+
+    return fig
+
+
+def parse_args(argv=None):
+    """Parse command line options"""
+    parser = argparse.ArgumentParser(description="Collect and compare gpsd logs across time servers")
+    parser.add_argument("--host", metavar="NAME=ROOT", action="append", default=[],
+                        help="host log root: a local directory or rsync [user@]host:path (repeatable)")
+    parser.add_argument("--label", metavar="NAME=LABEL", action="append", default=[],
+                        help="PPS source label of a --host, e.g. pi1=gpio18 (repeatable)")
+    parser.add_argument("--inventory", help="Ansible INI inventory listing the hosts")
+    parser.add_argument("--fleet-dir", default=DEFAULT_FLEET_DIR,
+                        help="directory holding one mirror of each host's logs")
+    parser.add_argument("--no-sync", action="store_true",
+                        help="compare the mirrors as they are without contacting the hosts")
+    parser.add_argument("--jobs", type=int, default=DEFAULT_SYNC_JOBS,
+                        help="hosts synced at the same time")
+    parser.add_argument("--workers", type=int, default=default_workers(),
+                        help="number of worker processes used to parse log files")
+    parser.add_argument("--cache-dir", default=DEFAULT_CACHE_DIR,
+                        help="directory for cached parsed columns")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="always re-parse log files instead of using the cache")
+    parser.add_argument("--report", metavar="JSON", help="write the per-host summaries to this file")
+    parser.add_argument("--output-dir", metavar="DIR",
+                        help="save the comparison figure to DIR instead of showing it")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    """Command line entry point"""
+    args = parse_args(argv)
+    labels = dict(spec.split("=", 1) for spec in args.label if "=" in spec)
+    sources = read_inventory(args.inventory) if args.inventory else []
+    sources += [parse_host(spec, labels) for spec in args.host]
+    if not sources:
+        print("No hosts given; use --host NAME=ROOT or --inventory")
+        return
+
+    if args.no_sync:
+        mirrors = {source.name: os.path.join(args.fleet_dir, source.name) for source in sources}
+    else:
+        with stage("fleet_sync", records=len(sources)):
+            mirrors = sync_fleet(sources, args.fleet_dir, args.jobs)
+
+    results = compare_fleet(sources, mirrors, args.workers, None if args.no_cache else args.cache_dir)
+    print_comparison(results)
+
+    if args.report:
+        with open(args.report, "w") as f:
+            json.dump({name: summary for name, (summary, _) in results.items()}, f, indent=2)
+        print(f"Wrote {args.report}")
+
+    if args.output_dir:
+        plt.switch_backend("Agg")
+    fig = plot_fleet(results)
+    if fig is None:
+        return
+    if args.output_dir:
+        os.makedirs(args.output_dir, exist_ok=True)
+        out_path = os.path.join(args.output_dir, "fleet.png")
+        fig.savefig(out_path)
+        plt.close(fig)
+        print(f"Wrote {out_path}")
+    else:
+        plt.show()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,100 +1,207 @@
-import json
 import os
 import glob
+import argparse
 import pandas as pd
 import numpy as np
 import matplotlib.pyplot as plt
-from datetime import datetime
 from matplotlib.dates import DateFormatter
 
-def parse_json_file(file_path):
-    """Parse a JSON file containing GPS data line by line"""
+from decimation import minmax_decimate
+from gpsd_capture import CAPTURE_SUFFIXES
+from gpsd_cache import DEFAULT_CACHE_DIR, read_columns_cached, read_summary_cached
+from gpsd_follow import follow
+from gps_render import DEFAULT_DPI, append_image_pages, open_pdf, render_pages, save_figure
+from gps_profile import Profiler, print_summary, record_error, stage
+from gps_store import GpsStore
+from gpsd_ingest import default_workers, ingest_files, row_count
+from gpsd_stream import collect_columns, iter_column_chunks, iter_records, read_columns
+from pps_analysis import analyze_pps
+from sketches import merge_summaries
+from sky_analysis import cn0_vs_elevation, constellation_name, constellation_usage, sky_heatmap
+from stability import pps_stability
+from survey import SurveyEstimator, fix_heights, local_offsets
+from timejoin import pps_context
+from timing_logs import clock_chain, read_chrony_logs, read_ptp_logs
+
+# Points per line trace drawn in per-file panels; denser traces are decimated
+DEFAULT_MAX_POINTS = 5000
+
+def parse_json_file(file_path, start_ns=None, end_ns=None):
+    """Parse a JSON file (or capture segment) containing GPS data line by line
+
+    ``start_ns``/``end_ns`` (epoch nanoseconds) limit the records to a
+    time range; capture segments then only decompress the chunks in it.
+    """
     try:
-        with open(file_path) as f:
-            # Try to parse as line-by-line JSON
-            try:
-                data = [json.loads(line) for line in f if line.strip()]
-                if not data:  # If no data was parsed, try as a single JSON object
-                    f.seek(0)
-                    data = json.load(f)
-                    if isinstance(data, dict):
-                        data = [data]
-            except json.JSONDecodeError:
-                # Try as a single JSON object
-                f.seek(0)
-                data = json.load(f)
-                if isinstance(data, dict):
-                    data = [data]
-        return data
+        return list(iter_records(file_path, start_ns=start_ns, end_ns=end_ns))
     except Exception as e:
         print(f"Error parsing {file_path}: {e}")
         return []
 
 def extract_data_from_entries(data):
     """Extract relevant fields from GPS data entries"""
-    tpv_data = []
-    sky_data = []
-    pps_jitter_ns = []
+    return columns_to_frames(collect_columns(iter_column_chunks(
+        entry for entry in data if isinstance(entry, dict))))
 
-    for entry in data:
-        if isinstance(entry, dict):  # Ensure entry is a dictionary
-            entry_class = entry.get("class", "")
-            
-            if entry_class == "TPV" and "lat" in entry and "lon" in entry:
-                tpv_data.append({
-                    "time": entry.get("time", ""),
-                    "lat": entry.get("lat", 0),
-                    "lon": entry.get("lon", 0),
-                    "alt": entry.get("alt", 0),
-                    "eph": entry.get("eph", 0),  # Horizontal position error
-                    "epv": entry.get("epv", 0)   # Vertical position error
-                })
-            elif entry_class == "SKY":
-                sky_data.append({
-                    "time": entry.get("time", ""),
-                    "nSat": entry.get("nSat", 0),
-                    "uSat": entry.get("uSat", 0),
-                    "hdop": entry.get("hdop", 0),
-                    "vdop": entry.get("vdop", 0),
-                    "pdop": entry.get("pdop", 0)
-                })
-            elif entry_class == "PPS":
-                jitter = abs(entry.get("clock_nsec", 0) - 0)
-                pps_jitter_ns.append({
-                    "real_sec": entry.get("real_sec", 0),
-                    "jitter_ns": jitter
-                })
-
-    # Convert to DataFrames
-    df_tpv = pd.DataFrame(tpv_data)
-    df_sky = pd.DataFrame(sky_data)
-    df_pps = pd.DataFrame(pps_jitter_ns)
-    
-    # Convert time strings to datetime objects for TPV and SKY data
-    if not df_tpv.empty and "time" in df_tpv.columns:
-        try:
-            df_tpv["datetime"] = pd.to_datetime(df_tpv["time"])
-        except:
-            print("Could not parse TPV time data")
-    
-    if not df_sky.empty and "time" in df_sky.columns:
-        try:
-            df_sky["datetime"] = pd.to_datetime(df_sky["time"])
-        except:
-            print("Could not parse SKY time data")
+def load_gps_data(file_path, cache_dir=None):
+    """Stream a GPS log file into TPV, SKY and PPS DataFrames"""
+    if cache_dir:
+        return columns_to_frames(read_columns_cached(file_path, cache_dir))
+    return columns_to_frames(read_columns(file_path))
+
+def columns_to_frames(columns):
+    """Build TPV, SKY and PPS DataFrames from parsed column arrays"""
+    tpv = columns["tpv"]
+    sky = columns["sky"]
+    pps = columns["pps"]
+
+    df_tpv = pd.DataFrame(tpv) if len(tpv["time"]) else pd.DataFrame()
+    df_sky = pd.DataFrame(sky) if len(sky["time"]) else pd.DataFrame()
+    df_pps = pd.DataFrame()
+    if len(pps["real_sec"]):
+        timing = analyze_pps(pps)
+        df_pps = pd.DataFrame({
+            "real_sec": timing["edge_ns"] // 1_000_000_000,
+            "offset_ns": timing["offset_ns"],
+            "jitter_ns": timing["jitter_ns"],
+            "tie_ns": timing["tie_ns"]
+        })
+    
+    # The epoch index parsed with the records doubles as the datetime column
+    # (missing times become NaT)
+    for df in (df_tpv, df_sky):
+        if not df.empty and "time_ns" in df.columns:
+            df["datetime"] = pd.to_datetime(df["time_ns"].to_numpy(), utc=True)
     
     return df_tpv, df_sky, df_pps
 
-def plot_gps_data(file_path, all_data=None):
-    """Plot GPS data from a single file"""
+def _decimated(x, y, max_points):
+    """Return (x, y) reduced to about ``max_points`` points keeping every spike
+
+    Traces already within the budget (or with ``max_points`` of 0) are
+    returned unchanged.
+    """
+    y = np.asarray(y)
+    if not max_points or len(y) <= max_points:
+        return x, y
+    x = np.asarray(x)
+    finite = np.flatnonzero(np.isfinite(y.astype(np.float64)))
+    keep = finite[minmax_decimate(None, y[finite], max_points)]
+    return x[keep], y[keep]
+
+def _plot_trace(ax, x, y, max_points, **kwargs):
+    """Plot one line trace, decimated to the point budget"""
+    x, y = _decimated(x, y, max_points)
+    return ax.plot(x, y, **kwargs)
+
+def _sky_time(df_sky):
+    """Return the x values of SKY panels: datetimes if parsed, else the row index"""
+    if "time_ns" in df_sky.columns:
+        # Naive datetime64 (UTC); a tz-aware column would convert to Timestamp objects
+        return df_sky["time_ns"].to_numpy().view("datetime64[ns]")
+    return df_sky.index.to_numpy()
+
+def draw_location_panel(ax, df_tpv, max_points=DEFAULT_MAX_POINTS):
+    """Draw the density of GPS fixes around the file's surveyed position
+
+    A hexbin of east/north offsets stays readable (and cheap to draw) for
+    millions of fixes, where a marker per fix would not.
+    """
+    tpv = {name: df_tpv[name].to_numpy() for name in df_tpv.columns}
+    position = SurveyEstimator().update(tpv).position()
+    if position is None:
+        # No 3D fixes: centre on the median fix instead
+        lat, lon = np.nanmedian(tpv["lat"]), np.nanmedian(tpv["lon"])
+        height = np.nan_to_num(np.nanmedian(fix_heights(tpv)))
+    else:
+        lat, lon, height = position["lat"], position["lon"], position["height"]
+    east, north, _ = local_offsets(tpv, lat, lon, height)
+    valid = np.isfinite(east) & np.isfinite(north)
+    density = ax.hexbin(east[valid], north[valid], gridsize=40, bins="log", mincnt=1, cmap="viridis")
+    ax.figure.colorbar(density, ax=ax, label="Fixes")
+    ax.plot(0, 0, marker="+", color="r", markersize=12, label="Survey estimate")
+    ax.set_aspect("equal", adjustable="datalim")
+    title = "GPS Fix Density"
+    if position is not None:
+        title += f" (σh {position['sigma_h']:.2f} m)"
+    ax.set_title(title)
+    ax.set_xlabel("East (m)")
+    ax.set_ylabel("North (m)")
+    ax.legend(loc="upper right")
+    ax.grid(True)
+
+def draw_satellite_panel(ax, df_sky, max_points=DEFAULT_MAX_POINTS):
+    """Draw total and used satellite counts over time"""
+    x = _sky_time(df_sky)
+    _plot_trace(ax, x, df_sky["nSat"].to_numpy(), max_points, label="Total Satellites")
+    _plot_trace(ax, x, df_sky["uSat"].to_numpy(), max_points, label="Used Satellites")
+    if "datetime" in df_sky.columns:
+        ax.xaxis.set_major_formatter(DateFormatter('%H:%M:%S'))
+    ax.set_title("Satellite Count Over Time")
+    ax.set_xlabel("Time")
+    ax.set_ylabel("Number of Satellites")
+    ax.legend()
+    ax.grid(True)
+
+def draw_pps_panel(ax, df_pps, max_points=DEFAULT_MAX_POINTS):
+    """Draw the PPS offset and period jitter over time"""
+    x = df_pps["real_sec"].to_numpy()
+    _plot_trace(ax, x, df_pps["offset_ns"].to_numpy(), max_points, label="Offset")
+    _plot_trace(ax, x, df_pps["jitter_ns"].to_numpy(), max_points, label="Period Jitter")
+    ax.set_title("PPS Offset Over Time")
+    ax.set_xlabel("Real Time (s)")
+    ax.set_ylabel("Offset (nanoseconds)")
+    ax.legend()
+    ax.grid(True)
+
+def draw_dop_panel(ax, df_sky, max_points=DEFAULT_MAX_POINTS):
+    """Draw HDOP, VDOP and PDOP over time"""
+    x = _sky_time(df_sky)
+    for column, label in (("hdop", "HDOP"), ("vdop", "VDOP"), ("pdop", "PDOP")):
+        if column in df_sky.columns:
+            _plot_trace(ax, x, df_sky[column].to_numpy(), max_points, label=label)
+    if "datetime" in df_sky.columns:
+        ax.xaxis.set_major_formatter(DateFormatter('%H:%M:%S'))
+    ax.set_title("Dilution of Precision (DOP) Values")
+    ax.set_xlabel("Time")
+    ax.set_ylabel("DOP Value")
+    ax.legend()
+    ax.grid(True)
+
+def file_panels(frames):
+    """Return the (position, draw function, frame) of each per-file panel with data
+
+    Positions 0-3 are location, satellite count, PPS offset and DOP.
+    """
+    df_tpv, df_sky, df_pps = frames
+    panels = []
+    if not df_tpv.empty and "lon" in df_tpv.columns and "lat" in df_tpv.columns:
+        panels.append((0, draw_location_panel, df_tpv))
+    if not df_sky.empty and "nSat" in df_sky.columns and "uSat" in df_sky.columns:
+        panels.append((1, draw_satellite_panel, df_sky))
+    if not df_pps.empty and "offset_ns" in df_pps.columns:
+        panels.append((2, draw_pps_panel, df_pps))
+    if not df_sky.empty and "hdop" in df_sky.columns and "vdop" in df_sky.columns:
+        panels.append((3, draw_dop_panel, df_sky))
+    return panels
+
+def plot_gps_data(file_path, all_data=None, cache_dir=None, frames=None,
+                  max_points=DEFAULT_MAX_POINTS):
+    """Plot GPS data from a single file
+
+    ``frames`` takes already loaded (df_tpv, df_sky, df_pps) DataFrames so
+    the file is not parsed again. Dense traces are decimated to about
+    ``max_points`` points per line (0 plots every point).
+    """
     print(f"Processing file: {os.path.basename(file_path)}")
-    data = parse_json_file(file_path)
-    
-    if not data:
-        print(f"No data found in {file_path}")
-        return None
-    
-    df_tpv, df_sky, df_pps = extract_data_from_entries(data)
+    if frames is not None:
+        df_tpv, df_sky, df_pps = frames
+    else:
+        try:
+            df_tpv, df_sky, df_pps = load_gps_data(file_path, cache_dir)
+        except Exception as e:
+            print(f"Error parsing {file_path}: {e}")
+            return None
     
     # Store data for aggregation if needed
     if all_data is not None:
@@ -111,157 +218,87 @@ def plot_gps_data(file_path, all_data=None):
     fig = plt.figure(figsize=(15, 12))
     fig.suptitle(f"GPS Data Visualization - {os.path.basename(file_path)}", fontsize=16)
     
-    # Plot 1: GPS Location (if data exists)
-    if not df_tpv.empty and "lon" in df_tpv.columns and "lat" in df_tpv.columns:
-        ax1 = fig.add_subplot(2, 2, 1)
-        ax1.plot(df_tpv["lon"], df_tpv["lat"], marker="o", linestyle="-", markersize=3)
-        ax1.set_title("GPS Location Trace")
-        ax1.set_xlabel("Longitude")
-        ax1.set_ylabel("Latitude")
-        ax1.grid(True)
-        
-        # Add error bars if available
-        if "eph" in df_tpv.columns and df_tpv["eph"].notna().any():
-            # Sample every 10th point to avoid cluttering
-            sample_idx = np.arange(0, len(df_tpv), 10)
-            if len(sample_idx) > 0:
-                ax1.errorbar(
-                    df_tpv.iloc[sample_idx]["lon"], 
-                    df_tpv.iloc[sample_idx]["lat"],
-                    xerr=df_tpv.iloc[sample_idx]["eph"] / 111000,  # Approximate conversion to degrees
-                    yerr=df_tpv.iloc[sample_idx]["eph"] / 111000,
-                    fmt='none', ecolor='r', alpha=0.3
-                )
-    
-    # Plot 2: Satellite Count (if data exists)
-    if not df_sky.empty and "nSat" in df_sky.columns and "uSat" in df_sky.columns:
-        ax2 = fig.add_subplot(2, 2, 2)
-        
-        if "datetime" in df_sky.columns:
-            ax2.plot(df_sky["datetime"], df_sky["nSat"], label="Total Satellites")
-            ax2.plot(df_sky["datetime"], df_sky["uSat"], label="Used Satellites")
-            ax2.xaxis.set_major_formatter(DateFormatter('%H:%M:%S'))
-        else:
-            # If datetime conversion failed, use index
-            ax2.plot(df_sky.index, df_sky["nSat"], label="Total Satellites")
-            ax2.plot(df_sky.index, df_sky["uSat"], label="Used Satellites")
-        
-        ax2.set_title("Satellite Count Over Time")
-        ax2.set_xlabel("Time")
-        ax2.set_ylabel("Number of Satellites")
-        ax2.legend()
-        ax2.grid(True)
-    
-    # Plot 3: PPS Jitter (if data exists)
-    if not df_pps.empty and "jitter_ns" in df_pps.columns:
-        ax3 = fig.add_subplot(2, 2, 3)
-        ax3.plot(df_pps["real_sec"], df_pps["jitter_ns"])
-        ax3.set_title("PPS Jitter Over Time")
-        ax3.set_xlabel("Real Time (s)")
-        ax3.set_ylabel("Jitter (nanoseconds)")
-        ax3.grid(True)
-    
-    # Plot 4: DOP Values (if data exists)
-    if not df_sky.empty and "hdop" in df_sky.columns and "vdop" in df_sky.columns:
-        ax4 = fig.add_subplot(2, 2, 4)
-        
-        if "datetime" in df_sky.columns:
-            ax4.plot(df_sky["datetime"], df_sky["hdop"], label="HDOP")
-            ax4.plot(df_sky["datetime"], df_sky["vdop"], label="VDOP")
-            if "pdop" in df_sky.columns:
-                ax4.plot(df_sky["datetime"], df_sky["pdop"], label="PDOP")
-            ax4.xaxis.set_major_formatter(DateFormatter('%H:%M:%S'))
-        else:
-            # If datetime conversion failed, use index
-            ax4.plot(df_sky.index, df_sky["hdop"], label="HDOP")
-            ax4.plot(df_sky.index, df_sky["vdop"], label="VDOP")
-            if "pdop" in df_sky.columns:
-                ax4.plot(df_sky.index, df_sky["pdop"], label="PDOP")
-        
-        ax4.set_title("Dilution of Precision (DOP) Values")
-        ax4.set_xlabel("Time")
-        ax4.set_ylabel("DOP Value")
-        ax4.legend()
-        ax4.grid(True)
+    for position, draw, frame in file_panels((df_tpv, df_sky, df_pps)):
+        draw(fig.add_subplot(2, 2, position + 1), frame, max_points)
     
-    plt.tight_layout(rect=[0, 0, 1, 0.96])  # Adjust for the suptitle
+    fig.tight_layout(rect=[0, 0, 1, 0.96])  # Adjust for the suptitle
     
     return fig
 
-def plot_aggregate_data(all_data):
-    """Plot aggregate statistics from all files"""
-    # Combine all dataframes
-    combined_tpv = pd.concat(all_data["tpv"]) if all_data["tpv"] else pd.DataFrame()
-    combined_sky = pd.concat(all_data["sky"]) if all_data["sky"] else pd.DataFrame()
-    combined_pps = pd.concat(all_data["pps"]) if all_data["pps"] else pd.DataFrame()
-    
-    if combined_tpv.empty and combined_sky.empty and combined_pps.empty:
-        print("No data available for aggregate plots")
-        return None
-    
-    # Create a figure with subplots for aggregate data
-    fig = plt.figure(figsize=(15, 12))
-    fig.suptitle("Aggregate GPS Data Visualization", fontsize=16)
+def _draw_stat_lines(ax, metric, fmt):
+    """Mark a metric's mean and (sketched) median on a histogram"""
+    ax.axvline(metric.moments.mean, color='r', linestyle='--', label=f'Mean: {metric.moments.mean:{fmt}}')
+    ax.axvline(metric.median, color='g', linestyle='-.', label=f'Median: {metric.median:{fmt}}')
+    ax.legend()
+
+def _digest_hist(ax, metric, bins, **kwargs):
+    """Histogram a metric from its t-digest centroids, weighted by size"""
+    ax.hist(metric.digest.means, bins=bins, range=(metric.moments.min, metric.moments.max),
+            weights=metric.digest.weights, **kwargs)
+
+def _box_stats(metric, label):
+    """Box plot statistics of a metric from its sketch (whiskers at 1.5 IQR)"""
+    q1, median, q3 = metric.quantile([0.25, 0.5, 0.75])
+    spread = 1.5 * (q3 - q1)
+    return {"label": label, "q1": q1, "med": median, "q3": q3, "mean": metric.moments.mean,
+            "whislo": max(q1 - spread, metric.moments.min), "whishi": min(q3 + spread, metric.moments.max),
+            "fliers": []}
+
+def draw_aggregate_panels(axes, summary, stats_table=True):
+    """Draw the four aggregate statistics panels onto ``axes``
+
+    ``summary`` is the merged per-file summary of ``sketches``, so the
+    panels never need every file's records at once. ``axes`` is a
+    sequence of four Axes; panels without data are left empty.
+    ``stats_table`` adds the DOP statistics table below panel 3.
+    """
+    ax1, ax2, ax3, ax4 = axes
     
     # Plot 1: Satellite Usage Statistics
-    if not combined_sky.empty and "nSat" in combined_sky.columns and "uSat" in combined_sky.columns:
-        ax1 = fig.add_subplot(2, 2, 1)
-        
-        # Calculate satellite usage ratio
-        if not combined_sky["nSat"].empty and (combined_sky["nSat"] > 0).any():
-            combined_sky["usage_ratio"] = combined_sky["uSat"] / combined_sky["nSat"]
-            
-            # Create histogram of satellite usage ratio
-            ax1.hist(combined_sky["usage_ratio"], bins=20, alpha=0.7)
-            ax1.set_title("Satellite Usage Ratio Distribution")
-            ax1.set_xlabel("Ratio of Used to Total Satellites")
-            ax1.set_ylabel("Frequency")
-            ax1.grid(True)
-            
-            # Add mean and median lines
-            mean_ratio = combined_sky["usage_ratio"].mean()
-            median_ratio = combined_sky["usage_ratio"].median()
-            ax1.axvline(mean_ratio, color='r', linestyle='--', label=f'Mean: {mean_ratio:.2f}')
-            ax1.axvline(median_ratio, color='g', linestyle='-.', label=f'Median: {median_ratio:.2f}')
-            ax1.legend()
-    
-    # Plot 2: PPS Jitter Statistics
-    if not combined_pps.empty and "jitter_ns" in combined_pps.columns:
-        ax2 = fig.add_subplot(2, 2, 2)
+    usage = summary["usage_ratio"]
+    if usage.count and usage.histogram is not None:
+        # Fixed-bin histogram of the satellite usage ratio
+        ax1.stairs(usage.histogram.counts, usage.histogram.edges, fill=True, alpha=0.7)
+        ax1.set_title("Satellite Usage Ratio Distribution")
+        ax1.set_xlabel("Ratio of Used to Total Satellites")
+        ax1.set_ylabel("Frequency")
+        ax1.grid(True)
         
-        # Create histogram of jitter values
-        ax2.hist(combined_pps["jitter_ns"], bins=30, alpha=0.7)
-        ax2.set_title("PPS Jitter Distribution")
-        ax2.set_xlabel("Jitter (nanoseconds)")
+        # Add mean and median lines
+        _draw_stat_lines(ax1, usage, ".2f")
+    
+    # Plot 2: PPS Offset Statistics
+    offset = summary["offset_ns"]
+    if offset.count:
+        # Create histogram of offset values
+        _digest_hist(ax2, offset, 30, alpha=0.7)
+        ax2.set_title("PPS Offset Distribution")
+        ax2.set_xlabel("Offset (nanoseconds)")
         ax2.set_ylabel("Frequency")
         ax2.grid(True)
         
         # Add mean and median lines
-        mean_jitter = combined_pps["jitter_ns"].mean()
-        median_jitter = combined_pps["jitter_ns"].median()
-        ax2.axvline(mean_jitter, color='r', linestyle='--', label=f'Mean: {mean_jitter:.2f}')
-        ax2.axvline(median_jitter, color='g', linestyle='-.', label=f'Median: {median_jitter:.2f}')
-        ax2.legend()
+        _draw_stat_lines(ax2, offset, ".2f")
     
     # Plot 3: DOP Values Box Plot
-    if not combined_sky.empty:
-        dop_columns = [col for col in ["hdop", "vdop", "pdop"] if col in combined_sky.columns]
-        if dop_columns:
-            ax3 = fig.add_subplot(2, 2, 3)
-            combined_sky[dop_columns].boxplot(ax=ax3)
-            ax3.set_title("DOP Values Distribution")
-            ax3.set_ylabel("DOP Value")
-            ax3.grid(True)
-            
+    dop_metrics = [name for name in ["hdop", "vdop", "pdop"] if summary[name].count]
+    if dop_metrics:
+        ax3.bxp([_box_stats(summary[name], name) for name in dop_metrics], showfliers=False)
+        ax3.set_title("DOP Values Distribution")
+        ax3.set_ylabel("DOP Value")
+        ax3.grid(True)
+        
+        if stats_table:
             # Add a table with statistics
             stats_data = []
-            for col in dop_columns:
+            for name in dop_metrics:
+                metric = summary[name]
                 stats_data.append([
-                    col.upper(),
-                    f"{combined_sky[col].mean():.2f}",
-                    f"{combined_sky[col].median():.2f}",
-                    f"{combined_sky[col].min():.2f}",
-                    f"{combined_sky[col].max():.2f}"
+                    name.upper(),
+                    f"{metric.moments.mean:.2f}",
+                    f"{metric.median:.2f}",
+                    f"{metric.moments.min:.2f}",
+                    f"{metric.moments.max:.2f}"
                 ])
             
             ax3.table(
@@ -273,195 +310,450 @@ def plot_aggregate_data(all_data):
             ax3.set_xlabel("")  # Remove x-label as table provides context
     
     # Plot 4: Position Error Statistics
-    if not combined_tpv.empty:
-        error_columns = [col for col in ["eph", "epv"] if col in combined_tpv.columns]
-        if error_columns:
-            ax4 = fig.add_subplot(2, 2, 4)
-            
-            for col in error_columns:
-                if combined_tpv[col].notna().any():
-                    label = "Horizontal Error" if col == "eph" else "Vertical Error"
-                    ax4.hist(combined_tpv[col], bins=20, alpha=0.5, label=label)
-            
-            ax4.set_title("Position Error Distribution")
-            ax4.set_xlabel("Error (meters)")
-            ax4.set_ylabel("Frequency")
-            ax4.legend()
-            ax4.grid(True)
+    error_metrics = [name for name in ["eph", "epv"] if summary[name].count]
+    if error_metrics:
+        for name in error_metrics:
+            label = "Horizontal Error" if name == "eph" else "Vertical Error"
+            _digest_hist(ax4, summary[name], 20, alpha=0.5, label=label)
+        
+        ax4.set_title("Position Error Distribution")
+        ax4.set_xlabel("Error (meters)")
+        ax4.set_ylabel("Frequency")
+        ax4.legend()
+        ax4.grid(True)
     
-    plt.tight_layout(rect=[0, 0, 1, 0.96])  # Adjust for the suptitle
+    # Hide panels that had no data
+    for ax in axes:
+        if not ax.has_data():
+            ax.set_axis_off()
+
+def plot_aggregate_data(summary):
+    """Plot aggregate statistics from the merged summary of all files"""
+    if not any(metric.count for metric in summary.values()):
+        print("No data available for aggregate plots")
+        return None
+    
+    # Create a figure with subplots for aggregate data
+    fig = plt.figure(figsize=(15, 12))
+    fig.suptitle("Aggregate GPS Data Visualization", fontsize=16)
+    draw_aggregate_panels([fig.add_subplot(2, 2, i) for i in range(1, 5)], summary)
+    
+    fig.tight_layout(rect=[0, 0, 1, 0.96])  # Adjust for the suptitle
     
     return fig
 
-def create_combined_visualization(all_data, individual_data_figures):
-    """Create a single figure containing all visualizations"""
-    if not individual_data_figures:
-        print("No data to visualize")
+def plot_stability(all_data):
+    """Plot ADEV/MDEV/TDEV/MTIE of the PPS offsets from all files"""
+    frames = [df for df in all_data["pps"] if not df.empty and "offset_ns" in df.columns]
+    if not frames:
+        print("No PPS data available for stability plots")
+        return None
+    
+    stability = pps_stability(
+        np.concatenate([df["real_sec"].to_numpy() for df in frames]),
+        np.concatenate([df["offset_ns"].to_numpy() for df in frames])
+    )
+    if not len(stability["tau"]):
+        print("Not enough contiguous PPS data for stability plots")
+        return None
+    
+    fig = plt.figure(figsize=(15, 6))
+    fig.suptitle("PPS Clock Stability", fontsize=16)
+    tau = stability["tau"]
+    
+    # Plot 1: Frequency stability (dimensionless)
+    ax1 = fig.add_subplot(1, 2, 1)
+    ax1.loglog(tau, stability["adev"], marker="o", label="ADEV")
+    ax1.loglog(tau, stability["mdev"], marker="s", label="MDEV")
+    ax1.set_title("Allan / Modified Allan Deviation")
+    ax1.set_xlabel("Averaging Time \u03c4 (s)")
+    ax1.set_ylabel("Deviation")
+    ax1.legend()
+    ax1.grid(True, which="both")
+    
+    # Plot 2: Time stability (nanoseconds)
+    ax2 = fig.add_subplot(1, 2, 2)
+    ax2.loglog(tau, stability["tdev"] * 1e9, marker="o", label="TDEV")
+    ax2.loglog(tau, stability["mtie"] * 1e9, marker="s", label="MTIE")
+    ax2.set_title("Time Deviation / MTIE")
+    ax2.set_xlabel("Observation Interval \u03c4 (s)")
+    ax2.set_ylabel("Time Error (nanoseconds)")
+    ax2.legend()
+    ax2.grid(True, which="both")
+    
+    plt.tight_layout(rect=[0, 0, 1, 0.93])  # Adjust for the suptitle
+    
+    return fig
+
+def plot_sky_analysis(sat):
+    """Plot per-satellite C/N0, constellation usage and a sky-plot heatmap"""
+    if not len(sat["gnssid"]):
+        print("No per-satellite data available for sky plots")
+        return None
+    
+    fig = plt.figure(figsize=(18, 6))
+    fig.suptitle("Per-Satellite Signal Analysis", fontsize=16)
+    
+    # Plot 1: C/N0 vs elevation per constellation
+    ax1 = fig.add_subplot(1, 3, 1)
+    curves = cn0_vs_elevation(sat)
+    for gnssid in np.unique(curves["gnssid"]):
+        mask = curves["gnssid"] == gnssid
+        ax1.plot(curves["elevation"][mask], curves["mean_ss"][mask], marker="o",
+                 markersize=3, label=constellation_name(gnssid))
+    ax1.set_title("C/N0 vs Elevation")
+    ax1.set_xlabel("Elevation (degrees)")
+    ax1.set_ylabel("Mean C/N0 (dB-Hz)")
+    ax1.legend()
+    ax1.grid(True)
+    
+    # Plot 2: Visible vs used satellites per constellation
+    ax2 = fig.add_subplot(1, 3, 2)
+    usage = constellation_usage(sat)
+    names = [constellation_name(gnssid) for gnssid in usage["gnssid"]]
+    positions = np.arange(len(names))
+    ax2.bar(positions - 0.2, usage["visible"], width=0.4, label="Visible")
+    ax2.bar(positions + 0.2, usage["used"], width=0.4, label="Used")
+    ax2.set_xticks(positions)
+    ax2.set_xticklabels(names)
+    ax2.set_title("Satellites per Constellation")
+    ax2.set_ylabel("Average Satellites per SKY Report")
+    ax2.legend()
+    ax2.grid(True, axis="y")
+    
+    # Plot 3: Sky plot of mean C/N0 (north up, zenith at the centre)
+    ax3 = fig.add_subplot(1, 3, 3, projection="polar")
+    az_edges, el_edges, counts, mean_ss = sky_heatmap(sat)
+    ax3.set_theta_zero_location("N")
+    ax3.set_theta_direction(-1)
+    mesh = ax3.pcolormesh(np.radians(az_edges), 90 - el_edges,
+                          np.ma.masked_invalid(mean_ss), shading="flat")
+    ax3.set_ylim(0, 90)
+    ax3.set_yticks([0, 30, 60, 90])
+    ax3.set_yticklabels(["90", "60", "30", "0"])
+    ax3.set_title("Sky Plot: Mean C/N0 (dB-Hz)")
+    fig.colorbar(mesh, ax=ax3, pad=0.1)
+    
+    plt.tight_layout(rect=[0, 0, 1, 0.93])  # Adjust for the suptitle
+    
+    return fig
+
+# Links of the timing chain: (column, panel title)
+CLOCK_CHAIN_LINKS = [
+    ("pps_ns", "GPS \u2192 PPS: System Clock Offset at PPS Edge (gpsd)"),
+    ("sysclock_ns", "PPS \u2192 System Clock: chrony Tracking Offset"),
+    ("phc_ns", "System Clock \u2192 PHC: phc2sys Offset"),
+    ("ptp_ns", "PHC \u2192 PTP: ptp4l Master Offset"),
+]
+
+def plot_clock_chain(chain, max_points=DEFAULT_MAX_POINTS):
+    """Plot every link of the GPS -> PPS -> system clock -> PHC -> PTP chain on one time axis"""
+    if chain is None or not len(chain["time_ns"]):
+        print("No PPS data available for the clock chain plot")
+        return None
+    
+    fig, axes = plt.subplots(len(CLOCK_CHAIN_LINKS), 1, figsize=(15, 12), sharex=True)
+    fig.suptitle("Timing Chain Error", fontsize=16)
+    time = chain["time_ns"].astype("datetime64[ns]")
+    for ax, (column, title) in zip(axes, CLOCK_CHAIN_LINKS):
+        values = chain[column]
+        finite = values[np.isfinite(values)]
+        if len(finite):
+            label = f"mean {finite.mean():.1f} ns, std {finite.std():.1f} ns"
+            _plot_trace(ax, time, values, max_points, label=label)
+            ax.legend(loc="upper right")
+        else:
+            ax.text(0.5, 0.5, "No data", ha="center", va="center", transform=ax.transAxes)
+        ax.set_title(title)
+        ax.set_ylabel("Offset (ns)")
+        ax.grid(True)
+    axes[-1].set_xlabel("Time (UTC)")
+    
+    fig.tight_layout(rect=[0, 0, 1, 0.96])  # Adjust for the suptitle
+    
+    return fig
+
+def _binned_abs_offset(ax, keys, offset_ns, xlabel, label=None):
+    """Plot mean and spread of |offset| per integer key (e.g. satellites used)"""
+    valid = np.isfinite(keys) & np.isfinite(offset_ns)
+    if not valid.any():
+        ax.text(0.5, 0.5, "No data", ha="center", va="center", transform=ax.transAxes)
         return
+    keys = keys[valid].astype(np.int64)
+    base = keys.min()
+    keys -= base
+    magnitude = np.abs(offset_ns[valid])
+    count = np.bincount(keys)
+    total = np.bincount(keys, weights=magnitude)
+    squares = np.bincount(keys, weights=magnitude ** 2)
+    present = count > 0
+    mean = total[present] / count[present]
+    std = np.sqrt(np.maximum(squares[present] / count[present] - mean ** 2, 0))
+    x = np.flatnonzero(present) + base
+    ax.errorbar(x, mean, yerr=std, fmt="o-", capsize=3, label=label)
+    ax.set_xlabel(xlabel)
+
+def plot_pps_context(context):
+    """Plot PPS offset against the satellite geometry reported at each pulse"""
+    if context is None or not len(context["edge_ns"]):
+        print("No PPS data available for the geometry plot")
+        return None
     
-    # Calculate total number of rows needed
-    # 4 rows for aggregate data + 4 rows for each individual file
-    total_files = len(individual_data_figures)
-    total_rows = 4 + (4 * total_files)
+    fig, axes = plt.subplots(1, 2, figsize=(15, 6))
+    fig.suptitle("PPS Offset vs Satellite Geometry", fontsize=16)
+    offset_ns = context["offset_ns"].astype(np.float64)
+    
+    _binned_abs_offset(axes[0], context["uSat"], offset_ns, "Satellites used", "At the pulse")
+    _binned_abs_offset(axes[0], context["uSat_window_min"], offset_ns, "Satellites used",
+                       "Minimum over the last minute")
+    axes[0].set_title("|PPS offset| by satellites used (mean ± std)")
+    axes[0].set_ylabel("|Offset| (ns)")
+    axes[0].legend()
+    axes[0].grid(True)
+    
+    # HDOP in tenths so it bins like an integer key
+    _binned_abs_offset(axes[1], np.round(context["hdop"] * 10), offset_ns, "HDOP (x0.1)", "At the pulse")
+    _binned_abs_offset(axes[1], np.round(context["hdop_window_mean"] * 10), offset_ns, "HDOP (x0.1)",
+                       "Mean over the last minute")
+    axes[1].set_title("|PPS offset| by HDOP (mean ± std)")
+    axes[1].set_ylabel("|Offset| (ns)")
+    axes[1].legend()
+    axes[1].grid(True)
+    
+    fig.tight_layout(rect=[0, 0, 1, 0.95])  # Adjust for the suptitle
     
-    # Create a large figure to hold all plots
-    plt.figure(figsize=(15, 5 * total_rows // 4))
+    return fig
+
+def plot_survey(estimator):
+    """Plot how the surveyed antenna position and its uncertainty converge"""
+    position = estimator.position() if estimator is not None else None
+    if position is None:
+        print("No TPV fixes available for the survey plot")
+        return None
     
-    # Current row counter
-    current_row = 1
+    curve = estimator.curve()
+    time = pd.to_datetime(curve["time_ns"], utc=True)
+    fig, axes = plt.subplots(2, 1, figsize=(15, 10), sharex=True)
+    fig.suptitle(f"Antenna Position Survey: {position['lat']:.7f}, {position['lon']:.7f}, "
+                 f"{position['height']:.2f} m ({position['accepted']} fixes, {position['rejected']} rejected)",
+                 fontsize=14)
+    
+    for name in ("east", "north", "up"):
+        axes[0].plot(time, curve[name], label=name.capitalize())
+    axes[0].set_title("Estimate relative to the final position")
+    axes[0].set_ylabel("Offset (m)")
+    axes[0].legend()
+    axes[0].grid(True)
+    
+    axes[1].semilogy(time, curve["sigma_h"], label="Horizontal")
+    axes[1].semilogy(time, curve["sigma_v"], label="Vertical")
+    axes[1].set_title("Uncertainty of the estimate (1σ)")
+    axes[1].set_xlabel("Time")
+    axes[1].set_ylabel("Sigma (m)")
+    axes[1].legend()
+    axes[1].grid(True, which="both")
+    axes[1].xaxis.set_major_formatter(DateFormatter("%m-%d %H:%M"))
+    
+    fig.tight_layout(rect=[0, 0, 1, 0.95])  # Adjust for the suptitle
     
-    # First, add the aggregate data at the top
-    plt.figtext(0.5, 1 - (0.5 / total_rows), "AGGREGATE GPS DATA VISUALIZATION", 
-                ha="center", va="center", fontsize=16, fontweight="bold")
+    return fig
+
+def create_combined_visualization(summary, file_frames, max_points=DEFAULT_MAX_POINTS):
+    """Create a single figure containing all visualizations
+
+    The aggregate panels, drawn from the merged ``summary``, form the first row and each ``(file_path, frames)``
+    pair of ``file_frames`` one further row of four panels, each drawn
+    straight from the file's data.
+    """
+    if not file_frames:
+        print("No data to visualize")
+        return None
     
-    # Create aggregate plots first
-    try:
-        combined_tpv = pd.concat(all_data["tpv"]) if all_data["tpv"] else pd.DataFrame()
-        combined_sky = pd.concat(all_data["sky"]) if all_data["sky"] else pd.DataFrame()
-        combined_pps = pd.concat(all_data["pps"]) if all_data["pps"] else pd.DataFrame()
-        
-        # Plot 1: Satellite Usage Statistics
-        if not combined_sky.empty and "nSat" in combined_sky.columns and "uSat" in combined_sky.columns:
-            plt.subplot(total_rows // 4, 4, current_row)
-            if not combined_sky["nSat"].empty and (combined_sky["nSat"] > 0).any():
-                combined_sky["usage_ratio"] = combined_sky["uSat"] / combined_sky["nSat"]
-                plt.hist(combined_sky["usage_ratio"], bins=20, alpha=0.7)
-                plt.title("Satellite Usage Ratio Distribution")
-                plt.xlabel("Ratio of Used to Total Satellites")
-                plt.ylabel("Frequency")
-                plt.grid(True)
-                mean_ratio = combined_sky["usage_ratio"].mean()
-                median_ratio = combined_sky["usage_ratio"].median()
-                plt.axvline(mean_ratio, color='r', linestyle='--', label=f'Mean: {mean_ratio:.2f}')
-                plt.axvline(median_ratio, color='g', linestyle='-.', label=f'Median: {median_ratio:.2f}')
-                plt.legend()
-        
-        # Plot 2: PPS Jitter Statistics
-        current_row += 1
-        if not combined_pps.empty and "jitter_ns" in combined_pps.columns:
-            plt.subplot(total_rows // 4, 4, current_row)
-            plt.hist(combined_pps["jitter_ns"], bins=30, alpha=0.7)
-            plt.title("PPS Jitter Distribution")
-            plt.xlabel("Jitter (nanoseconds)")
-            plt.ylabel("Frequency")
-            plt.grid(True)
-            mean_jitter = combined_pps["jitter_ns"].mean()
-            median_jitter = combined_pps["jitter_ns"].median()
-            plt.axvline(mean_jitter, color='r', linestyle='--', label=f'Mean: {mean_jitter:.2f}')
-            plt.axvline(median_jitter, color='g', linestyle='-.', label=f'Median: {median_jitter:.2f}')
-            plt.legend()
-        
-        # Plot 3: DOP Values Box Plot
-        current_row += 1
-        if not combined_sky.empty:
-            dop_columns = [col for col in ["hdop", "vdop", "pdop"] if col in combined_sky.columns]
-            if dop_columns:
-                plt.subplot(total_rows // 4, 4, current_row)
-                combined_sky[dop_columns].boxplot()
-                plt.title("DOP Values Distribution")
-                plt.ylabel("DOP Value")
-                plt.grid(True)
-        
-        # Plot 4: Position Error Statistics
-        current_row += 1
-        if not combined_tpv.empty:
-            error_columns = [col for col in ["eph", "epv"] if col in combined_tpv.columns]
-            if error_columns:
-                plt.subplot(total_rows // 4, 4, current_row)
-                for col in error_columns:
-                    if combined_tpv[col].notna().any():
-                        label = "Horizontal Error" if col == "eph" else "Vertical Error"
-                        plt.hist(combined_tpv[col], bins=20, alpha=0.5, label=label)
-                plt.title("Position Error Distribution")
-                plt.xlabel("Error (meters)")
-                plt.ylabel("Frequency")
-                plt.legend()
-                plt.grid(True)
+    # One row of four panels for the aggregate data plus one per file
+    total_rows = 1 + len(file_frames)
+    fig, axes = plt.subplots(total_rows, 4, figsize=(15, 5 * total_rows), squeeze=False)
     
+    # First, add the aggregate data at the top
+    fig.text(0.5, 1 - (0.1 / total_rows), "AGGREGATE GPS DATA VISUALIZATION",
+             ha="center", va="center", fontsize=16, fontweight="bold")
+    try:
+        draw_aggregate_panels(axes[0], summary, stats_table=False)
     except Exception as e:
         print(f"Error creating aggregate plots: {e}")
     
     # Now add individual file plots
-    for i, (file_path, fig) in enumerate(individual_data_figures):
-        current_row += 1
-        
+    for row, (file_path, frames) in enumerate(file_frames, start=1):
         # Add a title for this log file
-        file_name = os.path.basename(file_path)
-        plt.figtext(0.5, 1 - ((current_row + 0.5) / total_rows), 
-                    f"LOG FILE: {file_name}", 
-                    ha="center", va="center", fontsize=14, fontweight="bold")
-        
-        # Extract the axes from the figure
-        for j, ax in enumerate(fig.get_axes()):
-            # Get the data and properties from the original axis
-            lines = ax.get_lines()
-            title = ax.get_title()
-            xlabel = ax.get_xlabel()
-            ylabel = ax.get_ylabel()
-            legend = ax.get_legend()
-            
-            # Always enable grid for consistency
-            grid_visible = True
-            
-            # Create a new subplot in the combined figure
-            new_ax = plt.subplot(total_rows // 4, 4, current_row + j)
-            
-            # Copy over the data and properties
-            for line in lines:
-                new_ax.plot(line.get_xdata(), line.get_ydata(), 
-                           color=line.get_color(), 
-                           linestyle=line.get_linestyle(), 
-                           marker=line.get_marker(),
-                           markersize=line.get_markersize())
-            
-            new_ax.set_title(title)
-            new_ax.set_xlabel(xlabel)
-            new_ax.set_ylabel(ylabel)
-            if grid_visible:
-                new_ax.grid(True)
-            
-            # Copy legend if it exists
-            if legend is not None:
-                handles, labels = ax.get_legend_handles_labels()
-                if handles and labels:
-                    new_ax.legend(handles, labels)
-            
-            # Handle error bars if present
-            for collection in ax.collections:
-                if hasattr(collection, 'get_segments'):
-                    # This is likely an error bar or line collection
-                    try:
-                        new_collection = plt.matplotlib.collections.LineCollection(
-                            collection.get_segments(),
-                            colors=collection.get_colors(),
-                            linewidths=collection.get_linewidths()
-                        )
-                        new_ax.add_collection(new_collection)
-                    except:
-                        # Skip if we can't copy the collection
-                        pass
-        
-        current_row += 3  # Move to the next set of plots (4 plots per file)
-    
-    plt.tight_layout()
-    return plt.gcf()
+        fig.text(0.5, 1 - ((row + 0.05) / total_rows),
+                 f"LOG FILE: {os.path.basename(file_path)}",
+                 ha="center", va="center", fontsize=14, fontweight="bold")
+        drawn = set()
+        for position, draw, frame in file_panels(frames):
+            draw(axes[row][position], frame, max_points)
+            drawn.add(position)
+        for position in range(4):
+            if position not in drawn:
+                axes[row][position].set_axis_off()
+    
+    fig.tight_layout()
+    return fig
 
-def main():
-    """Main function to process all JSON files and create visualizations"""
-    print("GPS Data Visualization Tool")
-    print("---------------------------")
-    
-    # Get the directory of this script
-    script_dir = os.path.dirname(os.path.abspath(__file__))
-    
-    # Find all JSON files in the current directory and subdirectories
+def plot_file_page(file_path, columns, max_points=DEFAULT_MAX_POINTS):
+    """Build the per-file figure from parsed columns (used by render workers)"""
+    return plot_gps_data(file_path, frames=columns_to_frames(columns), max_points=max_points)
+
+def summary_figures(all_data, summary, sat, max_points=DEFAULT_MAX_POINTS, chain=None, context=None,
+                    survey=None):
+    """Return (name, build) pairs of the summary figures, in display order"""
+    summaries = [
+        ("aggregate", lambda: plot_aggregate_data(summary)),
+        ("stability", lambda: plot_stability(all_data)),
+        ("sky", lambda: plot_sky_analysis(sat)),
+        ("pps_context", lambda: plot_pps_context(context)),
+        ("survey", lambda: plot_survey(survey)),
+    ]
+    if chain is not None:
+        summaries.append(("clock_chain", lambda: plot_clock_chain(chain, max_points)))
+    return summaries
+
+def build_figure(name, build):
+    """Build one figure as a profiled stage, reporting (not raising) errors"""
+    try:
+        with stage(f"plot:{name}"):
+            return build()
+    except Exception as e:
+        print(f"Error creating {name} plots: {e}")
+        record_error(f"plot:{name}", e)
+        return None
+
+def render_report(output_dir, all_data, summary, sat, parsed, workers=1, pdf_path=None,
+                  max_points=DEFAULT_MAX_POINTS, dpi=DEFAULT_DPI, chain=None, context=None, survey=None):
+    """Render every figure to PNG files in ``output_dir`` without a display
+
+    Summary pages are drawn here; per-file pages are drawn from their
+    column arrays in worker processes. With ``pdf_path`` all pages are
+    also collected into one multi-page PDF (per-file pages as images).
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    pdf = open_pdf(pdf_path)
+    try:
+        for name, build in summary_figures(all_data, summary, sat, max_points, chain, context, survey):
+            fig = build_figure(name, build)
+            if fig:
+                with stage("save_figure"):
+                    save_figure(fig, os.path.join(output_dir, f"{name}.png"), dpi, pdf)
+    finally:
+        if pdf is not None:
+            pdf.close()
+    
+    pages = []
+    for index, (file_path, columns) in enumerate(parsed):
+        # Per-file pages do not need the satellite rows
+        page_columns = {kind: columns[kind] for kind in ("tpv", "sky", "pps")}
+        stem = os.path.splitext(os.path.basename(file_path))[0]
+        pages.append((plot_file_page, (file_path, page_columns, max_points),
+                      os.path.join(output_dir, f"{index:04d}-{stem}.png")))
+    with stage("render_pages", records=len(pages)):
+        page_paths = render_pages(pages, workers, dpi)
+    if pdf_path:
+        with stage("pdf_pages", records=len(page_paths)):
+            append_image_pages(pdf_path, page_paths, dpi)
+    print(f"Wrote figures to {output_dir}" + (f" and {pdf_path}" if pdf_path else ""))
+
+def load_pps_context(parsed):
+    """Join every parsed file's SKY and TPV reports onto its merged PPS pulses"""
+    merged = collect_columns((kind, columns[kind]) for _, columns in parsed for kind in ("tpv", "sky", "pps"))
+    return pps_context(merged)
+
+def load_survey(parsed):
+    """Survey in the antenna position from the TPV fixes of every parsed file"""
+    tpv = collect_columns(("tpv", columns["tpv"]) for _, columns in parsed)["tpv"]
+    return SurveyEstimator().update(tpv)
+
+def load_clock_chain(parsed, chrony_paths=None, ptp_paths=None, log_year=None):
+    """Join chrony and ptp4l/phc2sys logs with the PPS pulses of the parsed files"""
+    pps = collect_columns(("pps", columns["pps"]) for _, columns in parsed)["pps"]
+    tracking = read_chrony_logs(chrony_paths)["tracking"] if chrony_paths else None
+    ptp = read_ptp_logs(ptp_paths, year=log_year) if ptp_paths else None
+    return clock_chain(pps, tracking, ptp)
+
+def store_files(db_path, parsed):
+    """Ingest parsed files into the time-series store, skipping unchanged ones"""
+    with GpsStore(db_path) as store:
+        for file_path, columns in parsed:
+            try:
+                if not store.is_ingested(file_path):
+                    store.ingest_file(file_path, columns)
+            except Exception as e:
+                print(f"Error storing {file_path}: {e}")
+                record_error("store", e)
+
+def parse_args(argv=None):
+    """Parse command line options"""
+    parser = argparse.ArgumentParser(description="Visualize gpsd JSON logs")
+    parser.add_argument("--cache-dir", default=DEFAULT_CACHE_DIR,
+                        help="directory for cached parsed columns")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="always re-parse log files instead of using the cache")
+    parser.add_argument("--workers", type=int, default=default_workers(),
+                        help="number of worker processes used to parse log files")
+    parser.add_argument("--store", metavar="DB",
+                        help="also ingest parsed data into this SQLite time-series store")
+    parser.add_argument("--follow", metavar="LOG",
+                        help="tail a gpsd log that is still being written and print running statistics")
+    parser.add_argument("--from-end", action="store_true",
+                        help="with --follow, skip data already in the log")
+    parser.add_argument("--interval", type=float, default=1.0,
+                        help="with --follow, seconds between polls")
+    parser.add_argument("--events", metavar="INDEX",
+                        help="with --follow, append detected anomalies to this event index")
+    parser.add_argument("--output-dir", metavar="DIR",
+                        help="render all figures to PNG files in DIR instead of showing them")
+    parser.add_argument("--pdf", metavar="FILE",
+                        help="with --output-dir, also collect every page into one PDF")
+    parser.add_argument("--max-points", type=int, default=DEFAULT_MAX_POINTS,
+                        help="points per line trace in per-file plots (0 draws every point)")
+    parser.add_argument("--chrony", metavar="PATH", action="append",
+                        help="chrony log directory or tracking/statistics/measurements log "
+                             "to correlate with PPS (repeatable)")
+    parser.add_argument("--ptp-log", metavar="PATH", action="append",
+                        help="journal/syslog file with ptp4l and phc2sys output (repeatable)")
+    parser.add_argument("--log-year", type=int,
+                        help="year of classic syslog timestamps, which do not include one")
+    parser.add_argument("--profile", metavar="REPORT",
+                        help="write per-stage timings, throughput and memory of the run to this JSON file")
+    parser.add_argument("--cprofile", action="store_true",
+                        help="with --profile, also run cProfile and list the costliest functions")
+    parser.add_argument("--tracemalloc", action="store_true",
+                        help="with --profile, also trace Python heap allocations per stage")
+    return parser.parse_args(argv)
+
+def find_json_files(script_dir):
+    """Return every JSON log and capture segment under ``script_dir``, sorted"""
     json_files = []
-    for ext in ["*.json"]:
+    for ext in ["*.json"] + [f"*{suffix}" for suffix in CAPTURE_SUFFIXES.values()]:
         json_files.extend(glob.glob(os.path.join(script_dir, ext)))
         json_files.extend(glob.glob(os.path.join(script_dir, "**", ext), recursive=True))
     
     # Remove duplicates and sort
-    json_files = sorted(list(set(json_files)))
+    return sorted(list(set(json_files)))
+
+def run(args):
+    """Process all JSON files and create visualizations"""
+    cache_dir = None if args.no_cache else args.cache_dir
+
+    print("GPS Data Visualization Tool")
+    print("---------------------------")
+    
+    if args.follow:
+        print(f"Following {args.follow} (Ctrl-C to stop)")
+        follow(args.follow, args.interval, args.from_end, events_path=args.events)
+        return
+    
+    # Find all JSON files in the directory of this script and its subdirectories
+    with stage("discover") as stats:
+        json_files = find_json_files(os.path.dirname(os.path.abspath(__file__)))
+        stats.count(len(json_files))
     
     if not json_files:
         print("No JSON files found in the current directory or subdirectories.")
@@ -476,40 +768,97 @@ def main():
         "pps": []
     }
     
-    # First create and display aggregate plots
+    # Parse every file exactly once, spreading the work over the pool
+    file_frames = []
+    parsed = ingest_files(json_files, args.workers, cache_dir)
+    sat = collect_columns(("sat", columns["sat"]) for _, columns in parsed)["sat"]
+    for file_path, columns in parsed:
+        print(f"Processing file: {os.path.basename(file_path)}")
+        with stage("frames", records=row_count(columns)):
+            frames = columns_to_frames(columns)
+        df_tpv, df_sky, df_pps = frames
+        if not (df_tpv.empty and df_sky.empty and df_pps.empty):
+            all_data["tpv"].append(df_tpv)
+            all_data["sky"].append(df_sky)
+            all_data["pps"].append(df_pps)
+        file_frames.append((file_path, frames))
+    
+    # Per-file sketches (cached with the columns) merge into the aggregate view
+    with stage("summaries", records=len(parsed)):
+        summary = merge_summaries(read_summary_cached(file_path, columns, cache_dir)
+                                  for file_path, columns in parsed)
+    
+    if args.store:
+        with stage("store"):
+            store_files(args.store, parsed)
+    
+    context = None
     try:
-        # Process each file to collect data without displaying
-        for file_path in json_files:
-            try:
-                data = parse_json_file(file_path)
-                if data:
-                    print(f"Processing file: {os.path.basename(file_path)}")
-                    df_tpv, df_sky, df_pps = extract_data_from_entries(data)
-                    all_data["tpv"].append(df_tpv)
-                    all_data["sky"].append(df_sky)
-                    all_data["pps"].append(df_pps)
-            except Exception as e:
-                print(f"Error processing {file_path}: {e}")
-        
-        # Create and display aggregate plots first
-        agg_fig = plot_aggregate_data(all_data)
-        if agg_fig:
-            plt.figure(agg_fig.number)
-            plt.show()
+        with stage("pps_context") as stats:
+            context = load_pps_context(parsed)
+            stats.count(len(context["edge_ns"]))
     except Exception as e:
-        print(f"Error creating aggregate plots: {e}")
+        print(f"Error joining PPS with SKY/TPV data: {e}")
+        record_error("pps_context", e)
     
-    # Now process and display individual file plots
-    for file_path in json_files:
+    survey = None
+    try:
+        with stage("survey", records=sum(len(columns["tpv"]["time_ns"]) for _, columns in parsed)):
+            survey = load_survey(parsed)
+    except Exception as e:
+        print(f"Error surveying the antenna position: {e}")
+        record_error("survey", e)
+    
+    chain = None
+    if args.chrony or args.ptp_log:
+        with stage("clock_chain"):
+            chain = load_clock_chain(parsed, args.chrony, args.ptp_log, args.log_year)
+    
+    if args.output_dir:
+        plt.switch_backend("Agg")
+        render_report(args.output_dir, all_data, summary, sat, parsed, args.workers, args.pdf, args.max_points,
+                      chain=chain, context=context, survey=survey)
+        print("Visualization complete.")
+        return
+    
+    # Aggregate statistics, clock stability, per-satellite signal analytics,
+    # timing error against geometry and the clock chain, one window at a time
+    for name, build in summary_figures(all_data, summary, sat, args.max_points, chain, context, survey):
+        fig = build_figure(name, build)
+        if fig:
+            plt.figure(fig.number)
+            plt.show()
+    
+    # Now display individual file plots from the already parsed data
+    for file_path, frames in file_frames:
         try:
-            fig = plot_gps_data(file_path)
+            with stage("plot:file"):
+                fig = plot_gps_data(file_path, frames=frames, max_points=args.max_points)
             if fig:
                 plt.figure(fig.number)
                 plt.show()
+                plt.close(fig)
         except Exception as e:
             print(f"Error processing {file_path}: {e}")
+            record_error("plot:file", e)
     
     print("Visualization complete.")
 
+def main(argv=None):
+    """Main function: run the tool, profiling it when asked"""
+    args = parse_args(argv)
+    if not args.profile:
+        run(args)
+        return
+    
+    profiler = Profiler("gps_mvp_visualize", cprofile=args.cprofile, trace_memory=args.tracemalloc)
+    try:
+        with profiler:
+            run(args)
+    finally:
+        report = profiler.write_report(args.profile)
+        print_summary(report)
+        print(f"Wrote profile report to {args.profile}")
+
 if __name__ == "__main__":
     main()
@@ -0,0 +1,320 @@
+"""
+Per-stage instrumentation of the log-processing pipeline.
+
+A ``Profiler`` times named stages (wall and CPU time, including CPU
+used by worker processes that finished during the stage), counts the
+records and bytes each stage handled, and samples the resident set
+size from a background thread to find each stage's peak. cProfile and
+tracemalloc can be switched on for a run. ``report()`` returns it all
+as one JSON-serializable dict.
+
+Code deep in the pipeline marks its stages with the module-level
+``stage()``, which times into the active profiler and does nothing when
+no profiler is active:
+
+    with stage("concat", records=len(frames)):
+        ...
+"""
+
+import contextlib
+import cProfile
+import json
+import os
+import platform
+import pstats
+import resource
+import subprocess
+import sys
+import threading
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+# Seconds between resident set size samples
+RSS_SAMPLE_INTERVAL = 0.05
+
+# Functions and allocation sites listed in a report
+TOP_ENTRIES = 25
+
+_active = None
+
+
+def peak_rss_bytes():
+    """Return the peak resident set size of this process so far"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def _current_rss_bytes():
+    """Return the current resident set size (the peak where /proc is missing)"""
+    try:
+        with open("/proc/self/statm", "rb") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return peak_rss_bytes()
+
+
+def _children_cpu_s():
+    """Return the CPU seconds used by finished child processes"""
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return usage.ru_utime + usage.ru_stime
+
+
+def _git_revision():
+    """Return the current commit (with a -dirty suffix) or None outside git"""
+    here = os.path.dirname(os.path.abspath(__file__))
+    try:
+        revision = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=here,
+                                  capture_output=True, text=True, check=True).stdout.strip()
+        dirty = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=here,
+                               capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return revision + ("-dirty" if dirty else "")
+
+
+def environment():
+    """Return the software and hardware context of a run"""
+    import matplotlib
+    import numpy as np
+    import pandas as pd
+    return {
+        "revision": _git_revision(),
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "pandas": pd.__version__,
+        "matplotlib": matplotlib.__version__,
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+    }
+
+
+class StageStats:
+    """Accumulated measurements of one named stage"""
+
+    def __init__(self, name):
+        self.name = name
+        self.calls = 0
+        self.wall_s = 0.0
+        self.cpu_s = 0.0
+        self.child_cpu_s = 0.0
+        self.records = 0
+        self.bytes = 0
+        self.peak_rss_bytes = 0
+        self.peak_heap_bytes = None
+        self.errors = 0
+
+    def count(self, records=0, nbytes=0):
+        """Add records and bytes handled by the stage"""
+        self.records += records
+        self.bytes += nbytes
+
+    def as_dict(self):
+        """Return the measurements with derived rates"""
+        result = {
+            "stage": self.name,
+            "calls": self.calls,
+            "wall_s": self.wall_s,
+            "cpu_s": self.cpu_s,
+            "child_cpu_s": self.child_cpu_s,
+            "peak_rss_bytes": self.peak_rss_bytes,
+        }
+        if self.records:
+            result["records"] = self.records
+            result["records_per_s"] = self.records / self.wall_s if self.wall_s else None
+        if self.bytes:
+            result["bytes"] = self.bytes
+            result["bytes_per_s"] = self.bytes / self.wall_s if self.wall_s else None
+        if self.peak_heap_bytes is not None:
+            result["peak_heap_bytes"] = self.peak_heap_bytes
+        if self.errors:
+            result["errors"] = self.errors
+        return result
+
+
+class Profiler:
+    """Collect stage timings, throughput and memory for one pipeline run"""
+
+    def __init__(self, name="run", cprofile=False, trace_memory=False,
+                 rss_interval=RSS_SAMPLE_INTERVAL):
+        self.name = name
+        self.stages = {}
+        self.errors = []
+        self._open = []
+        self._cprofile = cProfile.Profile() if cprofile else None
+        self._trace_memory = trace_memory
+        self._rss_interval = rss_interval
+        self._sampler = None
+        self._stop = threading.Event()
+        self._wall = None
+        self._cpu = None
+        self._child_cpu = None
+
+    def start(self):
+        """Start timing the run and make this the active profiler"""
+        global _active
+        _active = self
+        self._wall = time.perf_counter()
+        self._cpu = time.process_time()
+        self._child_cpu = _children_cpu_s()
+        if self._trace_memory:
+            tracemalloc.start()
+        if self._rss_interval:
+            self._sampler = threading.Thread(target=self._sample_rss, name="rss-sampler", daemon=True)
+            self._sampler.start()
+        if self._cprofile is not None:
+            self._cprofile.enable()
+        return self
+
+    def stop(self):
+        """Stop timing the run"""
+        global _active
+        if self._cprofile is not None:
+            self._cprofile.disable()
+        self._stop.set()
+        if self._sampler is not None:
+            self._sampler.join()
+        self._wall = time.perf_counter() - self._wall
+        self._cpu = time.process_time() - self._cpu
+        self._child_cpu = _children_cpu_s() - self._child_cpu
+        if _active is self:
+            _active = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _sample_rss(self):
+        """Raise the RSS peak of every open stage until stopped"""
+        while not self._stop.wait(self._rss_interval):
+            rss = _current_rss_bytes()
+            for stats in list(self._open):
+                if rss > stats.peak_rss_bytes:
+                    stats.peak_rss_bytes = rss
+
+    @contextlib.contextmanager
+    def stage(self, name, records=0, nbytes=0):
+        """Time a block as one call of stage ``name``, yielding its StageStats
+
+        Counts can be given up front or added with ``StageStats.count``.
+        Exceptions are counted against the stage and re-raised.
+        """
+        stats = self.stages.get(name)
+        if stats is None:
+            stats = self.stages[name] = StageStats(name)
+        stats.calls += 1
+        stats.count(records, nbytes)
+        rss = _current_rss_bytes()
+        stats.peak_rss_bytes = max(stats.peak_rss_bytes, rss)
+        if self._trace_memory:
+            heap_before = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+        self._open.append(stats)
+        wall = time.perf_counter()
+        cpu = time.process_time()
+        child_cpu = _children_cpu_s()
+        try:
+            yield stats
+        except Exception as e:
+            stats.errors += 1
+            self.errors.append({"stage": name, "error": f"{type(e).__name__}: {e}"})
+            raise
+        finally:
+            stats.wall_s += time.perf_counter() - wall
+            stats.cpu_s += time.process_time() - cpu
+            stats.child_cpu_s += _children_cpu_s() - child_cpu
+            self._open.remove(stats)
+            stats.peak_rss_bytes = max(stats.peak_rss_bytes, _current_rss_bytes())
+            if self._trace_memory:
+                # Heap growth above the level at entry; nested stages reset the
+                # peak, so outer stages see at least their own tail
+                peak = tracemalloc.get_traced_memory()[1] - heap_before
+                stats.peak_heap_bytes = max(stats.peak_heap_bytes or 0, peak)
+
+    def error(self, name, error):
+        """Record an error (exception or message) the pipeline carried on from"""
+        if isinstance(error, BaseException):
+            error = f"{type(error).__name__}: {error}"
+        self.errors.append({"stage": name, "error": error})
+
+    def _top_functions(self):
+        """Return the functions with the most cumulative time under cProfile"""
+        stats = pstats.Stats(self._cprofile)
+        rows = []
+        for (filename, line, function), (_, calls, total, cumulative, _) in stats.stats.items():
+            rows.append({"function": f"{os.path.basename(filename)}:{line}({function})",
+                         "calls": calls, "tottime_s": total, "cumtime_s": cumulative})
+        rows.sort(key=lambda row: row["cumtime_s"], reverse=True)
+        return rows[:TOP_ENTRIES]
+
+    def _top_allocations(self):
+        """Return the source lines holding the most traced memory"""
+        snapshot = tracemalloc.take_snapshot()
+        return [{"location": f"{stat.traceback[0].filename}:{stat.traceback[0].lineno}",
+                 "bytes": stat.size, "blocks": stat.count}
+                for stat in snapshot.statistics("lineno")[:TOP_ENTRIES]]
+
+    def report(self):
+        """Return the run's measurements as a JSON-serializable dict"""
+        result = {
+            "run": self.name,
+            "environment": environment(),
+            "wall_s": self._wall,
+            "cpu_s": self._cpu,
+            "child_cpu_s": self._child_cpu,
+            "max_rss_bytes": peak_rss_bytes(),
+            "stages": [stats.as_dict() for stats in self.stages.values()],
+            "errors": self.errors,
+        }
+        if self._cprofile is not None:
+            result["top_functions"] = self._top_functions()
+        if self._trace_memory and tracemalloc.is_tracing():
+            result["top_allocations"] = self._top_allocations()
+            tracemalloc.stop()
+        return result
+
+    def write_report(self, path):
+        """Write the report as JSON (and the raw cProfile data next to it)"""
+        report = self.report()
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        with open(path, "w") as f:
+            json.dump(report, f, indent=2)
+        if self._cprofile is not None:
+            self._cprofile.dump_stats(os.path.splitext(path)[0] + ".prof")
+        return report
+
+
+def stage(name, records=0, nbytes=0):
+    """Time a block in the active profiler (a no-op context when there is none)
+
+    The context yields a StageStats either way, so callers can count
+    records and bytes without checking whether profiling is on.
+    """
+    if _active is None:
+        return contextlib.nullcontext(StageStats(name))
+    return _active.stage(name, records, nbytes)
+
+
+def record_error(name, error):
+    """Record a handled exception in the active profiler, if any"""
+    if _active is not None:
+        _active.error(name, error)
+
+
+def print_summary(report):
+    """Print a table of stage times and rates"""
+    print(f"{'stage':28s} {'calls':>6s} {'wall s':>9s} {'cpu s':>8s} {'child s':>8s} "
+          f"{'records/s':>11s} {'MB/s':>8s} {'peak RSS':>9s}")
+    for row in report["stages"]:
+        records = row.get("records_per_s")
+        rate = row.get("bytes_per_s")
+        print(f"{row['stage']:28s} {row['calls']:6d} {row['wall_s']:9.3f} {row['cpu_s']:8.3f} "
+              f"{row['child_cpu_s']:8.3f} {records or 0:11.0f} {(rate or 0) / 1e6:8.1f} "
+              f"{row['peak_rss_bytes'] / 1e6:7.0f}MB")
+    print(f"Total {report['wall_s']:.3f} s wall, {report['cpu_s']:.3f} s CPU "
+          f"(+{report['child_cpu_s']:.3f} s in workers), peak RSS {report['max_rss_bytes'] / 1e6:.0f} MB")
@@ -0,0 +1,90 @@
+"""
+Headless rendering of figures to image files.
+
+Pages are drawn by figure-building functions in a pool of worker
+processes, written to PNG and closed straight away, so rendering
+hundreds of log files keeps only one open figure per worker. Finished
+pages can be collected into a multi-page PDF in order: summary figures
+as vector pages, then the rendered PNGs appended one at a time with
+Pillow, so only one page image is ever held in memory.
+"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import matplotlib
+import matplotlib.pyplot as plt
+from matplotlib.backends.backend_pdf import PdfPages
+from PIL import Image
+
+DEFAULT_DPI = 100
+
+
+def _init_worker():
+    """Select the non-interactive backend in a rendering worker"""
+    matplotlib.use("Agg", force=True)
+
+
+def save_figure(fig, out_path, dpi=DEFAULT_DPI, pdf=None):
+    """Write a figure to ``out_path`` (and to an open PdfPages), then close it"""
+    fig.savefig(out_path, dpi=dpi)
+    if pdf is not None:
+        pdf.savefig(fig)
+    plt.close(fig)
+    return out_path
+
+
+def _render_page(task):
+    """Build one figure in a worker and save it, returning (path, error)"""
+    build, args, out_path, dpi = task
+    try:
+        fig = build(*args)
+        if fig is None:
+            return None, None
+        return save_figure(fig, out_path, dpi), None
+    except Exception as e:
+        return None, f"{out_path}: {e}"
+
+
+def render_pages(pages, workers=1, dpi=DEFAULT_DPI):
+    """Render ``(build, args, out_path)`` pages, in parallel when workers > 1
+
+    ``build(*args)`` must be a picklable module-level function returning
+    a Figure (or None to skip the page). Returns the paths written, in
+    input order; failures are reported and left out.
+    """
+    tasks = [(build, args, out_path, dpi) for build, args, out_path in pages]
+    if workers > 1 and len(tasks) > 1:
+        with ProcessPoolExecutor(max_workers=min(workers, len(tasks)), initializer=_init_worker) as pool:
+            outcomes = list(pool.map(_render_page, tasks))
+    else:
+        outcomes = [_render_page(task) for task in tasks]
+
+    written = []
+    for path, error in outcomes:
+        if error is not None:
+            print(f"Error rendering {error}")
+        elif path is not None:
+            written.append(path)
+    return written
+
+
+def append_image_pages(pdf_path, image_paths, dpi=DEFAULT_DPI):
+    """Append rendered PNGs to a closed PDF file as full-size pages
+
+    PdfPages keeps every image until it is closed, so image pages are
+    written as incremental updates instead, each image being loaded,
+    written and released before the next.
+    """
+    for image_path in image_paths:
+        append = os.path.exists(pdf_path) and os.path.getsize(pdf_path) > 0
+        with Image.open(image_path) as image:
+            image.convert("RGB").save(pdf_path, "PDF", append=append, resolution=dpi)
+
+
+def open_pdf(pdf_path):
+    """Open a multi-page PDF for writing (None if no path is given)"""
+    if not pdf_path:
+        return None
+    os.makedirs(os.path.dirname(os.path.abspath(pdf_path)), exist_ok=True)
+    return PdfPages(pdf_path)
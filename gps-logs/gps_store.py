@@ -0,0 +1,262 @@
+"""
+Embedded SQLite time-series store for parsed gpsd data.
+
+Raw TPV, SKY and PPS rows are keyed by their int64 nanosecond timestamp
+and bulk-inserted in batched transactions. Alongside them the store
+keeps 1 s, 1 min and 1 h rollups (count/min/max/mean/p99) of the PPS
+offset, used satellites and HDOP, so long time ranges are answered from
+the rollups instead of the raw rows.
+"""
+
+import os
+import sqlite3
+
+import numpy as np
+import pandas as pd
+
+from pps_analysis import analyze_pps
+
+NSEC_PER_SEC = 1_000_000_000
+
+# Rollup bucket widths in nanoseconds
+RESOLUTIONS = {
+    "1s": NSEC_PER_SEC,
+    "1min": 60 * NSEC_PER_SEC,
+    "1h": 3600 * NSEC_PER_SEC,
+}
+
+# Rolled-up metrics: name -> (raw table, column)
+METRICS = {
+    "offset_ns": ("pps", "offset_ns"),
+    "uSat": ("sky", "uSat"),
+    "hdop": ("sky", "hdop"),
+}
+
+INSERT_BATCH = 50000
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS pps (
+    time_ns INTEGER PRIMARY KEY,
+    offset_ns INTEGER NOT NULL,
+    jitter_ns REAL
+);
+CREATE TABLE IF NOT EXISTS tpv (
+    time_ns INTEGER PRIMARY KEY,
+    mode INTEGER,
+    lat REAL, lon REAL, alt REAL, eph REAL, epv REAL
+);
+CREATE TABLE IF NOT EXISTS sky (
+    time_ns INTEGER PRIMARY KEY,
+    nSat INTEGER, uSat INTEGER,
+    hdop REAL, vdop REAL, pdop REAL
+);
+CREATE TABLE IF NOT EXISTS rollup (
+    metric TEXT NOT NULL,
+    resolution TEXT NOT NULL,
+    bucket_ns INTEGER NOT NULL,
+    count INTEGER NOT NULL,
+    min REAL, max REAL, mean REAL, p99 REAL,
+    PRIMARY KEY (metric, resolution, bucket_ns)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS sources (
+    path TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL
+);
+"""
+
+# Raw columns stored per table, in insert order after time_ns
+TABLE_COLUMNS = {
+    "pps": ("offset_ns", "jitter_ns"),
+    "tpv": ("mode", "lat", "lon", "alt", "eph", "epv"),
+    "sky": ("nSat", "uSat", "hdop", "vdop", "pdop"),
+}
+
+
+def _to_sql(value):
+    """Convert a NumPy scalar to the matching Python type for SQLite"""
+    return value.item() if isinstance(value, np.generic) else value
+
+
+def grouped_stats(bucket, values):
+    """Return per-bucket (bucket, count, min, max, mean, p99) arrays
+
+    ``bucket`` must be sorted. The p99 uses the nearest-rank method and is
+    computed for all buckets at once by sorting values within buckets.
+    """
+    order = np.lexsort((values, bucket))
+    bucket = bucket[order]
+    values = values[order]
+    starts = np.flatnonzero(np.concatenate(([True], bucket[1:] != bucket[:-1])))
+    counts = np.diff(np.concatenate((starts, [len(bucket)])))
+    rank = starts + np.ceil(0.99 * counts).astype(np.int64) - 1
+    return (
+        bucket[starts],
+        counts,
+        values[starts],
+        values[starts + counts - 1],
+        np.add.reduceat(values, starts) / counts,
+        values[rank],
+    )
+
+
+class GpsStore:
+    """SQLite-backed store of raw gpsd rows and their rollups"""
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self.conn = sqlite3.connect(db_path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+
+    def close(self):
+        """Close the database connection"""
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def is_ingested(self, file_path):
+        """Return True if the file was ingested with its current size and mtime"""
+        st = os.stat(file_path)
+        row = self.conn.execute(
+            "SELECT size, mtime_ns FROM sources WHERE path = ?", (os.path.abspath(file_path),)
+        ).fetchone()
+        return row == (st.st_size, st.st_mtime_ns)
+
+    def ingest_file(self, file_path, columns):
+        """Ingest a file's parsed columns and remember its size and mtime"""
+        st = os.stat(file_path)
+        self.ingest_columns(columns)
+        with self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO sources (path, size, mtime_ns) VALUES (?, ?, ?)",
+                (os.path.abspath(file_path), st.st_size, st.st_mtime_ns),
+            )
+
+    def ingest_columns(self, columns):
+        """Insert parsed TPV/SKY/PPS columns and refresh the affected rollups"""
+        rows = {}
+        pps = columns["pps"]
+        if len(pps["real_sec"]):
+            timing = analyze_pps(pps)
+            rows["pps"] = (timing["edge_ns"], {"offset_ns": timing["offset_ns"],
+                                               "jitter_ns": timing["jitter_ns"]})
+        for kind in ("tpv", "sky"):
+            kind_columns = columns[kind]
+            if len(kind_columns["time"]):
+                time_ns = np.asarray(kind_columns["time_ns"])
+                valid = time_ns > 0
+                rows[kind] = (time_ns[valid],
+                              {name: np.asarray(kind_columns[name])[valid] for name in TABLE_COLUMNS[kind]})
+
+        spans = {}
+        for table, (time_ns, values) in rows.items():
+            if not len(time_ns):
+                continue
+            self._insert_rows(table, time_ns, values)
+            spans[table] = (int(time_ns.min()), int(time_ns.max()))
+
+        for metric, (table, _) in METRICS.items():
+            if table in spans:
+                self._refresh_rollups(metric, *spans[table])
+
+    def _insert_rows(self, table, time_ns, values):
+        """Bulk insert rows in batched transactions, replacing duplicates
+
+        SQLite stores NaN as NULL, so missing values need no conversion.
+        """
+        names = TABLE_COLUMNS[table]
+        placeholders = ", ".join("?" * (len(names) + 1))
+        sql = f"INSERT OR REPLACE INTO {table} (time_ns, {', '.join(names)}) VALUES ({placeholders})"
+        arrays = [time_ns] + [values[name] for name in names]
+        for start in range(0, len(time_ns), INSERT_BATCH):
+            batch = zip(*(array[start:start + INSERT_BATCH].tolist() for array in arrays))
+            with self.conn:
+                self.conn.executemany(sql, batch)
+
+    def _refresh_rollups(self, metric, start_ns, end_ns):
+        """Recompute every rollup bucket overlapping [start_ns, end_ns]
+
+        The raw values are read once over the range covered by the widest
+        bucket, which also covers every finer bucket of the range.
+        """
+        table, column = METRICS[metric]
+        width = max(RESOLUTIONS.values())
+        lo = start_ns // width * width
+        hi = end_ns // width * width + width
+        time_ns, values = self._raw_values(table, column, lo, hi)
+        with self.conn:
+            self.conn.execute(
+                "DELETE FROM rollup WHERE metric = ? AND bucket_ns >= ? AND bucket_ns < ?",
+                (metric, lo, hi),
+            )
+            if not len(values):
+                return
+            for resolution, width in RESOLUTIONS.items():
+                stats = grouped_stats(time_ns // width * width, values)
+                self.conn.executemany(
+                    "INSERT INTO rollup (metric, resolution, bucket_ns, count, min, max, mean, p99) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    ((metric, resolution) + tuple(_to_sql(v) for v in row) for row in zip(*stats)),
+                )
+
+    def _raw_values(self, table, column, start_ns, end_ns):
+        """Return (time_ns, value) arrays of non-null raw values in a range"""
+        rows = self.conn.execute(
+            f"SELECT time_ns, {column} FROM {table} "
+            f"WHERE time_ns >= ? AND time_ns < ? AND {column} IS NOT NULL ORDER BY time_ns",
+            (start_ns, end_ns),
+        ).fetchall()
+        time_ns = np.fromiter((row[0] for row in rows), dtype=np.int64, count=len(rows))
+        values = np.fromiter((row[1] for row in rows), dtype=np.float64, count=len(rows))
+        return time_ns, values
+
+    def query_raw(self, table, start_ns, end_ns, columns=None):
+        """Return raw rows of a table in [start_ns, end_ns) as a DataFrame"""
+        names = ("time_ns",) + tuple(columns or TABLE_COLUMNS[table])
+        return pd.read_sql_query(
+            f"SELECT {', '.join(names)} FROM {table} WHERE time_ns >= ? AND time_ns < ? ORDER BY time_ns",
+            self.conn, params=(start_ns, end_ns),
+        )
+
+    def query_rollup(self, metric, resolution, start_ns, end_ns):
+        """Return rollup rows of a metric overlapping [start_ns, end_ns) as a DataFrame
+
+        The bucket containing ``start_ns`` is included.
+        """
+        width = RESOLUTIONS[resolution]
+        return pd.read_sql_query(
+            "SELECT bucket_ns, count, min, max, mean, p99 FROM rollup "
+            "WHERE metric = ? AND resolution = ? AND bucket_ns >= ? AND bucket_ns < ? ORDER BY bucket_ns",
+            self.conn, params=(metric, resolution, start_ns // width * width, end_ns),
+        )
+
+    def query_metric(self, metric, start_ns, end_ns, max_points=2000):
+        """Return a metric over a time range at the finest affordable resolution
+
+        Ranges short enough to return at most ``max_points`` raw rows come
+        from the raw table; longer ones from the finest rollup whose bucket
+        count fits the budget. Ranges too long even for the widest bucket
+        return every ``"1h"`` row, which can exceed ``max_points``; the
+        caller decimates. Returns (resolution, DataFrame), where the
+        resolution is ``"raw"`` or a key of ``RESOLUTIONS``.
+        """
+        span = max(end_ns - start_ns, 1)
+        table, column = METRICS[metric]
+        if span <= max_points * NSEC_PER_SEC:
+            frame = self.query_raw(table, start_ns, end_ns, (column,))
+            return "raw", frame.rename(columns={column: "value"})
+        for resolution, width in RESOLUTIONS.items():
+            if span // width <= max_points:
+                return resolution, self.query_rollup(metric, resolution, start_ns, end_ns)
+        return "1h", self.query_rollup(metric, "1h", start_ns, end_ns)
+
+    def time_range(self, table):
+        """Return the (first, last) timestamp stored in a table, or None"""
+        row = self.conn.execute(f"SELECT MIN(time_ns), MAX(time_ns) FROM {table}").fetchone()
+        return None if row[0] is None else row
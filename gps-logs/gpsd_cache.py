@@ -0,0 +1,143 @@
+"""
+On-disk cache of parsed gpsd log columns.
+
+Each source file gets its own cache entry holding one ``.npy`` file per
+column plus a small ``meta.json`` recording the source path, size and
+modification time. A cached entry is reused only while the source file
+still has the same size and mtime, and its arrays are memory-mapped so
+reloading months of logs costs little more than a few ``stat`` calls.
+"""
+
+import hashlib
+import json
+import os
+
+import numpy as np
+
+from gpsd_stream import SCHEMAS, read_columns
+from sketches import summarize_columns, summary_from_dict, summary_to_dict
+
+# Bump when the column layout changes so stale entries are re-parsed
+CACHE_VERSION = 4
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".gps_cache")
+
+META_FILE = "meta.json"
+
+SUMMARY_FILE = "summary.json"
+
+
+def cache_entry_dir(cache_dir, file_path):
+    """Return the cache entry directory for a source file"""
+    key = hashlib.sha1(os.path.abspath(file_path).encode("utf-8")).hexdigest()[:20]
+    return os.path.join(cache_dir, key)
+
+
+def _source_signature(file_path):
+    """Return the (path, size, mtime) tuple used to validate an entry"""
+    st = os.stat(file_path)
+    return {
+        "version": CACHE_VERSION,
+        "path": os.path.abspath(file_path),
+        "size": st.st_size,
+        "mtime_ns": st.st_mtime_ns,
+    }
+
+
+def load_cached_columns(file_path, cache_dir=DEFAULT_CACHE_DIR):
+    """Return memory-mapped cached columns for a file, or None on a miss"""
+    entry_dir = cache_entry_dir(cache_dir, file_path)
+    try:
+        with open(os.path.join(entry_dir, META_FILE)) as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        return None
+
+    if meta.get("source") != _source_signature(file_path):
+        return None
+
+    columns = {}
+    try:
+        for kind, schema in SCHEMAS.items():
+            columns[kind] = {}
+            for name, _, _, _ in schema:
+                path = os.path.join(entry_dir, f"{kind}.{name}.npy")
+                rows = meta["rows"][kind]
+                # Zero-length arrays cannot be memory-mapped
+                columns[kind][name] = np.load(path, mmap_mode="r" if rows else None)
+    except (OSError, KeyError, ValueError):
+        return None
+    return columns
+
+
+def store_columns(file_path, columns, cache_dir=DEFAULT_CACHE_DIR, source=None):
+    """Write parsed columns for a file into its cache entry"""
+    if source is None:
+        source = _source_signature(file_path)
+    entry_dir = cache_entry_dir(cache_dir, file_path)
+    os.makedirs(entry_dir, exist_ok=True)
+
+    # Invalidate the entry first so a partially written one is never used
+    meta_path = os.path.join(entry_dir, META_FILE)
+    if os.path.exists(meta_path):
+        os.remove(meta_path)
+
+    rows = {}
+    for kind, kind_columns in columns.items():
+        for name, values in kind_columns.items():
+            np.save(os.path.join(entry_dir, f"{kind}.{name}.npy"), np.asarray(values))
+        rows[kind] = len(next(iter(kind_columns.values()), []))
+
+    tmp_path = meta_path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump({"source": source, "rows": rows}, f)
+    os.replace(tmp_path, meta_path)
+
+
+def read_columns_cached(file_path, cache_dir=DEFAULT_CACHE_DIR):
+    """Read a gpsd log's columns through the cache, parsing on a miss"""
+    columns = load_cached_columns(file_path, cache_dir)
+    if columns is not None:
+        return columns
+
+    # Stat before parsing so a file that grows meanwhile is re-parsed next run
+    source = _source_signature(file_path)
+    columns = read_columns(file_path)
+    try:
+        store_columns(file_path, columns, cache_dir, source)
+    except OSError as e:
+        print(f"Could not cache {file_path}: {e}")
+    return columns
+
+
+def read_summary_cached(file_path, columns, cache_dir=DEFAULT_CACHE_DIR):
+    """Return a file's metric summary (see ``sketches``), reusing a cached one
+
+    The summary sits in the file's cache entry with its own source
+    signature, so it is rebuilt from ``columns`` only when the log is new
+    or has changed; without a ``cache_dir`` it is always computed.
+    """
+    if not cache_dir:
+        return summarize_columns(columns)
+    source = _source_signature(file_path)
+    summary_path = os.path.join(cache_entry_dir(cache_dir, file_path), SUMMARY_FILE)
+    try:
+        with open(summary_path) as f:
+            cached = json.load(f)
+        if cached.get("source") == source:
+            summary = summary_from_dict(cached["summary"])
+            if summary is not None:
+                return summary
+    except (OSError, ValueError, KeyError):
+        pass
+
+    summary = summarize_columns(columns)
+    try:
+        os.makedirs(os.path.dirname(summary_path), exist_ok=True)
+        tmp_path = summary_path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"source": source, "summary": summary_to_dict(summary)}, f)
+        os.replace(tmp_path, summary_path)
+    except OSError as e:
+        print(f"Could not cache the summary of {file_path}: {e}")
+    return summary
@@ -0,0 +1,419 @@
+#!/usr/bin/env python3
+"""
+Compressed, seekable capture format for gpsd JSON streams.
+
+A capture is a directory of segment files, one per UTC day by default
+(``capture-20250513T000000Z.gpsd.zst``). Each segment is a series of
+independently compressed chunks of ``chunk_seconds`` of records: zstd
+frames when ``zstandard`` is installed, gzip members otherwise. A
+segment is therefore still an ordinary ``.zst``/``.gz`` file, and
+``zstdcat``/``zcat`` turn it back into the original ``gpspipe -w`` text.
+
+Next to each segment a small tab-separated ``.idx`` sidecar lists every
+chunk's first and last record time, byte offset, compressed length,
+record count and raw size. Readers look up a time range there, seek to
+the first matching chunk and decompress only the chunks they need.
+
+    gpspipe -w | python gpsd_capture.py record ~/captures
+    python gpsd_capture.py convert old_log.json ~/captures
+    python gpsd_capture.py export ~/captures --start 2025-05-13T05:00:00Z --end 2025-05-13T06:00:00Z
+"""
+
+import argparse
+import bisect
+import csv
+import glob
+import gzip
+import os
+import sys
+import time
+import zlib
+from collections import namedtuple
+from datetime import datetime, timezone
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+from gps_time import NAT_NS, NSEC_PER_SEC, iso_time_ns, line_time_ns
+
+# Segment suffixes by codec; the index sits next to a segment as <segment>.idx
+CAPTURE_SUFFIXES = {"zstd": ".gpsd.zst", "gzip": ".gpsd.gz"}
+INDEX_SUFFIX = ".idx"
+
+DEFAULT_CODEC = "zstd" if zstandard is not None else "gzip"
+DEFAULT_LEVEL = {"zstd": 10, "gzip": 9}
+
+# Seconds of records per compressed chunk and per segment file
+DEFAULT_CHUNK_SECONDS = 60
+DEFAULT_SEGMENT_SECONDS = 86400
+
+# Raw bytes after which a chunk is closed regardless of its time span
+MAX_CHUNK_BYTES = 1 << 22
+
+Chunk = namedtuple("Chunk", ["start_ns", "end_ns", "offset", "length", "records", "raw_bytes"])
+
+INDEX_FIELDS = Chunk._fields
+
+def is_capture(path):
+    """Return True if a path is a capture segment file"""
+    return path.endswith(tuple(CAPTURE_SUFFIXES.values()))
+
+
+def _codec_of(path):
+    """Return the codec of a segment from its suffix"""
+    return "zstd" if path.endswith(CAPTURE_SUFFIXES["zstd"]) else "gzip"
+
+
+def _compressor(codec, level):
+    """Return a function compressing one chunk into a self-contained frame"""
+    if codec == "zstd":
+        if zstandard is None:
+            raise RuntimeError("zstd captures need the zstandard package")
+        return zstandard.ZstdCompressor(level=level).compress
+
+    def compress(data):
+        packer = zlib.compressobj(level, zlib.DEFLATED, 31)
+        return packer.compress(data) + packer.flush()
+    return compress
+
+
+def _decompress(codec, data):
+    """Decompress one or more concatenated frames of a codec"""
+    if codec == "zstd":
+        if zstandard is None:
+            raise RuntimeError("reading zstd captures needs the zstandard package")
+        reader = zstandard.ZstdDecompressor().stream_reader(data, read_across_frames=True)
+        return reader.read()
+    # wbits=47 accepts gzip (and zlib) headers; loop over concatenated members
+    parts = []
+    while data:
+        unpacker = zlib.decompressobj(47)
+        parts.append(unpacker.decompress(data))
+        data = unpacker.unused_data
+    return b"".join(parts)
+
+
+def segment_name(start_ns, codec):
+    """Return the file name of the segment starting at ``start_ns``"""
+    start = datetime.fromtimestamp(start_ns // NSEC_PER_SEC, timezone.utc)
+    return f"capture-{start:%Y%m%dT%H%M%S}Z{CAPTURE_SUFFIXES[codec]}"
+
+
+class CaptureWriter:
+    """Append gpsd JSON lines to a capture directory
+
+    Lines are buffered until a record falls past the chunk's time window
+    (lines without a time stay with their neighbours), then the chunk is
+    compressed, appended to the current segment and its index entry
+    written, so a crash loses at most the open chunk. Writing into an
+    existing segment appends to it.
+    """
+
+    def __init__(self, directory, codec=DEFAULT_CODEC, level=None,
+                 chunk_seconds=DEFAULT_CHUNK_SECONDS, segment_seconds=DEFAULT_SEGMENT_SECONDS):
+        self.directory = directory
+        self.codec = codec
+        self._compress = _compressor(codec, DEFAULT_LEVEL[codec] if level is None else level)
+        self.chunk_ns = chunk_seconds * NSEC_PER_SEC
+        self.segment_ns = segment_seconds * NSEC_PER_SEC
+        self.stats = {"records": 0, "raw_bytes": 0, "compressed_bytes": 0, "chunks": 0}
+        self._lines = []
+        self._raw_bytes = 0
+        self._first_ns = None
+        self._last_ns = None
+        self._chunk_end = None
+        self._segment_end = None
+        self._segment = None
+        self._index = None
+        self._index_writer = None
+        os.makedirs(directory, exist_ok=True)
+
+    def write_line(self, line):
+        """Add one raw gpsd JSON line (bytes, with or without its newline)"""
+        if not line.strip():
+            return
+        if not line.endswith(b"\n"):
+            line += b"\n"
+        time_ns = line_time_ns(line)
+        if time_ns != NAT_NS:
+            if self._chunk_end is not None and (time_ns >= self._chunk_end
+                                                or time_ns < self._segment_end - self.segment_ns):
+                self.flush()
+            if self._chunk_end is None:
+                self._open_chunk(time_ns)
+            # Reports of one epoch arrive slightly out of order, so keep the span
+            self._first_ns = time_ns if self._first_ns is None else min(self._first_ns, time_ns)
+            self._last_ns = time_ns if self._last_ns is None else max(self._last_ns, time_ns)
+        self._lines.append(line)
+        self._raw_bytes += len(line)
+        if self._raw_bytes >= MAX_CHUNK_BYTES:
+            self.flush()
+
+    def _open_chunk(self, time_ns):
+        """Open the chunk time window (and segment) holding a record time"""
+        segment_start = time_ns - time_ns % self.segment_ns
+        if self._segment is None or self._segment_end != segment_start + self.segment_ns:
+            self._open_segment(segment_start)
+        self._chunk_end = min(time_ns - time_ns % self.chunk_ns + self.chunk_ns, self._segment_end)
+
+    def _open_segment(self, start_ns):
+        """Open (or reopen for appending) the segment starting at ``start_ns``"""
+        self._close_segment()
+        path = os.path.join(self.directory, segment_name(start_ns, self.codec))
+        self._segment = open(path, "ab")
+        self._index = open(path + INDEX_SUFFIX, "a", newline="")
+        self._index_writer = csv.writer(self._index, delimiter="\t", lineterminator="\n")
+        if self._index.tell() == 0:
+            self._index_writer.writerow(INDEX_FIELDS)
+        self._segment_end = start_ns + self.segment_ns
+
+    def flush(self):
+        """Compress and store the open chunk"""
+        if not self._lines:
+            return
+        if self._chunk_end is None:
+            # Only untimed lines: file them under the current time
+            self._first_ns = self._last_ns = time.time_ns()
+            self._open_chunk(self._first_ns)
+        data = b"".join(self._lines)
+        frame = self._compress(data)
+        offset = self._segment.tell()
+        self._segment.write(frame)
+        self._segment.flush()
+        self._index_writer.writerow(Chunk(self._first_ns, self._last_ns, offset, len(frame),
+                                          len(self._lines), len(data)))
+        self._index.flush()
+        self.stats["records"] += len(self._lines)
+        self.stats["raw_bytes"] += len(data)
+        self.stats["compressed_bytes"] += len(frame)
+        self.stats["chunks"] += 1
+        self._lines = []
+        self._raw_bytes = 0
+        self._first_ns = None
+        self._last_ns = None
+        self._chunk_end = None
+
+    def _close_segment(self):
+        if self._segment is not None:
+            self._segment.close()
+            self._index.close()
+            self._segment = None
+            self._index = None
+
+    def close(self):
+        """Store the open chunk and close the segment"""
+        self.flush()
+        self._close_segment()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def read_index(segment_path):
+    """Return the chunks of a segment from its sidecar index (None if it has none)"""
+    try:
+        with open(segment_path + INDEX_SUFFIX, newline="") as f:
+            reader = csv.reader(f, delimiter="\t")
+            next(reader, None)
+            return [Chunk(*map(int, row)) for row in reader if len(row) == len(INDEX_FIELDS)]
+    except FileNotFoundError:
+        return None
+
+
+def _chunks_in_range(chunks, start_ns, end_ns):
+    """Return the chunks that may hold records in [start_ns, end_ns]"""
+    if start_ns is not None:
+        # Chunks are written in time order; skip those ending before the range
+        ends = [chunk.end_ns for chunk in chunks]
+        chunks = chunks[bisect.bisect_left(ends, start_ns):] if ends == sorted(ends) else \
+            [chunk for chunk in chunks if chunk.end_ns >= start_ns]
+    if end_ns is not None:
+        chunks = [chunk for chunk in chunks if chunk.start_ns <= end_ns]
+    return chunks
+
+
+def filter_lines_by_time(lines, start_ns=None, end_ns=None):
+    """Yield lines in the time range; untimed lines follow the last timed one"""
+    inside = True
+    for line in lines:
+        time_ns = line_time_ns(line)
+        if time_ns != NAT_NS:
+            inside = (start_ns is None or time_ns >= start_ns) and (end_ns is None or time_ns <= end_ns)
+        if inside:
+            yield line
+
+
+def _stream_blocks(codec, f, size=MAX_CHUNK_BYTES):
+    """Yield a whole segment decompressed in blocks of up to ``size`` bytes"""
+    if codec == "zstd":
+        if zstandard is None:
+            raise RuntimeError("reading zstd captures needs the zstandard package")
+        source = zstandard.ZstdDecompressor().stream_reader(f, read_across_frames=True)
+    else:
+        source = gzip.GzipFile(fileobj=f)
+    while True:
+        block = source.read(size)
+        if not block:
+            return
+        yield block
+
+
+def _split_lines(blocks):
+    """Yield the lines of a sequence of blocks, joining lines split across blocks"""
+    tail = b""
+    for block in blocks:
+        lines = (tail + block).splitlines(keepends=True)
+        tail = lines.pop() if lines and not lines[-1].endswith(b"\n") else b""
+        yield from lines
+    if tail:
+        yield tail
+
+
+def iter_segment_lines(segment_path, start_ns=None, end_ns=None):
+    """Yield the raw JSON lines of one segment, optionally only a time range
+
+    Only chunks overlapping the range are read, and they are decompressed
+    one at a time as the lines are consumed. A segment without an index
+    is decompressed from the start as a stream.
+    """
+    codec = _codec_of(segment_path)
+    chunks = read_index(segment_path)
+    ranged = start_ns is not None or end_ns is not None
+    with open(segment_path, "rb") as f:
+        if chunks is None:
+            lines = _split_lines(_stream_blocks(codec, f))
+            yield from filter_lines_by_time(lines, start_ns, end_ns) if ranged else lines
+            return
+        for chunk in _chunks_in_range(chunks, start_ns, end_ns):
+            f.seek(chunk.offset)
+            lines = _decompress(codec, f.read(chunk.length)).splitlines(keepends=True)
+            if ranged and ((start_ns is not None and chunk.start_ns < start_ns)
+                           or (end_ns is not None and chunk.end_ns > end_ns)):
+                yield from filter_lines_by_time(lines, start_ns, end_ns)
+            else:
+                yield from lines
+
+
+def capture_segments(path):
+    """Return the segment files of a capture directory (or the path itself), in time order"""
+    if os.path.isdir(path):
+        return sorted(segment for suffix in CAPTURE_SUFFIXES.values()
+                      for segment in glob.glob(os.path.join(path, f"*{suffix}")))
+    return [path]
+
+
+def iter_capture_lines(path, start_ns=None, end_ns=None):
+    """Yield raw JSON lines of a capture directory or segment within a time range
+
+    Segments whose index shows no chunk in the range are skipped
+    without being opened.
+    """
+    for segment_path in capture_segments(path):
+        chunks = read_index(segment_path)
+        if chunks is not None and not _chunks_in_range(chunks, start_ns, end_ns):
+            continue
+        yield from iter_segment_lines(segment_path, start_ns, end_ns)
+
+
+def capture_info(path):
+    """Return per-segment chunk counts, time span and compression ratio"""
+    info = []
+    for segment_path in capture_segments(path):
+        chunks = read_index(segment_path) or []
+        raw = sum(chunk.raw_bytes for chunk in chunks)
+        compressed = sum(chunk.length for chunk in chunks)
+        info.append({
+            "segment": segment_path,
+            "chunks": len(chunks),
+            "records": sum(chunk.records for chunk in chunks),
+            "start_ns": min((chunk.start_ns for chunk in chunks), default=None),
+            "end_ns": max((chunk.end_ns for chunk in chunks), default=None),
+            "raw_bytes": raw,
+            "compressed_bytes": compressed,
+            "ratio": raw / compressed if compressed else None,
+        })
+    return info
+
+
+def _time_arg(value):
+    """Parse a ``YYYY-MM-DDTHH:MM:SS[.fff]Z`` command line time to epoch ns"""
+    if value is None:
+        return None
+    time_ns = iso_time_ns(value if value.endswith("Z") else value + "Z")
+    if time_ns == NAT_NS:
+        raise argparse.ArgumentTypeError(f"expected YYYY-MM-DDTHH:MM:SSZ, got {value!r}")
+    return time_ns
+
+
+def _write_lines(lines, writer):
+    for line in lines:
+        writer.write_line(line)
+
+
+def main(argv=None):
+    """Command line entry point"""
+    parser = argparse.ArgumentParser(description="Write and read compressed, seekable gpsd captures")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    def writer_options(command):
+        command.add_argument("--codec", choices=sorted(CAPTURE_SUFFIXES), default=DEFAULT_CODEC,
+                             help=f"chunk compression (default {DEFAULT_CODEC})")
+        command.add_argument("--level", type=int, help="compression level")
+        command.add_argument("--chunk-seconds", type=int, default=DEFAULT_CHUNK_SECONDS,
+                             help="seconds of records per compressed chunk")
+        command.add_argument("--segment-seconds", type=int, default=DEFAULT_SEGMENT_SECONDS,
+                             help="seconds per segment file")
+
+    record = commands.add_parser("record", help="capture gpspipe -w output from stdin")
+    record.add_argument("directory", help="capture directory")
+    writer_options(record)
+
+    convert = commands.add_parser("convert", help="convert plain gpsd JSON logs into a capture")
+    convert.add_argument("logs", nargs="+", help="plain gpsd JSON logs, oldest first")
+    convert.add_argument("directory", help="capture directory")
+    writer_options(convert)
+
+    export = commands.add_parser("export", help="write a capture back out as plain gpsd JSON")
+    export.add_argument("path", help="capture directory or segment")
+    export.add_argument("--start", type=_time_arg, help="first time to include (UTC)")
+    export.add_argument("--end", type=_time_arg, help="last time to include (UTC)")
+    export.add_argument("-o", "--output", help="output file (default stdout)")
+
+    info = commands.add_parser("info", help="show the chunks and compression of a capture")
+    info.add_argument("path", help="capture directory or segment")
+
+    args = parser.parse_args(argv)
+    if args.command in ("record", "convert"):
+        with CaptureWriter(args.directory, args.codec, args.level, args.chunk_seconds,
+                           args.segment_seconds) as writer:
+            if args.command == "record":
+                _write_lines(sys.stdin.buffer, writer)
+            else:
+                for log in args.logs:
+                    with open(log, "rb") as f:
+                        _write_lines(f, writer)
+        stats = writer.stats
+        ratio = stats["raw_bytes"] / stats["compressed_bytes"] if stats["compressed_bytes"] else 0
+        print(f"Stored {stats['records']} lines in {stats['chunks']} chunks: "
+              f"{stats['raw_bytes']} -> {stats['compressed_bytes']} bytes ({ratio:.1f}x)", file=sys.stderr)
+    elif args.command == "export":
+        out = open(args.output, "wb") if args.output else sys.stdout.buffer
+        try:
+            out.writelines(iter_capture_lines(args.path, args.start, args.end))
+        finally:
+            if args.output:
+                out.close()
+    else:
+        for segment in capture_info(args.path):
+            ratio = f"{segment['ratio']:.1f}x" if segment["ratio"] else "-"
+            print(f"{segment['segment']}: {segment['chunks']} chunks, {segment['records']} lines, "
+                  f"{segment['raw_bytes']} -> {segment['compressed_bytes']} bytes ({ratio})")
+
+
+if __name__ == "__main__":
+    main()
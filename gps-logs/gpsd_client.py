@@ -0,0 +1,258 @@
+#!/usr/bin/env python3
+"""
+Long-lived asyncio client for gpsd.
+
+Keeps one ``?WATCH`` connection open to gpsd (port 2947 by default) and
+decodes TPV, SKY, PPS and TOFF reports as they arrive, holding only the
+latest value of each. Run as a Telegraf ``execd`` input it prints the
+latest values in InfluxDB line protocol every time Telegraf signals on
+stdin, so collecting a sample never forks ``gpspipe`` or ``jq``.
+
+Uses only the standard library so it can be copied to the Pi on its own.
+"""
+
+import argparse
+import asyncio
+import json
+import sys
+import time
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 2947
+
+WATCH_COMMAND = b'?WATCH={"enable":true,"json":true,"pps":true};\n'
+
+NSEC_PER_SEC = 1_000_000_000
+
+# Reports older than this are not published, so a lost receiver or gpsd goes quiet
+DEFAULT_MAX_AGE_S = 10.0
+
+# Longest report line accepted (asyncio's default of 64 KiB is close to a full SKY)
+LINE_LIMIT = 1 << 20
+
+# Reports kept by GpsdState; everything else (VERSION, DEVICES, ...) is dropped
+TRACKED_CLASSES = ("TPV", "SKY", "PPS", "TOFF")
+
+
+class GpsdState:
+    """Latest decoded report of each tracked gpsd class"""
+
+    def __init__(self):
+        self.latest = {}
+        self.received = {}
+        self.updated = {}
+        self.listeners = []
+        # Called without arguments when the reports are cleared
+        self.clear_listeners = []
+        self.connected = False
+
+    def update(self, record):
+        """Store one decoded report and notify listeners"""
+        entry_class = record.get("class")
+        if entry_class not in TRACKED_CLASSES:
+            return
+        self.latest[entry_class] = record
+        self.received[entry_class] = self.received.get(entry_class, 0) + 1
+        self.updated[entry_class] = time.monotonic()
+        for listener in self.listeners:
+            listener(record)
+
+    def clear(self):
+        """Forget the latest reports (gpsd went away, so they describe nothing current)"""
+        self.latest.clear()
+        self.updated.clear()
+        for listener in self.clear_listeners:
+            listener()
+
+    def age(self, entry_class):
+        """Seconds since a class was last received (None if never)"""
+        if entry_class not in self.updated:
+            return None
+        return time.monotonic() - self.updated[entry_class]
+
+
+def timing_offset_ns(record):
+    """Return clock minus real time of a PPS or TOFF report in nanoseconds"""
+    return ((record.get("clock_sec", 0) - record.get("real_sec", 0)) * NSEC_PER_SEC
+            + record.get("clock_nsec", 0) - record.get("real_nsec", 0))
+
+
+class GpsdClient:
+    """Persistent gpsd WATCH connection feeding a GpsdState"""
+
+    def __init__(self, state, host=DEFAULT_HOST, port=DEFAULT_PORT, reconnect_delay=2.0):
+        self.state = state
+        self.host = host
+        self.port = port
+        self.reconnect_delay = reconnect_delay
+        self.connected = asyncio.Event()
+
+    async def run(self):
+        """Read reports forever, reconnecting whenever gpsd goes away"""
+        while True:
+            try:
+                await self._session()
+            except Exception as e:
+                # Includes over-long lines and listener errors: start over on a fresh connection
+                print(f"gpsd connection to {self.host}:{self.port} failed: {e!r}", file=sys.stderr)
+            self.connected.clear()
+            self.state.connected = False
+            self.state.clear()
+            await asyncio.sleep(self.reconnect_delay)
+
+    async def _session(self):
+        """Run one connection until gpsd closes it"""
+        reader, writer = await asyncio.open_connection(self.host, self.port, limit=LINE_LIMIT)
+        try:
+            writer.write(WATCH_COMMAND)
+            await writer.drain()
+            self.connected.set()
+            self.state.connected = True
+            while True:
+                line = await reader.readline()
+                if not line:
+                    return
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+                if isinstance(record, dict):
+                    self.state.update(record)
+        finally:
+            writer.close()
+
+
+def _format_field(value):
+    """Format one line protocol field value"""
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if isinstance(value, int):
+        return f"{value}i"
+    if isinstance(value, float):
+        return repr(value)
+    escaped = str(value).replace("\\", "\\\\").replace('"', '\\"')
+    return f'"{escaped}"'
+
+
+def _escape_tag(value):
+    """Escape a line protocol tag value"""
+    return str(value).replace("\\", "\\\\").replace(",", "\\,").replace(" ", "\\ ").replace("=", "\\=")
+
+
+def line_protocol(measurement, tags, fields):
+    """Return one InfluxDB line protocol line (None if there are no fields)"""
+    fields = {key: value for key, value in fields.items() if value is not None}
+    if not fields:
+        return None
+    tag_text = "".join(f",{key}={_escape_tag(value)}" for key, value in sorted(tags.items()) if value)
+    field_text = ",".join(f"{key}={_format_field(value)}" for key, value in fields.items())
+    return f"{measurement}{tag_text} {field_text}"
+
+
+def _device_tag(record):
+    """Return the short device name used as the ``device`` tag"""
+    return record.get("device", "").rsplit("/", 1)[-1]
+
+
+def telegraf_lines(state, max_age=DEFAULT_MAX_AGE_S):
+    """Return line protocol lines for the latest reports in ``state``
+
+    Reports older than ``max_age`` seconds are left out, so nothing is
+    printed while gpsd or the receiver is silent.
+    """
+    lines = []
+    latest = {entry_class: record for entry_class, record in state.latest.items()
+              if max_age is None or state.age(entry_class) <= max_age}
+    tpv = latest.get("TPV")
+    if tpv is not None:
+        lines.append(line_protocol("gps_status", {"device": _device_tag(tpv)}, {
+            "lat": tpv.get("lat"),
+            "lon": tpv.get("lon"),
+            "alt": tpv.get("alt"),
+            "eph": tpv.get("eph"),
+            "epv": tpv.get("epv"),
+            "sep": tpv.get("sep"),
+            "mode": tpv.get("mode"),
+            "status": 1 if tpv.get("mode", 0) >= 2 else 0,
+        }))
+
+    sky = latest.get("SKY")
+    if sky is not None:
+        satellites = sky.get("satellites") or []
+        lines.append(line_protocol("gps_sky", {"device": _device_tag(sky)}, {
+            "nSat": sky.get("nSat", len(satellites)),
+            "uSat": sky.get("uSat", sum(1 for sat in satellites if sat.get("used"))),
+            "hdop": sky.get("hdop"),
+            "vdop": sky.get("vdop"),
+            "pdop": sky.get("pdop"),
+            "tdop": sky.get("tdop"),
+            "gdop": sky.get("gdop"),
+        }))
+
+    for entry_class, measurement in (("PPS", "gps_pps"), ("TOFF", "gps_toff")):
+        record = latest.get(entry_class)
+        if record is not None:
+            lines.append(line_protocol(measurement, {"device": _device_tag(record)}, {
+                "offset_ns": timing_offset_ns(record),
+                "precision": record.get("precision"),
+                "age_s": round(state.age(entry_class), 3),
+            }))
+
+    return [line for line in lines if line is not None]
+
+
+async def _stdin_signals():
+    """Yield once per line Telegraf writes to our stdin"""
+    loop = asyncio.get_running_loop()
+    reader = asyncio.StreamReader()
+    await loop.connect_read_pipe(lambda: asyncio.StreamReaderProtocol(reader), sys.stdin)
+    while True:
+        line = await reader.readline()
+        if not line:
+            return
+        yield
+
+
+async def _interval_signals(interval):
+    """Yield every ``interval`` seconds"""
+    while True:
+        await asyncio.sleep(interval)
+        yield
+
+
+async def serve_telegraf(host, port, signal="stdin", interval=10.0, max_age=DEFAULT_MAX_AGE_S):
+    """Run the client and print line protocol whenever a sample is due"""
+    state = GpsdState()
+    client = GpsdClient(state, host, port)
+    client_task = asyncio.create_task(client.run())
+    signals = _stdin_signals() if signal == "stdin" else _interval_signals(interval)
+    try:
+        async for _ in signals:
+            lines = telegraf_lines(state, max_age)
+            if lines:
+                sys.stdout.write("\n".join(lines) + "\n")
+                sys.stdout.flush()
+    finally:
+        client_task.cancel()
+
+
+def main(argv=None):
+    """Command line entry point for the Telegraf execd collector"""
+    parser = argparse.ArgumentParser(description="Publish gpsd reports to Telegraf (execd)")
+    parser.add_argument("--host", default=DEFAULT_HOST, help="gpsd host")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help="gpsd port")
+    parser.add_argument("--signal", choices=["stdin", "none"], default="stdin",
+                        help="emit on each stdin line (Telegraf signal = \"STDIN\") or on a timer")
+    parser.add_argument("--interval", type=float, default=10.0,
+                        help="seconds between samples with --signal none")
+    parser.add_argument("--max-age", type=float, default=DEFAULT_MAX_AGE_S,
+                        help="seconds after which a report is too old to publish")
+    args = parser.parse_args(argv)
+    try:
+        asyncio.run(serve_telegraf(args.host, args.port, args.signal, args.interval, args.max_age))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
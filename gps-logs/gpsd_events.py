@@ -0,0 +1,328 @@
+#!/usr/bin/env python3
+"""
+Streaming anomaly and holdover detection for gpsd logs.
+
+``EventDetector`` looks at one record at a time and keeps only a few
+numbers of state, so it runs in constant memory over a live stream or
+years of archives. It reports:
+
+- ``pps_gap``: pulses missing between two PPS reports (value: pulses
+  missed); ``pps_jump``: the PPS time went backwards (value: seconds)
+- ``offset_outlier``: an offset far from its robust running level
+  (value: offset in ns); ``offset_step``: several outliers in a row on
+  the same side, after which the level is moved (value: step in ns)
+- ``fix_lost`` / ``fix_recovered``: the TPV mode dropped below a 2D fix
+  and came back (value: mode / seconds spent in holdover)
+- ``usat_collapse`` / ``usat_recovered``: satellites used fell well
+  below their running level (value: satellites used)
+
+Events are written to a small tab-separated index of time, kind, value,
+log file and byte offset, so an investigation can seek straight to the
+line that raised it instead of re-reading the log (capture segments have
+no offset and are seeked by time through their chunk index):
+
+    python gpsd_events.py logs/*.json --index events.tsv
+"""
+
+import argparse
+import csv
+import math
+import os
+from collections import Counter, namedtuple
+
+from gps_time import iso_time_ns
+from gpsd_capture import is_capture, iter_capture_lines
+from gpsd_stream import classes_for_kinds, decode_line, record_class
+from pps_analysis import NSEC_PER_SEC
+
+Event = namedtuple("Event", ["time_ns", "kind", "value", "file", "offset"])
+
+INDEX_FIELDS = Event._fields
+
+# Scale of a normal distribution's mean absolute deviation to its sigma
+_MAD_TO_SIGMA = math.sqrt(math.pi / 2)
+
+
+class RobustLevel:
+    """EWMA level and spread of a series that outliers barely move
+
+    Residuals are clipped to ``threshold`` spreads before they update the
+    level (a Huber-style EWMA) and the spread is an EWMA of absolute
+    residuals, so one wild value neither drags the level nor inflates the
+    band. Early values use a 1/n weight so the level settles quickly.
+    """
+
+    def __init__(self, alpha=0.01, threshold=6.0, warmup=30, min_sigma=1.0):
+        self.alpha = alpha
+        self.threshold = threshold
+        self.warmup = warmup
+        self.min_sigma = min_sigma
+        self.count = 0
+        self.level = 0.0
+        self._abs_residual = 0.0
+
+    @property
+    def sigma(self):
+        """Current spread estimate"""
+        return max(self._abs_residual * _MAD_TO_SIGMA, self.min_sigma)
+
+    def update(self, value):
+        """Fold in one value, returning its residual in spreads (0 while warming up)"""
+        self.count += 1
+        if self.count == 1:
+            self.level = value
+            return 0.0
+        residual = value - self.level
+        score = residual / self.sigma
+        warm = self.count > self.warmup
+        weight = self.alpha if warm else max(self.alpha, 1.0 / self.count)
+        limit = self.threshold * self.sigma
+        clipped = min(max(residual, -limit), limit) if warm else residual
+        self.level += weight * clipped
+        self._abs_residual += weight * (abs(clipped) - self._abs_residual)
+        return score if warm else 0.0
+
+    def reset(self, value):
+        """Move the level to ``value`` keeping the learned spread"""
+        self.level = value
+
+
+class EventDetector:
+    """Constant-memory detector of PPS, offset, fix and satellite anomalies"""
+
+    def __init__(self, threshold=6.0, alpha=0.01, warmup=30, step_count=5,
+                 collapse_ratio=0.5, min_used=4):
+        self.offset = RobustLevel(alpha, threshold, warmup)
+        self.used = RobustLevel(alpha, threshold, warmup)
+        self.step_count = step_count
+        self.collapse_ratio = collapse_ratio
+        self.min_used = min_used
+        self.counts = Counter()
+        self._last_real_sec = None
+        self._run_sign = 0
+        self._run_length = 0
+        self._run_sum = 0.0
+        self._fix = None
+        self._fix_lost_ns = None
+        self._collapsed = False
+
+    def update(self, record, file=None, offset=None):
+        """Examine one gpsd record, returning the list of events it raised"""
+        entry_class = record.get("class")
+        if entry_class == "PPS":
+            events = self._update_pps(record)
+        elif entry_class == "TPV":
+            events = self._update_tpv(record)
+        elif entry_class == "SKY":
+            events = self._update_sky(record)
+        else:
+            return []
+        if events:
+            events = [Event(time_ns, kind, value, file, offset) for time_ns, kind, value in events]
+            self.counts.update(event.kind for event in events)
+        return events
+
+    def _update_pps(self, record):
+        real_sec = record.get("real_sec", 0)
+        real_nsec = record.get("real_nsec", 0)
+        edge = real_sec * NSEC_PER_SEC + real_nsec
+        offset = ((record.get("clock_sec", 0) - real_sec) * NSEC_PER_SEC
+                  + record.get("clock_nsec", 0) - real_nsec)
+
+        events = []
+        if self._last_real_sec is not None:
+            step = real_sec - self._last_real_sec
+            if step > 1:
+                events.append((edge, "pps_gap", step - 1))
+            elif step < 0:
+                events.append((edge, "pps_jump", step))
+        self._last_real_sec = real_sec
+
+        score = self.offset.update(offset)
+        if abs(score) <= self.offset.threshold:
+            self._run_length = 0
+            return events
+        events.append((edge, "offset_outlier", offset))
+        sign = 1 if score > 0 else -1
+        if sign != self._run_sign or not self._run_length:
+            self._run_sign, self._run_length, self._run_sum = sign, 0, 0.0
+        self._run_length += 1
+        self._run_sum += offset
+        if self._run_length >= self.step_count:
+            # A sustained shift is a step in the clock, not noise: follow it
+            new_level = self._run_sum / self._run_length
+            events.append((edge, "offset_step", round(new_level - self.offset.level)))
+            self.offset.reset(new_level)
+            self._run_length = 0
+        return events
+
+    def _update_tpv(self, record):
+        mode = record.get("mode", 0)
+        has_fix = mode >= 2
+        if self._fix is None or has_fix == self._fix:
+            self._fix = has_fix
+            return []
+        self._fix = has_fix
+        time_ns = iso_time_ns(record.get("time", ""))
+        if not has_fix:
+            self._fix_lost_ns = time_ns
+            return [(time_ns, "fix_lost", mode)]
+        held = math.nan
+        if self._fix_lost_ns is not None and self._fix_lost_ns > 0 and time_ns > 0:
+            held = (time_ns - self._fix_lost_ns) / NSEC_PER_SEC
+        self._fix_lost_ns = None
+        return [(time_ns, "fix_recovered", held)]
+
+    def _update_sky(self, record):
+        used = record.get("uSat")
+        if used is None:
+            satellites = record.get("satellites")
+            if not satellites:
+                return []
+            used = sum(1 for sat in satellites if sat.get("used"))
+
+        warm = self.used.count >= self.used.warmup
+        collapsed = warm and (used < self.min_used or used < self.collapse_ratio * self.used.level)
+        if not collapsed:
+            # Collapsed counts are kept out of the level so it remembers normal
+            self.used.update(used)
+        if collapsed == self._collapsed:
+            return []
+        self._collapsed = collapsed
+        kind = "usat_collapse" if collapsed else "usat_recovered"
+        return [(iso_time_ns(record.get("time", "")), kind, used)]
+
+
+def _is_capture_path(file_path):
+    """Return True for a capture segment or capture directory"""
+    return is_capture(file_path) or os.path.isdir(file_path)
+
+
+def _offset_lines(file_path):
+    """Yield (byte offset, line) of a plain log, or (None, line) of a capture"""
+    if _is_capture_path(file_path):
+        for line in iter_capture_lines(file_path):
+            yield None, line
+        return
+    offset = 0
+    with open(file_path, "rb") as f:
+        for line in f:
+            yield offset, line
+            offset += len(line)
+
+
+def iter_offset_records(file_path, classes=None):
+    """Yield (byte offset, record) for each line-delimited record of a log
+
+    Lines of other classes are dropped on their class tag without being
+    decoded. Capture segments (``gpsd_capture``) are compressed, so their
+    records come with a None offset and are found again by time.
+    """
+    wanted = None if classes is None else {name.encode("ascii") for name in classes}
+    for offset, line in _offset_lines(file_path):
+        if wanted is not None and record_class(line) not in wanted:
+            continue
+        record = decode_line(line)
+        if record is not None:
+            yield offset, record
+
+
+def detect_events(paths, detector=None):
+    """Yield the events of logs read in order through one detector
+
+    Logs are treated as one continuous stream, so a gap between the end
+    of one file and the start of the next is reported too.
+    """
+    detector = detector or EventDetector()
+    classes = classes_for_kinds(("tpv", "sky", "pps"))
+    for file_path in paths:
+        for offset, record in iter_offset_records(file_path, classes):
+            yield from detector.update(record, file_path, offset)
+
+
+class EventIndex:
+    """Append-only tab-separated event index file"""
+
+    def __init__(self, index_path, append=False):
+        self._file = open(index_path, "a" if append else "w", newline="")
+        self._writer = csv.writer(self._file, delimiter="\t", lineterminator="\n")
+        if self._file.tell() == 0:
+            self._writer.writerow(INDEX_FIELDS)
+
+    def write(self, events):
+        """Append events to the index"""
+        self._writer.writerows(events)
+
+    def flush(self):
+        """Push written events to the file (for readers of a live index)"""
+        self._file.flush()
+
+    def close(self):
+        """Close the index file"""
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def read_event_index(index_path, kinds=None):
+    """Return the events stored in an index, optionally only some kinds"""
+    events = []
+    with open(index_path, newline="") as f:
+        reader = csv.reader(f, delimiter="\t")
+        next(reader, None)
+        for time_ns, kind, value, file, offset in reader:
+            if kinds is None or kind in kinds:
+                events.append(Event(int(time_ns), kind, float(value), file, int(offset) if offset else None))
+    return events
+
+
+def _lines_from(event):
+    """Yield the lines of the event's log from its line (captures: from its time)"""
+    if event.offset is None:
+        yield from iter_capture_lines(event.file, start_ns=event.time_ns)
+        return
+    with open(event.file, "rb") as f:
+        f.seek(event.offset)
+        yield from f
+
+
+def records_at(event, count=60):
+    """Yield up to ``count`` records of the event's log starting at its line"""
+    for line in _lines_from(event):
+        record = decode_line(line)
+        if record is None:
+            continue
+        yield record
+        count -= 1
+        if count <= 0:
+            return
+
+
+def main(argv=None):
+    """Command line entry point"""
+    parser = argparse.ArgumentParser(description="Find PPS, offset, fix and satellite anomalies in gpsd logs")
+    parser.add_argument("logs", nargs="+", help="gpsd JSON logs or capture segments, oldest first")
+    parser.add_argument("--index", default="events.tsv", help="event index file to write")
+    parser.add_argument("--threshold", type=float, default=6.0,
+                        help="robust spreads from the running level that make an offset an outlier")
+    parser.add_argument("--step-count", type=int, default=5,
+                        help="consecutive same-side outliers reported as an offset step")
+    parser.add_argument("--collapse-ratio", type=float, default=0.5,
+                        help="fraction of the usual satellites used below which it is a collapse")
+    args = parser.parse_args(argv)
+
+    detector = EventDetector(threshold=args.threshold, step_count=args.step_count,
+                             collapse_ratio=args.collapse_ratio)
+    with EventIndex(args.index) as index:
+        for event in detect_events(args.logs, detector):
+            index.write((event,))
+    summary = ", ".join(f"{kind}={count}" for kind, count in sorted(detector.counts.items()))
+    print(f"Wrote {sum(detector.counts.values())} events to {args.index}" + (f" ({summary})" if summary else ""))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,233 @@
+"""
+Tail-follow mode for a gpsd log that ``gpspipe -w`` is still writing.
+
+``LogFollower`` remembers the byte offset it has consumed and only reads
+complete lines appended since the last poll. ``LiveStatistics`` folds
+each new record into running statistics in O(1), so a live view never
+re-reads the file. Anomalies can be indexed as they arrive with
+``gpsd_events.EventDetector``.
+"""
+
+import os
+import time
+from collections import Counter
+
+from gpsd_events import EventDetector, EventIndex
+from gpsd_stream import decode_line
+from pps_analysis import NSEC_PER_SEC
+from running_stats import P2Quantile, RunningStats
+
+# Upper bound on bytes read per poll so catching up on a large backlog
+# happens in bounded steps
+READ_BLOCK = 1 << 22
+
+
+class LogFollower:
+    """Read records appended to a growing log file"""
+
+    def __init__(self, file_path, from_end=False):
+        self.file_path = file_path
+        self.offset = 0
+        self._file = None
+        self._inode = None
+        self._from_end = from_end
+        self._skip_line = False
+
+    def _open(self):
+        """(Re)open the log, starting at the end if requested"""
+        if self._file is not None:
+            self._file.close()
+        self._file = open(self.file_path, "rb")
+        st = os.fstat(self._file.fileno())
+        self._inode = st.st_ino
+        self.offset = st.st_size if self._from_end else 0
+        self._skip_line = False
+        # Only the first open may skip existing data; rotated logs start fresh
+        self._from_end = False
+
+    def _check_rotation(self):
+        """Return whether the log was replaced, or None if it is missing"""
+        try:
+            st = os.stat(self.file_path)
+        except FileNotFoundError:
+            return None
+        if self._file is None or st.st_ino != self._inode:
+            return True
+        if st.st_size < self.offset:
+            self.offset = 0
+        return False
+
+    def read_records(self):
+        """Yield the records of complete lines appended since the last call"""
+        for _, record in self.read_offset_records():
+            yield record
+
+    def read_offset_records(self):
+        """Yield (byte offset, record) for complete lines appended since the last call
+
+        When the log is rotated, whatever the writer appended to the old
+        file after the previous poll is read to EOF before switching over.
+        """
+        rotated = self._check_rotation()
+        if rotated is not False:
+            if self._file is not None:
+                yield from self._read_lines(final=True)
+            if rotated is None:
+                return
+            self._open()
+        yield from self._read_lines()
+
+    def _read_lines(self, final=False):
+        """Decode complete lines from the current offset; ``final`` also takes an unterminated tail"""
+        while True:
+            self._file.seek(self.offset)
+            block = self._file.read(READ_BLOCK)
+            if self._skip_line:
+                # Discard the rest of an oversized line
+                end = block.find(b"\n")
+                if end < 0:
+                    self.offset += len(block)
+                    if len(block) < READ_BLOCK:
+                        return
+                    continue
+                self.offset += end + 1
+                self._skip_line = False
+                continue
+            end = block.rfind(b"\n")
+            if end < 0 and len(block) == READ_BLOCK:
+                # No gpsd report is this long; drop the line instead of
+                # waiting forever for its newline
+                self.offset += len(block)
+                self._skip_line = True
+                continue
+            if final and len(block) < READ_BLOCK:
+                # The writer has moved on, so an unterminated tail is complete
+                end = len(block)
+            if end < 0:
+                # Nothing new, or only a partially written line
+                return
+            block_offset = self.offset
+            self.offset += min(end + 1, len(block))
+            for line in block[:end].split(b"\n"):
+                line_offset = block_offset
+                block_offset += len(line) + 1
+                if line.strip():
+                    record = decode_line(line)
+                    if record is not None:
+                        yield line_offset, record
+            if len(block) < READ_BLOCK:
+                return
+
+    def close(self):
+        """Close the underlying file"""
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+class LiveStatistics:
+    """Running PPS, satellite and fix statistics updated per record"""
+
+    def __init__(self):
+        self.offset_ns = RunningStats()
+        self.jitter_ns = RunningStats()
+        self.abs_offset_p50 = P2Quantile(0.5)
+        self.abs_offset_p99 = P2Quantile(0.99)
+        self.used_sats = RunningStats()
+        self.hdop = RunningStats()
+        self.fix_modes = Counter()
+        self.last = {}
+        self._last_edge = None
+
+    def update(self, record):
+        """Fold one gpsd record into the statistics"""
+        entry_class = record.get("class")
+        if entry_class == "PPS":
+            self._update_pps(record)
+        elif entry_class == "SKY":
+            self._update_sky(record)
+        elif entry_class == "TPV":
+            mode = record.get("mode", 0)
+            self.fix_modes[mode] += 1
+            self.last["mode"] = mode
+
+    def _update_pps(self, record):
+        real_sec = record.get("real_sec", 0)
+        real_nsec = record.get("real_nsec", 0)
+        offset = ((record.get("clock_sec", 0) - real_sec) * NSEC_PER_SEC
+                  + record.get("clock_nsec", 0) - real_nsec)
+        edge = real_sec * NSEC_PER_SEC + real_nsec
+
+        self.offset_ns.update(offset)
+        self.abs_offset_p50.update(abs(offset))
+        self.abs_offset_p99.update(abs(offset))
+        if self._last_edge is not None and edge - self._last_edge[0] == NSEC_PER_SEC:
+            self.jitter_ns.update(offset - self._last_edge[1])
+        self._last_edge = (edge, offset)
+        self.last["offset_ns"] = offset
+
+    def _update_sky(self, record):
+        satellites = record.get("satellites") or []
+        n_sat = record.get("nSat", len(satellites))
+        u_sat = record.get("uSat", sum(1 for sat in satellites if sat.get("used")))
+        self.used_sats.update(u_sat)
+        if record.get("hdop") is not None:
+            self.hdop.update(record["hdop"])
+        self.last["nSat"] = n_sat
+        self.last["uSat"] = u_sat
+
+    def summary(self):
+        """Return a one-line human readable summary"""
+        parts = [f"pps={self.offset_ns.count}"]
+        if self.offset_ns.count:
+            parts.append(f"offset={self.last['offset_ns']}ns")
+            parts.append(f"mean={self.offset_ns.mean:.1f}ns")
+            parts.append(f"std={self.offset_ns.std:.1f}ns")
+            parts.append(f"|offset| p50={self.abs_offset_p50.value:.0f}ns")
+            parts.append(f"p99={self.abs_offset_p99.value:.0f}ns")
+        if self.jitter_ns.count > 1:
+            parts.append(f"jitter std={self.jitter_ns.std:.1f}ns")
+        if "uSat" in self.last:
+            parts.append(f"sats={self.last['uSat']}/{self.last['nSat']}")
+            parts.append(f"mean used={self.used_sats.mean:.1f}")
+        if "mode" in self.last:
+            parts.append(f"mode={self.last['mode']}")
+        return " ".join(parts)
+
+
+def follow(file_path, interval=1.0, from_end=False, callback=None, events_path=None):
+    """Tail a gpsd log, updating and reporting statistics until interrupted
+
+    With ``events_path``, anomalies are detected as records arrive and
+    appended to that event index.
+    """
+    follower = LogFollower(file_path, from_end)
+    stats = LiveStatistics()
+    detector = EventDetector() if events_path else None
+    index = EventIndex(events_path, append=True) if events_path else None
+    try:
+        while True:
+            new_records = 0
+            for offset, record in follower.read_offset_records():
+                stats.update(record)
+                new_records += 1
+                if detector is not None:
+                    events = detector.update(record, file_path, offset)
+                    if events:
+                        index.write(events)
+                        for event in events:
+                            print(f"Event: {event.kind} ({event.value}) at offset {event.offset}")
+            if index is not None:
+                index.flush()
+            if callback is not None:
+                callback(stats, new_records)
+            elif new_records:
+                print(stats.summary())
+            time.sleep(interval)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        follower.close()
+        if index is not None:
+            index.close()
+    return stats
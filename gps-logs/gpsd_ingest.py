@@ -0,0 +1,92 @@
+"""
+Parallel ingestion of gpsd log files.
+
+Every file is parsed exactly once, either from the column cache in the
+calling process or by a worker in a process pool. Workers return plain
+NumPy column arrays, which pickle far more compactly than DataFrames.
+"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from gps_profile import record_error, stage
+from gpsd_cache import load_cached_columns, read_columns_cached
+from gpsd_stream import read_columns
+
+
+def default_workers():
+    """Return the default worker count (one per available core)"""
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def row_count(columns):
+    """Return the number of records held in parsed columns"""
+    return sum(len(next(iter(kind_columns.values()), ())) for kind_columns in columns.values())
+
+
+def _file_size(file_path):
+    """Return a file's size in bytes (0 if it cannot be read)"""
+    try:
+        return os.path.getsize(file_path)
+    except OSError:
+        return 0
+
+
+def _ingest_one(task):
+    """Parse one file in a worker, returning (columns, error message)"""
+    file_path, cache_dir = task
+    try:
+        if cache_dir:
+            columns = read_columns_cached(file_path, cache_dir)
+            # Hand back plain arrays; memmap handles do not survive pickling
+            return {kind: {name: np.asarray(values) for name, values in kind_columns.items()}
+                    for kind, kind_columns in columns.items()}, None
+        return read_columns(file_path), None
+    except Exception as e:
+        return None, str(e)
+
+
+def ingest_files(file_paths, workers=None, cache_dir=None):
+    """Parse log files across a process pool.
+
+    Returns a list of ``(file_path, columns)`` pairs in input order.
+    Files that fail to parse are reported and left out. Cache hits are
+    memory-mapped in this process and never sent to a worker.
+    """
+    if workers is None:
+        workers = default_workers()
+
+    results = {}
+    pending = []
+    with stage("ingest_cache_hits") as stats:
+        for file_path in file_paths:
+            columns = load_cached_columns(file_path, cache_dir) if cache_dir else None
+            if columns is not None:
+                results[file_path] = columns
+                stats.count(row_count(columns), _file_size(file_path))
+            else:
+                pending.append(file_path)
+
+    tasks = [(file_path, cache_dir) for file_path in pending]
+    with stage("ingest_parse", nbytes=sum(_file_size(file_path) for file_path in pending)) as stats:
+        if workers > 1 and len(tasks) > 1:
+            with ProcessPoolExecutor(max_workers=min(workers, len(tasks))) as pool:
+                outcomes = pool.map(_ingest_one, tasks)
+                parsed = list(zip(pending, outcomes))
+        else:
+            parsed = [(file_path, _ingest_one(task)) for file_path, task in zip(pending, tasks)]
+
+        for file_path, (columns, error) in parsed:
+            if error is not None:
+                print(f"Error processing {file_path}: {error}")
+                record_error("ingest_parse", f"{file_path}: {error}")
+            else:
+                results[file_path] = columns
+                stats.count(row_count(columns))
+
+    return [(file_path, results[file_path]) for file_path in file_paths if file_path in results]
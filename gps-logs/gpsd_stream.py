@@ -0,0 +1,362 @@
+"""
+Streaming reader for gpsd JSON logs (the output of ``gpspipe -w``).
+
+Records are decoded one line at a time and packed into fixed-size column
+chunks of typed NumPy arrays, so memory use is bounded by the chunk size
+rather than by the size of the log. Callers that only need some record
+kinds can have lines of other classes dropped on their ``"class"`` tag
+before any JSON decoding happens.
+"""
+
+import json
+import re
+
+import numpy as np
+
+from gps_time import NAT_NS, iso_time_ns
+from gpsd_capture import filter_lines_by_time, is_capture, iter_capture_lines
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# orjson decodes bytes directly and is several times faster than the
+# stdlib; both raise ValueError subclasses on malformed input
+loads = orjson.loads if orjson is not None else json.loads
+
+# Number of records of one class buffered before a chunk is emitted
+CHUNK_SIZE = 65536
+
+# Column schema per gpsd class: (column name, dtype, gpsd key, default);
+# time_ns is derived from time while parsing
+TPV_SCHEMA = [
+    ("time", str, "time", ""),
+    ("time_ns", np.int64, None, NAT_NS),
+    ("mode", np.int8, "mode", 0),
+    ("lat", np.float64, "lat", np.nan),
+    ("lon", np.float64, "lon", np.nan),
+    ("alt", np.float64, "alt", np.nan),
+    ("eph", np.float64, "eph", np.nan),  # Horizontal position error
+    ("epv", np.float64, "epv", np.nan),  # Vertical position error
+    ("altHAE", np.float64, "altHAE", np.nan),  # Height above the WGS84 ellipsoid
+]
+
+SKY_SCHEMA = [
+    ("time", str, "time", ""),
+    ("time_ns", np.int64, None, NAT_NS),
+    ("nSat", np.int16, "nSat", 0),
+    ("uSat", np.int16, "uSat", 0),
+    ("hdop", np.float64, "hdop", np.nan),
+    ("vdop", np.float64, "vdop", np.nan),
+    ("pdop", np.float64, "pdop", np.nan),
+]
+
+PPS_SCHEMA = [
+    ("real_sec", np.int64, "real_sec", 0),
+    ("real_nsec", np.int64, "real_nsec", 0),
+    ("clock_sec", np.int64, "clock_sec", 0),
+    ("clock_nsec", np.int64, "clock_nsec", 0),
+    ("precision", np.int8, "precision", 0),
+]
+
+# One row per satellite of each SKY report; sky_index is the row of the
+# parent report in the SKY columns
+SAT_SCHEMA = [
+    ("sky_index", np.int64, None, 0),
+    ("gnssid", np.int8, "gnssid", -1),
+    ("svid", np.int16, "svid", 0),
+    ("PRN", np.int16, "PRN", 0),
+    ("el", np.float32, "el", np.nan),
+    ("az", np.float32, "az", np.nan),
+    ("ss", np.float32, "ss", np.nan),  # Signal strength (C/N0, dB-Hz)
+    ("used", np.bool_, "used", False),
+    ("health", np.int8, "health", 0),
+]
+
+SCHEMAS = {
+    "tpv": TPV_SCHEMA,
+    "sky": SKY_SCHEMA,
+    "pps": PPS_SCHEMA,
+    "sat": SAT_SCHEMA,
+}
+
+# gpsd class each record kind is decoded from
+KIND_CLASSES = {
+    "tpv": "TPV",
+    "sky": "SKY",
+    "pps": "PPS",
+    "sat": "SKY",
+}
+
+# gpsd writes "class" as the first key; the search form also finds it
+# elsewhere in the object
+_CLASS_PREFIX = re.compile(rb'\s*\{\s*"class"\s*:\s*"([^"]*)"')
+_CLASS_ANYWHERE = re.compile(rb'"class"\s*:\s*"([^"]*)"')
+
+
+def record_class(line):
+    """Return the class tag of a raw gpsd JSON line as bytes, without decoding it
+
+    Returns None if the line has no class tag.
+    """
+    match = _CLASS_PREFIX.match(line) or _CLASS_ANYWHERE.search(line)
+    return match.group(1) if match else None
+
+
+def classes_for_kinds(kinds):
+    """Return the gpsd classes needed to build the given record kinds"""
+    return {KIND_CLASSES[kind] for kind in kinds}
+
+
+def iter_records(file_path, classes=None, start_ns=None, end_ns=None):
+    """Yield gpsd records (dicts) from a log file one at a time.
+
+    Line-delimited logs are decoded line by line; malformed lines (for
+    example a truncated last line of a log that is still being written)
+    are skipped. If the first non-blank line is not valid JSON the file
+    is treated as a single JSON document, reusing the bytes already read;
+    if that fails too, the first line is taken for a truncated record and
+    the rest is read line by line. Compressed capture segments (see
+    ``gpsd_capture``) are read chunk by chunk.
+
+    If ``classes`` is given, only records of those gpsd classes are
+    yielded, and other lines are dropped on their class tag without
+    being decoded (malformed lines are then only counted if their tag
+    is wanted).
+
+    With ``start_ns``/``end_ns`` only records in that epoch-ns range are
+    yielded: captures decompress just the chunks covering it, and lines
+    of plain logs are filtered on their time tag before decoding.
+    """
+    wanted = None if classes is None else {name.encode("ascii") for name in classes}
+    ranged = start_ns is not None or end_ns is not None
+    if is_capture(file_path):
+        skipped = yield from _decode_lines(iter_capture_lines(file_path, start_ns, end_ns), wanted)
+    else:
+        with open(file_path, "rb") as f:
+            first_line = b""
+            for first_line in f:
+                if first_line.strip():
+                    break
+            else:
+                return
+
+            skipped = 0
+            try:
+                record = loads(first_line)
+            except ValueError:
+                # Not line-delimited: decode the remainder as one document
+                rest_offset = f.tell()
+                try:
+                    document = loads(first_line + f.read())
+                except ValueError:
+                    # A line-delimited log starting mid-record (or with a
+                    # corrupt first line): drop that line and read on
+                    document = None
+                    skipped = 1
+                    f.seek(rest_offset)
+                if document is not None:
+                    yield from _filter_classes(_iter_document(document), classes)
+                    return
+            else:
+                if not ranged or next(filter_lines_by_time((first_line,), start_ns, end_ns), None):
+                    yield from _filter_classes(_iter_document(record), classes)
+
+            lines = filter_lines_by_time(f, start_ns, end_ns) if ranged else f
+            skipped += yield from _decode_lines(lines, wanted)
+
+    if skipped:
+        print(f"Skipped {skipped} malformed lines in {file_path}")
+
+
+def _decode_lines(lines, wanted):
+    """Yield the records of raw JSON lines, returning the number of malformed ones"""
+    skipped = 0
+    for line in lines:
+        if wanted is not None:
+            if record_class(line) not in wanted:
+                continue
+        elif not line.strip():
+            continue
+        record = decode_line(line)
+        if record is None:
+            skipped += 1
+            continue
+        yield record
+    return skipped
+
+
+def decode_line(line):
+    """Decode one gpsd JSON line, returning None if it is not a record"""
+    try:
+        record = loads(line)
+    except ValueError:
+        return None
+    return record if isinstance(record, dict) else None
+
+
+def _filter_classes(records, classes):
+    """Yield the records whose class is in ``classes`` (all if None)"""
+    if classes is None:
+        yield from records
+        return
+    for record in records:
+        if record.get("class") in classes:
+            yield record
+
+
+def _iter_document(document):
+    """Yield the records held by a decoded JSON value"""
+    if isinstance(document, dict):
+        yield document
+    elif isinstance(document, list):
+        for entry in document:
+            if isinstance(entry, dict):
+                yield entry
+
+
+def _tpv_row(entry):
+    """Return the TPV schema values of a record, or None if it has no fix"""
+    if "lat" not in entry or "lon" not in entry:
+        return None
+    row = _schema_row(TPV_SCHEMA, entry)
+    row[1] = iso_time_ns(row[0])
+    return row
+
+
+def _sky_row(entry):
+    """Return the SKY schema values of a record"""
+    row = _schema_row(SKY_SCHEMA, entry)
+    row[1] = iso_time_ns(row[0])
+    satellites = entry.get("satellites")
+    if satellites and ("nSat" not in entry or "uSat" not in entry):
+        # Older gpsd releases only report the satellite list
+        row[2] = len(satellites)
+        row[3] = sum(1 for sat in satellites if sat.get("used"))
+    return row
+
+
+def _sat_rows(entry, sky_index):
+    """Return one SAT schema row per satellite of a SKY record"""
+    rows = []
+    for sat in entry.get("satellites") or ():
+        row = _schema_row(SAT_SCHEMA, sat)
+        row[0] = sky_index
+        rows.append(row)
+    return rows
+
+
+def _pps_row(entry):
+    """Return the PPS schema values of a record"""
+    return _schema_row(PPS_SCHEMA, entry)
+
+
+def _schema_row(schema, entry):
+    """Pick the schema fields out of a record, substituting defaults"""
+    row = []
+    for _, _, key, default in schema:
+        value = entry.get(key) if key is not None else None
+        row.append(default if value is None else value)
+    return row
+
+
+ROW_EXTRACTORS = {
+    "TPV": ("tpv", _tpv_row),
+    "SKY": ("sky", _sky_row),
+    "PPS": ("pps", _pps_row),
+}
+
+
+def rows_to_columns(kind, rows):
+    """Convert a list of schema rows into a dict of typed column arrays"""
+    return schema_columns(SCHEMAS[kind], rows)
+
+
+def schema_columns(schema, rows):
+    """Convert rows of any (name, dtype, key, default) schema into typed columns"""
+    if not rows:
+        return {name: np.array([], dtype=dtype) for name, dtype, _, _ in schema}
+    columns = {}
+    for (name, dtype, _, _), values in zip(schema, zip(*rows)):
+        columns[name] = np.array(values, dtype=dtype)
+    return columns
+
+
+def empty_columns(kind):
+    """Return zero-length column arrays for a record kind"""
+    return schema_columns(SCHEMAS[kind], [])
+
+
+def iter_column_chunks(records, chunk_size=CHUNK_SIZE, kinds=None):
+    """Yield (kind, columns) chunks from an iterable of gpsd records.
+
+    ``kind`` is one of ``"tpv"``, ``"sky"``, ``"pps"`` or ``"sat"`` and
+    ``columns`` maps column names to NumPy arrays of at most ``chunk_size``
+    rows (a chunk of ``"sat"`` rows may overshoot by one report's
+    satellites). Records of other classes (VERSION, DEVICES, WATCH, ...)
+    are ignored, as are kinds not listed in ``kinds`` (if given).
+    """
+    kinds = set(SCHEMAS if kinds is None else kinds)
+    extractors = {entry_class: extractor for entry_class, extractor in ROW_EXTRACTORS.items()
+                  if extractor[0] in kinds or (entry_class == "SKY" and "sat" in kinds)}
+    pending = {kind: [] for kind in SCHEMAS}
+    sky_count = 0
+    for entry in records:
+        extractor = extractors.get(entry.get("class"))
+        if extractor is None:
+            continue
+        kind, extract_row = extractor
+        if kind in kinds:
+            row = extract_row(entry)
+            if row is None:
+                continue
+            rows = pending[kind]
+            rows.append(row)
+            if len(rows) >= chunk_size:
+                yield kind, rows_to_columns(kind, rows)
+                pending[kind] = []
+
+        if kind == "sky" and "sat" in kinds:
+            pending["sat"].extend(_sat_rows(entry, sky_count))
+            sky_count += 1
+            if len(pending["sat"]) >= chunk_size:
+                yield "sat", rows_to_columns("sat", pending["sat"])
+                pending["sat"] = []
+
+    for kind, rows in pending.items():
+        if rows:
+            yield kind, rows_to_columns(kind, rows)
+
+
+def collect_columns(chunks):
+    """Concatenate column chunks into one set of arrays per record kind"""
+    parts = {kind: [] for kind in SCHEMAS}
+    for kind, columns in chunks:
+        parts[kind].append(columns)
+
+    collected = {}
+    for kind, chunk_list in parts.items():
+        if not chunk_list:
+            collected[kind] = empty_columns(kind)
+        elif len(chunk_list) == 1:
+            collected[kind] = chunk_list[0]
+        else:
+            collected[kind] = {
+                name: np.concatenate([chunk[name] for chunk in chunk_list])
+                for name in chunk_list[0]
+            }
+    return collected
+
+
+def read_columns(file_path, chunk_size=CHUNK_SIZE, kinds=None, start_ns=None, end_ns=None):
+    """Read a gpsd log into typed column arrays for TPV, SKY, PPS and satellites
+
+    With ``kinds`` (e.g. ``("pps",)``) only those record kinds are decoded;
+    lines of other classes are skipped on their class tag and the other
+    kinds come back empty, so a PPS-only scan never decodes SKY reports.
+    ``start_ns``/``end_ns`` limit the records to a time range.
+    """
+    classes = None if kinds is None else classes_for_kinds(kinds)
+    records = iter_records(file_path, classes, start_ns, end_ns)
+    return collect_columns(iter_column_chunks(records, chunk_size, kinds))
@@ -0,0 +1,235 @@
+#!/usr/bin/env python3
+"""
+Synthetic gpsd log generator.
+
+Writes ``gpspipe -w`` style logs of any size: the VERSION/DEVICES/WATCH
+preamble a real capture starts with, then one PPS and TPV report per
+second and a SKY report every ``sky_interval`` seconds. Satellites move
+slowly across the sky with elevation-dependent C/N0, the PPS offset is
+a random walk plus white noise, and outages (gaps in the 1 Hz stream)
+and corrupt lines (truncated or garbled) are injected at configurable
+rates. Output is deterministic for a given seed.
+
+    python gpsd_synth.py synthetic.json --size 100MB --satellites 40
+"""
+
+import argparse
+import math
+import random
+import re
+from datetime import datetime, timezone
+
+# Start of the synthetic capture (2025-05-13T05:01:41Z, like the sample logs)
+DEFAULT_START = 1747112501
+
+# Share of satellites per gnssid, roughly what a multi-band receiver sees
+CONSTELLATION_MIX = ((0, 0.3), (2, 0.25), (3, 0.25), (6, 0.2))
+
+SIZE_UNITS = {"": 1, "B": 1, "KB": 1 << 10, "MB": 1 << 20, "GB": 1 << 30, "TB": 1 << 40}
+
+PREAMBLE = (
+    '{"class":"VERSION","release":"3.22","rev":"3.22","proto_major":3,"proto_minor":14}\n'
+    '{"class":"DEVICES","devices":[{"class":"DEVICE","path":"/dev/ttyACM0","driver":"u-blox",'
+    '"subtype":"SW EXT CORE 1.00 (3fda8e),HW 00190000","activated":"%(activated)s","flags":1,'
+    '"native":1,"bps":9600,"parity":"N","stopbits":1,"cycle":1.00,"mincycle":0.02},'
+    '{"class":"DEVICE","path":"/dev/pps0","driver":"PPS","activated":"%(activated)s"}]}\n'
+    '{"class":"WATCH","enable":true,"json":true,"nmea":false,"raw":0,"scaled":false,'
+    '"timing":false,"split24":false,"pps":true}\n'
+)
+
+
+def parse_size(text):
+    """Parse a size such as ``"512KB"``, ``"1.5GB"`` or ``"1000000"`` into bytes"""
+    match = re.fullmatch(r"\s*([0-9.]+)\s*([KMGT]?B?)\s*", text.upper())
+    if not match:
+        raise ValueError(f"Invalid size: {text}")
+    return int(float(match.group(1)) * SIZE_UNITS[match.group(2)])
+
+
+def format_size(size):
+    """Format a byte count with the largest whole unit (e.g. ``"10GB"``)"""
+    for unit in ("TB", "GB", "MB", "KB"):
+        if size >= SIZE_UNITS[unit] and size % SIZE_UNITS[unit] == 0:
+            return f"{size // SIZE_UNITS[unit]}{unit}"
+    return f"{size}B"
+
+
+def _iso_time(epoch):
+    """Format whole epoch seconds the way gpsd does"""
+    return datetime.fromtimestamp(epoch, timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.000Z")
+
+
+class _Satellite:
+    """One satellite on a slow great-circle-ish pass"""
+
+    def __init__(self, rng, gnssid, svid):
+        self.gnssid = gnssid
+        self.svid = svid
+        self.prn = svid + {0: 0, 2: 300, 3: 400, 6: 64}.get(gnssid, 100)
+        self.phase = rng.uniform(0, 2 * math.pi)
+        self.period = rng.uniform(6, 12) * 3600
+        self.peak = rng.uniform(20, 88)
+        self.az0 = rng.uniform(0, 360)
+        self.ss_bias = rng.uniform(-4, 4)
+
+    def position(self, t):
+        """Return (elevation, azimuth) at second ``t`` of the capture"""
+        angle = self.phase + 2 * math.pi * t / self.period
+        el = self.peak * math.sin(angle)
+        az = (self.az0 + math.degrees(angle) * 0.5) % 360
+        return el, az
+
+
+class GpsdLogGenerator:
+    """Produce the lines of a synthetic gpsd capture"""
+
+    def __init__(self, satellites=40, sky_interval=1, gap_rate=1e-4, max_gap=120,
+                 corrupt_rate=1e-4, start=DEFAULT_START, seed=0):
+        self.rng = random.Random(seed)
+        self.sky_interval = max(1, sky_interval)
+        self.gap_rate = gap_rate
+        self.max_gap = max_gap
+        self.corrupt_rate = corrupt_rate
+        self.start = start
+        self.satellites = self._constellation(satellites)
+        self.lat = 41.8806387
+        self.lon = -87.6439513
+        self.alt = 293.421
+        self.offset_ns = 0.0
+
+    def _constellation(self, count):
+        """Create ``count`` satellites spread over the constellation mix"""
+        sats = []
+        next_svid = {gnssid: 1 for gnssid, _ in CONSTELLATION_MIX}
+        for _ in range(count):
+            gnssid = self.rng.choices([g for g, _ in CONSTELLATION_MIX],
+                                      [w for _, w in CONSTELLATION_MIX])[0]
+            sats.append(_Satellite(self.rng, gnssid, next_svid[gnssid]))
+            next_svid[gnssid] += 1
+        return sats
+
+    def preamble(self):
+        """Return the VERSION/DEVICES/WATCH lines gpspipe writes first"""
+        return PREAMBLE % {"activated": _iso_time(self.start).replace(".000Z", ".287Z")}
+
+    def _pps(self, sec):
+        rng = self.rng
+        self.offset_ns += rng.gauss(0, 3)
+        offset = int(self.offset_ns + rng.gauss(0, 20))
+        clock_sec, clock_nsec = divmod(sec * 1_000_000_000 + offset, 1_000_000_000)
+        return ('{"class":"PPS","device":"/dev/pps0","real_sec":%d,"real_nsec":0,'
+                '"clock_sec":%d,"clock_nsec":%d,"precision":-20}\n' % (sec, clock_sec, clock_nsec))
+
+    def _tpv(self, sec, mode):
+        rng = self.rng
+        eph = abs(rng.gauss(1.4, 0.4))
+        return ('{"class":"TPV","device":"/dev/ttyACM0","mode":%d,"time":"%s","leapseconds":18,'
+                '"ept":0.005,"lat":%.9f,"lon":%.9f,"altHAE":%.4f,"alt":%.4f,"epx":%.3f,"epy":%.3f,'
+                '"epv":%.3f,"track":%.4f,"speed":%.3f,"climb":0.000,"eph":%.3f,"sep":%.3f}\n' % (
+                    mode, _iso_time(sec),
+                    self.lat + rng.gauss(0, 1e-5), self.lon + rng.gauss(0, 1e-5),
+                    self.alt - 33.9 + rng.gauss(0, 1.5), self.alt + rng.gauss(0, 1.5),
+                    eph * 1.2, eph * 0.8, abs(rng.gauss(1.7, 0.5)), rng.uniform(0, 360),
+                    abs(rng.gauss(0, 0.01)), eph, eph * 2.5))
+
+    def _sky(self, sec):
+        rng = self.rng
+        t = sec - self.start
+        entries = []
+        used_count = 0
+        for sat in self.satellites:
+            el, az = sat.position(t)
+            if el < -5:
+                continue
+            el = max(el, 0.0)
+            ss = max(0, int(18 + el * 0.3 + sat.ss_bias + rng.gauss(0, 2))) if el > 2 else 0
+            used = ss > 25 and el > 10
+            used_count += used
+            entries.append('{"PRN":%d,"el":%.1f,"az":%.1f,"ss":%.1f,"used":%s,"gnssid":%d,'
+                           '"svid":%d,"health":1}' % (sat.prn, el, az, ss,
+                                                      "true" if used else "false",
+                                                      sat.gnssid, sat.svid))
+        hdop = 0.6 + 12 / max(used_count, 1)
+        return ('{"class":"SKY","device":"/dev/ttyACM0","time":"%s","xdop":%.2f,"ydop":%.2f,'
+                '"vdop":%.2f,"tdop":%.2f,"hdop":%.2f,"gdop":%.2f,"pdop":%.2f,"nSat":%d,"uSat":%d,'
+                '"satellites":[%s]}\n' % (_iso_time(sec), hdop * 0.6, hdop * 0.5, hdop * 1.1,
+                                          hdop * 0.9, hdop, hdop * 1.7, hdop * 1.45,
+                                          len(entries), used_count, ",".join(entries)))
+
+    def _corrupt(self, line):
+        """Return a truncated or garbled copy of a line"""
+        if self.rng.random() < 0.5:
+            return line[:self.rng.randrange(1, len(line) - 1)] + "\n"
+        cut = self.rng.randrange(1, len(line) - 1)
+        return line[:cut] + "\x00#garbage" + line[cut:]
+
+    def lines(self):
+        """Yield log lines forever, one second of reports at a time"""
+        yield self.preamble()
+        rng = self.rng
+        sec = self.start
+        while True:
+            if rng.random() < self.gap_rate:
+                # Outage: the receiver reports losing its fix, then it and PPS
+                # go quiet; the fix is back with the next full second
+                yield ('{"class":"TPV","device":"/dev/ttyACM0","mode":1,"time":"%s"}\n'
+                       % _iso_time(sec))
+                sec += rng.randint(2, self.max_gap)
+            reports = [self._pps(sec), self._tpv(sec, 3)]
+            if (sec - self.start) % self.sky_interval == 0:
+                reports.append(self._sky(sec))
+            for line in reports:
+                if rng.random() < self.corrupt_rate:
+                    line = self._corrupt(line)
+                yield line
+            sec += 1
+
+
+def write_log(file_path, size, **options):
+    """Write a synthetic capture of about ``size`` bytes to ``file_path``
+
+    ``options`` are passed to GpsdLogGenerator. Returns a summary dict
+    with the bytes, lines and seconds of data written.
+    """
+    generator = GpsdLogGenerator(**options)
+    written = 0
+    lines = 0
+    buffer = []
+    buffered = 0
+    with open(file_path, "w", encoding="ascii", newline="") as f:
+        for line in generator.lines():
+            buffer.append(line)
+            buffered += len(line)
+            lines += 1
+            if written + buffered >= size:
+                break
+            if buffered >= 1 << 20:
+                f.write("".join(buffer))
+                written += buffered
+                buffer = []
+                buffered = 0
+        f.write("".join(buffer))
+        written += buffered
+    return {"path": file_path, "bytes": written, "lines": lines,
+            "satellites": len(generator.satellites), "seed": options.get("seed", 0)}
+
+
+def main(argv=None):
+    """Command line entry point"""
+    parser = argparse.ArgumentParser(description="Write a synthetic gpsd JSON log")
+    parser.add_argument("output", help="log file to write")
+    parser.add_argument("--size", default="10MB", help="approximate file size (e.g. 1MB, 10GB)")
+    parser.add_argument("--satellites", type=int, default=40, help="satellites in the constellation")
+    parser.add_argument("--sky-interval", type=int, default=1, help="seconds between SKY reports")
+    parser.add_argument("--gap-rate", type=float, default=1e-4, help="probability per second of an outage")
+    parser.add_argument("--corrupt-rate", type=float, default=1e-4, help="probability per line of corruption")
+    parser.add_argument("--seed", type=int, default=0, help="random seed")
+    args = parser.parse_args(argv)
+    summary = write_log(args.output, parse_size(args.size), satellites=args.satellites,
+                        sky_interval=args.sky_interval, gap_rate=args.gap_rate,
+                        corrupt_rate=args.corrupt_rate, seed=args.seed)
+    print(f"Wrote {summary['lines']} lines ({summary['bytes']} bytes) to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,435 @@
+#!/usr/bin/env python3
+"""
+Once-per-second host telemetry next to the gpsd data.
+
+``HostSampler`` opens its sources once and re-reads them in place with
+``pread`` on every sample:
+
+- ``/proc/interrupts``: the PPS IRQ row, to see which core took the pulses
+- ``/proc/stat``: busy and IRQ/softirq time per core
+- ``/sys/class/thermal/thermal_zone*/temp`` and the cpufreq current
+  frequencies, to see heating and throttling
+
+A sample is a few syscalls. Parsing works on reused byte buffers: a
+regular expression finds the rows of interest and only those rows are
+split. Pin the sampler to a housekeeping core (``--cpu``) so it does
+not disturb the cores kept clean for the PPS IRQ and chronyd.
+
+Samples go to a tab-separated log with an epoch ``time_ns`` column. A
+sample taken at ``t`` describes the interval ending at ``t``, so each
+PPS pulse is joined to the first sample at or after its edge:
+
+    python host_telemetry.py record --output host.tsv --cpu 0
+    python host_telemetry.py correlate host.tsv logs/*.json
+
+``proc_root`` and ``sys_root`` point the sampler at another tree, e.g.
+a fake ``proc``/``sys`` directory of plain files.
+"""
+
+import argparse
+import csv
+import glob
+import os
+import re
+import time
+
+import numpy as np
+
+from gps_time import NSEC_PER_SEC
+from gpsd_stream import collect_columns, read_columns
+from pps_analysis import analyze_pps
+from timejoin import asof_indices, take
+
+# Interrupt descriptions containing this (case-insensitive) are PPS IRQs
+DEFAULT_IRQ_PATTERN = "pps"
+
+# Sample this far into each interval, away from the PPS edge at the top of the second
+DEFAULT_PHASE_S = 0.5
+
+# /proc/stat per-core fields: user nice system idle iowait irq softirq steal
+_STAT_FIELDS = 8
+
+_STAT_ROW = re.compile(rb"^cpu(\d+) +([^\n]*)", re.M)
+
+
+def _interrupt_cpus(header):
+    """Return the CPU numbers of the /proc/interrupts columns (online CPUs only)"""
+    return [int(name[3:]) for name in header.split() if name.startswith(b"CPU") and name[3:].isdigit()]
+
+
+class ProcFile:
+    """A /proc or /sys file held open and re-read from the start into one buffer"""
+
+    def __init__(self, path, size=4096):
+        self.path = path
+        self._fd = os.open(path, os.O_RDONLY)
+        self._buffer = bytearray(size)
+
+    def read(self):
+        """Re-read the file, returning (buffer, length); the buffer is reused"""
+        length = 0
+        while True:
+            if length == len(self._buffer):
+                grown = bytearray(2 * len(self._buffer))
+                grown[:length] = self._buffer
+                self._buffer = grown
+            with memoryview(self._buffer) as view:
+                count = os.preadv(self._fd, [view[length:]], length)
+            if not count:
+                return self._buffer, length
+            length += count
+
+    def read_number(self):
+        """Re-read a file holding one integer (None if it cannot be parsed)"""
+        buffer, length = self.read()
+        try:
+            return int(buffer[:length])
+        except ValueError:
+            return None
+
+    def close(self):
+        os.close(self._fd)
+
+
+def _zone_name(zone_type, taken):
+    """Return a column-safe, unique name for a thermal zone type"""
+    name = re.sub(r"[^0-9A-Za-z]+", "_", zone_type).strip("_") or "zone"
+    unique = name
+    suffix = 1
+    while unique in taken:
+        unique = f"{name}{suffix}"
+        suffix += 1
+    return unique
+
+
+class HostSampler:
+    """Persistent readers of PPS IRQ counts, CPU time, temperatures and clocks"""
+
+    def __init__(self, proc_root="/proc", sys_root="/sys", irq=DEFAULT_IRQ_PATTERN):
+        self.interrupts = ProcFile(os.path.join(proc_root, "interrupts"), 65536)
+        self.stat = ProcFile(os.path.join(proc_root, "stat"), 16384)
+
+        buffer, length = self.interrupts.read()
+        text = bytes(buffer[:length])
+        header, _, body = text.partition(b"\n")
+        online = _interrupt_cpus(header)
+        # Both files list online CPUs only, and a core taken offline leaves
+        # a gap in the numbering, so columns are keyed by CPU number
+        stat_buffer, stat_length = self.stat.read()
+        self.cpus = sorted(set(online) | {int(match.group(1)) for match in
+                                          _STAT_ROW.finditer(stat_buffer, 0, stat_length)})
+        self._cpu_slot = {cpu: slot for slot, cpu in enumerate(self.cpus)}
+        self.irq_labels = _find_irqs(body, irq, len(online))
+        if not self.irq_labels:
+            print(f"No interrupt matching {irq!r} in {self.interrupts.path}; PPS IRQ columns stay empty")
+        labels = b"|".join(re.escape(label) for label in self.irq_labels) or b"(?!)"
+        self._irq_rows = re.compile(rb"^ *(?:" + labels + rb"):([^\n]*)", re.M)
+
+        self.zones = []
+        taken = set()
+        for zone_dir in sorted(glob.glob(os.path.join(sys_root, "class", "thermal", "thermal_zone*")),
+                               key=lambda path: int(re.sub(r"\D", "", os.path.basename(path)) or 0)):
+            try:
+                with open(os.path.join(zone_dir, "type")) as f:
+                    name = _zone_name(f.read().strip(), taken)
+                self.zones.append((name, ProcFile(os.path.join(zone_dir, "temp"), 64)))
+                taken.add(name)
+            except OSError:
+                continue
+
+        self.clocks = []
+        for cpu in self.cpus:
+            path = os.path.join(sys_root, "devices", "system", "cpu", f"cpu{cpu}", "cpufreq", "scaling_cur_freq")
+            if os.path.exists(path):
+                self.clocks.append((cpu, ProcFile(path, 64)))
+
+        self.columns = (["time_ns", "pps_irq", "pps_irq_cpu"]
+                        + [f"cpu{cpu}_{kind}" for cpu in self.cpus for kind in ("busy", "irq")]
+                        + [f"temp_{name}" for name, _ in self.zones]
+                        + [f"cpu{cpu}_mhz" for cpu, _ in self.clocks])
+        # Previous counters, updated in place by each sample
+        self._irq_counts = [None] * len(self.cpus)
+        self._cpu_times = [[0] * _STAT_FIELDS for _ in self.cpus]
+        self._read_irqs(self._irq_counts)
+        self._read_cpu_times(None)
+
+    def _read_irqs(self, previous):
+        """Return the PPS IRQs per core since the last sample, updating ``previous``
+
+        A core missing from this read (offline) counts zero and keeps its
+        previous total, which the kernel resumes from when it comes back;
+        a core first seen now counts zero as well.
+        """
+        buffer, length = self.interrupts.read()
+        online = _interrupt_cpus(buffer[:buffer.find(b"\n", 0, length)])
+        slots = [self._cpu_slot.get(cpu) for cpu in online]
+        counts = {}
+        for match in self._irq_rows.finditer(buffer, 0, length):
+            fields = match.group(1).split(None, len(online))
+            for slot, field in zip(slots, fields):
+                try:
+                    value = int(field)
+                except ValueError:
+                    break
+                if slot is not None:
+                    counts[slot] = counts.get(slot, 0) + value
+        deltas = [0] * len(previous)
+        for slot, count in counts.items():
+            if previous[slot] is not None:
+                deltas[slot] = count - previous[slot]
+            previous[slot] = count
+        return deltas
+
+    def _read_cpu_times(self, row):
+        """Write per-core busy and IRQ fractions since the last sample into ``row``"""
+        buffer, length = self.stat.read()
+        for match in _STAT_ROW.finditer(buffer, 0, length):
+            slot = self._cpu_slot.get(int(match.group(1)))
+            if slot is None:
+                continue
+            fields = match.group(2).split(None, _STAT_FIELDS)
+            before = self._cpu_times[slot]
+            total = idle = irq = 0
+            for index in range(min(_STAT_FIELDS, len(fields))):
+                value = int(fields[index])
+                delta = value - before[index]
+                before[index] = value
+                total += delta
+                if index in (3, 4):  # idle, iowait
+                    idle += delta
+                elif index in (5, 6):  # irq, softirq
+                    irq += delta
+            if row is not None and total > 0:
+                row[3 + 2 * slot] = round((total - idle) / total, 4)
+                row[4 + 2 * slot] = round(irq / total, 4)
+
+    def sample(self):
+        """Take one sample, returning its values in ``columns`` order
+
+        Counters are differences since the previous sample; a core that
+        is offline or did not tick reads NaN.
+        """
+        row = [np.nan] * len(self.columns)
+        row[0] = time.time_ns()
+        deltas = self._read_irqs(self._irq_counts)
+        total = sum(deltas)
+        row[1] = total if self.irq_labels else np.nan
+        row[2] = self.cpus[max(range(len(deltas)), key=deltas.__getitem__)] if total > 0 else -1
+        self._read_cpu_times(row)
+        column = 3 + 2 * len(self.cpus)
+        for _, zone in self.zones:
+            millidegrees = zone.read_number()
+            row[column] = millidegrees / 1000 if millidegrees is not None else np.nan
+            column += 1
+        for _, clock in self.clocks:
+            khz = clock.read_number()
+            row[column] = khz / 1000 if khz is not None else np.nan
+            column += 1
+        return row
+
+    def close(self):
+        """Close every held file"""
+        for source in [self.interrupts, self.stat] + [zone for _, zone in self.zones] + \
+                [clock for _, clock in self.clocks]:
+            source.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def _find_irqs(body, irq, cpus):
+    """Return the labels of /proc/interrupts rows matching an IRQ number or name"""
+    labels = []
+    pattern = irq.lower().encode()
+    for line in body.splitlines():
+        label, colon, rest = line.strip().partition(b":")
+        if not colon:
+            continue
+        description = rest.split(None, cpus)[-1] if len(rest.split()) > cpus else b""
+        if label == irq.encode() or pattern in description.lower():
+            labels.append(label)
+    return labels
+
+
+class TelemetryLog:
+    """Append-only tab-separated telemetry log"""
+
+    def __init__(self, log_path, columns, append=False):
+        if append and os.path.exists(log_path) and os.path.getsize(log_path):
+            with open(log_path, newline="") as f:
+                header = next(csv.reader(f, delimiter="\t"), None)
+            if header != list(columns):
+                raise ValueError(f"{log_path} has different columns; write to a new file")
+        self._file = open(log_path, "a" if append else "w", newline="")
+        self._writer = csv.writer(self._file, delimiter="\t", lineterminator="\n")
+        if self._file.tell() == 0:
+            self._writer.writerow(columns)
+
+    def write(self, row):
+        """Append one sample and push it to the file (for live readers)"""
+        self._writer.writerow(row)
+        self._file.flush()
+
+    def close(self):
+        """Close the log file"""
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def run_sampler(sampler, log, interval=1.0, phase=DEFAULT_PHASE_S, count=None):
+    """Sample at ``phase`` seconds into each wall-clock interval
+
+    Deadlines are absolute, so the sampler does not drift; intervals
+    missed (e.g. after a suspend) are skipped rather than caught up.
+    """
+    interval_ns = int(interval * NSEC_PER_SEC)
+    phase_ns = int(phase * NSEC_PER_SEC)
+    deadline = (time.time_ns() // interval_ns + 1) * interval_ns + phase_ns
+    taken = 0
+    while count is None or taken < count:
+        delay = deadline - time.time_ns()
+        if delay > 0:
+            time.sleep(delay / NSEC_PER_SEC)
+        log.write(sampler.sample())
+        taken += 1
+        deadline += interval_ns
+        now = time.time_ns()
+        if deadline <= now:
+            deadline = (now // interval_ns + 1) * interval_ns + phase_ns
+
+
+def read_telemetry(log_path):
+    """Read a telemetry log into columns (``time_ns`` int64, the rest float64)"""
+    with open(log_path, newline="") as f:
+        reader = csv.reader(f, delimiter="\t")
+        header = next(reader)
+        rows = list(reader)
+    if not rows:
+        return {name: np.array([], dtype=np.int64 if name == "time_ns" else np.float64) for name in header}
+    values = np.array(rows)
+    return {name: values[:, index].astype(np.int64 if name == "time_ns" else np.float64)
+            for index, name in enumerate(header)}
+
+
+def telemetry_at_pps(telemetry, edge_ns, tolerance_ns=2 * NSEC_PER_SEC):
+    """Return the telemetry of the sample covering each PPS edge (NaN if none)"""
+    index = asof_indices(edge_ns, telemetry["time_ns"], tolerance_ns, direction="forward")
+    return {name: take(values, index) for name, values in telemetry.items() if name != "time_ns"}
+
+
+def correlate(telemetry, pps):
+    """Summarise |PPS offset| against IRQ placement, temperature and load
+
+    Returns a dict with the matched pulse count, |offset| statistics per
+    PPS IRQ core, around IRQ migrations, and the correlation of |offset|
+    with every temperature, clock and load column.
+    """
+    # A migration is a sample whose PPS IRQ core differs from the previous sample's
+    cores = telemetry["pps_irq_cpu"]
+    moved = np.r_[False, (cores[1:] != cores[:-1]) & (cores[1:] >= 0) & (cores[:-1] >= 0)]
+    telemetry = dict(telemetry, pps_irq_moved=moved.astype(np.float64))
+
+    timing = analyze_pps(pps)
+    joined = telemetry_at_pps(telemetry, timing["edge_ns"])
+    magnitude = np.abs(timing["offset_ns"]).astype(np.float64)
+    matched = np.isfinite(joined["pps_irq_cpu"])
+
+    def stats(mask):
+        values = magnitude[mask]
+        if not len(values):
+            return {"pulses": 0}
+        return {"pulses": int(len(values)), "mean_ns": float(values.mean()),
+                "p99_ns": float(np.percentile(values, 99))}
+
+    irq_cpu = joined["pps_irq_cpu"]
+    by_cpu = {int(cpu): stats(matched & (irq_cpu == cpu)) for cpu in np.unique(irq_cpu[matched]) if cpu >= 0}
+    at_migration = matched & (joined["pps_irq_moved"] == 1)
+
+    correlation = {}
+    for name, values in joined.items():
+        if not name.startswith(("temp_", "cpu")):
+            continue
+        valid = matched & np.isfinite(values)
+        if valid.sum() > 2 and values[valid].std() > 0 and magnitude[valid].std() > 0:
+            correlation[name] = float(np.corrcoef(values[valid], magnitude[valid])[0, 1])
+
+    return {
+        "pulses": int(len(magnitude)),
+        "matched": int(matched.sum()),
+        "by_irq_cpu": by_cpu,
+        "migrations": int(moved.sum()),
+        "at_migration": stats(at_migration),
+        "elsewhere": stats(matched & ~at_migration),
+        "correlation": correlation,
+    }
+
+
+def _fmt_stats(stats):
+    if not stats["pulses"]:
+        return "no pulses"
+    return f"{stats['pulses']} pulses, mean {stats['mean_ns']:.0f} ns, p99 {stats['p99_ns']:.0f} ns"
+
+
+def main(argv=None):
+    """Command line entry point"""
+    parser = argparse.ArgumentParser(description="Sample host telemetry at 1 Hz and correlate it with PPS offsets")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    record = commands.add_parser("record", help="sample telemetry into a tab-separated log")
+    record.add_argument("--output", default="host_telemetry.tsv", help="telemetry log to write")
+    record.add_argument("--append", action="store_true", help="append to an existing log")
+    record.add_argument("--irq", default=DEFAULT_IRQ_PATTERN,
+                        help="PPS IRQ number, or text in its /proc/interrupts description")
+    record.add_argument("--interval", type=float, default=1.0, help="seconds between samples")
+    record.add_argument("--phase", type=float, default=DEFAULT_PHASE_S,
+                        help="seconds into each interval to sample")
+    record.add_argument("--count", type=int, help="stop after this many samples")
+    record.add_argument("--cpu", type=int, help="pin the sampler to this (housekeeping) core")
+    record.add_argument("--proc-root", default="/proc", help="proc filesystem to read")
+    record.add_argument("--sys-root", default="/sys", help="sys filesystem to read")
+
+    report = commands.add_parser("correlate", help="join a telemetry log with the PPS pulses of gpsd logs")
+    report.add_argument("telemetry", help="telemetry log")
+    report.add_argument("logs", nargs="+", help="gpsd JSON logs or capture segments")
+
+    args = parser.parse_args(argv)
+    if args.command == "record":
+        if args.cpu is not None:
+            os.sched_setaffinity(0, {args.cpu})
+        with HostSampler(args.proc_root, args.sys_root, args.irq) as sampler:
+            try:
+                log = TelemetryLog(args.output, sampler.columns, args.append)
+            except ValueError as e:
+                parser.error(str(e))
+            with log:
+                print(f"Sampling {len(sampler.columns) - 1} columns to {args.output} (Ctrl-C to stop)")
+                try:
+                    run_sampler(sampler, log, args.interval, args.phase, args.count)
+                except KeyboardInterrupt:
+                    pass
+        return
+
+    pps = collect_columns(("pps", read_columns(path, kinds=("pps",))["pps"]) for path in args.logs)["pps"]
+    result = correlate(read_telemetry(args.telemetry), pps)
+    print(f"Matched {result['matched']} of {result['pulses']} PPS pulses to telemetry samples")
+    for cpu, stats in sorted(result["by_irq_cpu"].items()):
+        print(f"  PPS IRQ on cpu{cpu}: {_fmt_stats(stats)}")
+    print(f"PPS IRQ migrations: {result['migrations']}")
+    print(f"  at a migration: {_fmt_stats(result['at_migration'])}")
+    print(f"  elsewhere:      {_fmt_stats(result['elsewhere'])}")
+    if result["correlation"]:
+        print("Correlation of |offset| with:")
+        for name, value in sorted(result["correlation"].items(), key=lambda item: -abs(item[1])):
+            print(f"  {name:<20} {value:+.3f}")
+
+
+if __name__ == "__main__":
+    main()
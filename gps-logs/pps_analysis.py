@@ -0,0 +1,94 @@
+"""
+Vectorized PPS timing-error analysis.
+
+gpsd reports each PPS edge as the "real" time of the pulse (``real_sec``,
+``real_nsec``) and the system clock reading captured when the pulse
+arrived (``clock_sec``, ``clock_nsec``). Everything here works on int64
+nanosecond arrays so offsets that straddle a second boundary come out
+as small signed values instead of wrapping to ~1e9 ns.
+"""
+
+import numpy as np
+
+NSEC_PER_SEC = 1_000_000_000
+
+
+def edge_time_ns(real_sec, real_nsec):
+    """Return the true time of each PPS edge in nanoseconds since the epoch"""
+    return np.asarray(real_sec, dtype=np.int64) * NSEC_PER_SEC + np.asarray(real_nsec, dtype=np.int64)
+
+
+def pps_offset_ns(real_sec, real_nsec, clock_sec, clock_nsec):
+    """Return the signed system clock offset at each PPS edge in nanoseconds
+
+    Positive values mean the system clock was ahead of the pulse.
+    """
+    real_sec = np.asarray(real_sec, dtype=np.int64)
+    clock_sec = np.asarray(clock_sec, dtype=np.int64)
+    return ((clock_sec - real_sec) * NSEC_PER_SEC
+            + np.asarray(clock_nsec, dtype=np.int64)
+            - np.asarray(real_nsec, dtype=np.int64))
+
+
+def period_jitter_ns(edge_ns, offset_ns):
+    """Return the period error of each pulse against the previous one
+
+    The period error is the measured pulse period minus the true period,
+    which is the change in offset between consecutive pulses. It is NaN
+    for the first pulse and after any missing pulse, where there is no
+    one-second period to compare against.
+    """
+    jitter = np.full(len(offset_ns), np.nan)
+    if len(offset_ns) > 1:
+        contiguous = np.diff(edge_ns) == NSEC_PER_SEC
+        jitter[1:] = np.where(contiguous, np.diff(offset_ns), np.nan)
+    return jitter
+
+
+def time_interval_error_ns(offset_ns):
+    """Return the time interval error relative to the first pulse"""
+    offset_ns = np.asarray(offset_ns, dtype=np.int64)
+    if not len(offset_ns):
+        return offset_ns.copy()
+    return offset_ns - offset_ns[0]
+
+
+def analyze_pps(pps):
+    """Compute timing-error series from PPS columns
+
+    ``pps`` holds the ``real_sec``/``real_nsec``/``clock_sec``/``clock_nsec``
+    columns produced by ``gpsd_stream``. Pulses are put in edge order
+    (merged logs may interleave) and duplicates are dropped. Returns a
+    dict of ``edge_ns``, ``offset_ns``, ``jitter_ns`` and ``tie_ns`` arrays.
+    """
+    edge_ns = edge_time_ns(pps["real_sec"], pps["real_nsec"])
+    offset_ns = pps_offset_ns(pps["real_sec"], pps["real_nsec"],
+                              pps["clock_sec"], pps["clock_nsec"])
+
+    if len(edge_ns) > 1 and np.any(np.diff(edge_ns) <= 0):
+        edge_ns, first = np.unique(edge_ns, return_index=True)
+        offset_ns = offset_ns[first]
+
+    return {
+        "edge_ns": edge_ns,
+        "offset_ns": offset_ns,
+        "jitter_ns": period_jitter_ns(edge_ns, offset_ns),
+        "tie_ns": time_interval_error_ns(offset_ns),
+    }
+
+
+def summarize_offsets(offset_ns):
+    """Return summary statistics of PPS offsets in nanoseconds"""
+    offset_ns = np.asarray(offset_ns, dtype=np.float64)
+    if not len(offset_ns):
+        return {}
+    p50, p99 = np.percentile(np.abs(offset_ns), [50, 99])
+    return {
+        "count": int(len(offset_ns)),
+        "mean_ns": float(offset_ns.mean()),
+        "std_ns": float(offset_ns.std()),
+        "rms_ns": float(np.sqrt(np.mean(offset_ns * offset_ns))),
+        "median_abs_ns": float(p50),
+        "p99_abs_ns": float(p99),
+        "max_abs_ns": float(np.abs(offset_ns).max()),
+    }
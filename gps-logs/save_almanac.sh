@@ -1,3 +1,5 @@
 #!/bin/bash
-timestamp=$(date +%Y%m%d%H%M%S)
-gpspipe -w -n 20 > ~/almanac_$timestamp.json
+# Append a short gpsd sample to the compressed capture in ~/captures (one
+# segment file per day, needs gpsd_capture.py and gps_time.py in ~).
+# `python3 ~/gpsd_capture.py export ~/captures` gives back gpspipe -w text.
+gpspipe -w -n 20 | python3 ~/gpsd_capture.py record ~/captures
@@ -0,0 +1,279 @@
+"""
+Mergeable summary sketches of per-file metrics.
+
+Each log file is reduced once to a small summary per metric: exact
+count/sum/min/max (``Moments``), a fixed-bin histogram for bounded
+metrics and a t-digest for quantiles and distribution shape. Summaries
+of any number of files merge in O(files) without the records, so
+aggregate views never concatenate every file's data, and summaries are
+plain JSON so they can be cached next to the parsed columns.
+
+The t-digest is the merging variant (Dunning & Ertl, 2019) with the k1
+scale function. Building and merging are vectorized: points are sorted,
+their cumulative weight mapped onto the scale and grouped by the
+integer part, so each centroid spans less than one unit of ``k`` and the
+tails keep small centroids.
+"""
+
+import numpy as np
+
+from pps_analysis import analyze_pps
+
+# Bump when the summary layout changes so cached summaries are rebuilt
+SUMMARY_VERSION = 1
+
+DEFAULT_COMPRESSION = 300
+
+# Metrics summarised per file: name -> (record kind, fixed histogram range and bins or None)
+METRICS = {
+    "offset_ns": ("pps", None),
+    "jitter_ns": ("pps", None),
+    "usage_ratio": ("sky", (0.0, 1.0, 20)),
+    "hdop": ("sky", None),
+    "vdop": ("sky", None),
+    "pdop": ("sky", None),
+    "eph": ("tpv", None),
+    "epv": ("tpv", None),
+}
+
+
+class Moments:
+    """Exact count, sum, sum of squares, min and max"""
+
+    def __init__(self, count=0, total=0.0, squares=0.0, minimum=np.inf, maximum=-np.inf):
+        self.count = count
+        self.total = total
+        self.squares = squares
+        self.min = minimum
+        self.max = maximum
+
+    @classmethod
+    def of(cls, values):
+        """Return the moments of an array of finite values"""
+        if not len(values):
+            return cls()
+        return cls(int(len(values)), float(values.sum()), float(values @ values),
+                   float(values.min()), float(values.max()))
+
+    def merge(self, other):
+        """Return the moments of both inputs combined"""
+        return Moments(self.count + other.count, self.total + other.total, self.squares + other.squares,
+                       min(self.min, other.min), max(self.max, other.max))
+
+    @property
+    def mean(self):
+        return self.total / self.count if self.count else np.nan
+
+    @property
+    def std(self):
+        """Population standard deviation"""
+        if not self.count:
+            return np.nan
+        return float(np.sqrt(max(self.squares / self.count - self.mean ** 2, 0.0)))
+
+    def to_dict(self):
+        return {"count": self.count, "sum": self.total, "sumsq": self.squares,
+                "min": self.min if self.count else None, "max": self.max if self.count else None}
+
+    @classmethod
+    def from_dict(cls, data):
+        if not data["count"]:
+            return cls()
+        return cls(data["count"], data["sum"], data["sumsq"], data["min"], data["max"])
+
+
+class FixedHistogram:
+    """Counts over fixed equal-width bins plus under- and overflow"""
+
+    def __init__(self, low, high, bins, counts=None, underflow=0, overflow=0):
+        self.low = low
+        self.high = high
+        self.bins = bins
+        self.counts = np.zeros(bins, dtype=np.int64) if counts is None else np.asarray(counts, dtype=np.int64)
+        self.underflow = underflow
+        self.overflow = overflow
+
+    @property
+    def edges(self):
+        return np.linspace(self.low, self.high, self.bins + 1)
+
+    def add(self, values):
+        """Count an array of finite values"""
+        index = np.floor((values - self.low) / (self.high - self.low) * self.bins).astype(np.int64)
+        # The top edge belongs to the last bin
+        index[values == self.high] = self.bins - 1
+        self.underflow += int(np.count_nonzero(index < 0))
+        self.overflow += int(np.count_nonzero(index >= self.bins))
+        inside = index[(index >= 0) & (index < self.bins)]
+        self.counts += np.bincount(inside, minlength=self.bins)
+        return self
+
+    def merge(self, other):
+        if (self.low, self.high, self.bins) != (other.low, other.high, other.bins):
+            raise ValueError("Histograms with different bins cannot be merged")
+        return FixedHistogram(self.low, self.high, self.bins, self.counts + other.counts,
+                              self.underflow + other.underflow, self.overflow + other.overflow)
+
+    def to_dict(self):
+        return {"low": self.low, "high": self.high, "bins": self.bins, "counts": self.counts.tolist(),
+                "underflow": self.underflow, "overflow": self.overflow}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data["low"], data["high"], data["bins"], data["counts"], data["underflow"], data["overflow"])
+
+
+def _k1(q, compression):
+    """The k1 scale function, which keeps centroids small near q = 0 and 1"""
+    return compression / (2 * np.pi) * np.arcsin(2 * np.clip(q, 0.0, 1.0) - 1)
+
+
+class TDigest:
+    """Mergeable quantile sketch of centroid means and weights"""
+
+    def __init__(self, compression=DEFAULT_COMPRESSION, means=None, weights=None):
+        self.compression = compression
+        self.means = np.empty(0) if means is None else np.asarray(means, dtype=np.float64)
+        self.weights = np.empty(0) if weights is None else np.asarray(weights, dtype=np.float64)
+
+    @classmethod
+    def of(cls, values, compression=DEFAULT_COMPRESSION):
+        """Return the digest of an array of finite values"""
+        return cls(compression)._compressed(values, np.ones(len(values)))
+
+    @property
+    def count(self):
+        return float(self.weights.sum())
+
+    def _compressed(self, means, weights):
+        """Return a digest of weighted points grouped into centroids"""
+        if not len(means):
+            return TDigest(self.compression)
+        order = np.argsort(means, kind="stable")
+        means = means[order]
+        weights = weights[order]
+        total = weights.sum()
+        cumulative = np.cumsum(weights)
+        # Group by the scale value of each point's midpoint quantile
+        k = _k1((cumulative - weights / 2) / total, self.compression)
+        group = np.floor(k - k[0]).astype(np.int64)
+        starts = np.flatnonzero(np.r_[True, group[1:] != group[:-1]])
+        group_weights = np.add.reduceat(weights, starts)
+        group_means = np.add.reduceat(means * weights, starts) / group_weights
+        return TDigest(self.compression, group_means, group_weights)
+
+    def merge(self, other):
+        """Return a digest of both inputs combined"""
+        return self._compressed(np.concatenate((self.means, other.means)),
+                                np.concatenate((self.weights, other.weights)))
+
+    def quantile(self, q, minimum=None, maximum=None):
+        """Estimate quantile(s) ``q`` (interpolated between centroid midpoints)"""
+        if not len(self.means):
+            return np.full(np.shape(q), np.nan) if np.ndim(q) else np.nan
+        cumulative = np.cumsum(self.weights)
+        positions = (cumulative - self.weights / 2) / cumulative[-1]
+        low = self.means[0] if minimum is None else minimum
+        high = self.means[-1] if maximum is None else maximum
+        return np.interp(q, np.r_[0.0, positions, 1.0], np.r_[low, self.means, high])
+
+    def to_dict(self):
+        return {"compression": self.compression, "means": self.means.tolist(), "weights": self.weights.tolist()}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data["compression"], data["means"], data["weights"])
+
+
+class MetricSummary:
+    """Moments, t-digest and optional fixed histogram of one metric"""
+
+    def __init__(self, moments=None, digest=None, histogram=None):
+        self.moments = moments or Moments()
+        self.digest = digest or TDigest()
+        self.histogram = histogram
+
+    @classmethod
+    def of(cls, values, histogram=None):
+        """Summarise an array, ignoring NaN; ``histogram`` is (low, high, bins)"""
+        values = np.asarray(values, dtype=np.float64)
+        values = values[np.isfinite(values)]
+        fixed = FixedHistogram(*histogram).add(values) if histogram else None
+        return cls(Moments.of(values), TDigest.of(values), fixed)
+
+    @property
+    def count(self):
+        return self.moments.count
+
+    def merge(self, other):
+        histogram = self.histogram
+        if histogram is not None and other.histogram is not None:
+            histogram = histogram.merge(other.histogram)
+        elif histogram is None:
+            histogram = other.histogram
+        return MetricSummary(self.moments.merge(other.moments), self.digest.merge(other.digest), histogram)
+
+    def quantile(self, q):
+        """Estimate quantile(s) ``q``, pinned to the exact min and max"""
+        if not self.count:
+            return np.full(np.shape(q), np.nan) if np.ndim(q) else np.nan
+        return self.digest.quantile(q, self.moments.min, self.moments.max)
+
+    @property
+    def median(self):
+        return float(self.quantile(0.5))
+
+    def to_dict(self):
+        return {"moments": self.moments.to_dict(), "digest": self.digest.to_dict(),
+                "histogram": self.histogram.to_dict() if self.histogram is not None else None}
+
+    @classmethod
+    def from_dict(cls, data):
+        histogram = FixedHistogram.from_dict(data["histogram"]) if data["histogram"] else None
+        return cls(Moments.from_dict(data["moments"]), TDigest.from_dict(data["digest"]), histogram)
+
+
+def metric_values(columns):
+    """Return the raw values of every summarised metric from parsed columns"""
+    values = {}
+    pps = columns["pps"]
+    if len(pps["real_sec"]):
+        timing = analyze_pps(pps)
+        values["offset_ns"] = timing["offset_ns"]
+        values["jitter_ns"] = timing["jitter_ns"]
+    sky = columns["sky"]
+    n_sat = np.asarray(sky["nSat"], dtype=np.float64)
+    seen = n_sat > 0
+    values["usage_ratio"] = np.asarray(sky["uSat"], dtype=np.float64)[seen] / n_sat[seen]
+    for name in ("hdop", "vdop", "pdop"):
+        values[name] = sky[name]
+    for name in ("eph", "epv"):
+        values[name] = columns["tpv"][name]
+    return values
+
+
+def summarize_columns(columns):
+    """Return {metric: MetricSummary} for one file's parsed columns"""
+    values = metric_values(columns)
+    return {name: MetricSummary.of(values.get(name, ()), histogram) for name, (_, histogram) in METRICS.items()}
+
+
+def merge_summaries(summaries):
+    """Merge per-file summaries into one, metric by metric"""
+    merged = {name: MetricSummary() for name in METRICS}
+    for summary in summaries:
+        for name, metric in summary.items():
+            merged[name] = merged[name].merge(metric) if name in merged else metric
+    return merged
+
+
+def summary_to_dict(summary):
+    """Return a JSON-serializable form of a summary"""
+    return {"version": SUMMARY_VERSION, "metrics": {name: metric.to_dict() for name, metric in summary.items()}}
+
+
+def summary_from_dict(data):
+    """Rebuild a summary from ``summary_to_dict`` output (None if outdated)"""
+    if data.get("version") != SUMMARY_VERSION:
+        return None
+    return {name: MetricSummary.from_dict(metric) for name, metric in data["metrics"].items()}
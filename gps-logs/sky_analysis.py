@@ -0,0 +1,148 @@
+"""
+Per-satellite analytics over the SAT columns decoded from SKY reports.
+
+All group-bys work on flat typed arrays: group keys are packed into one
+integer per observation and reduced with ``np.bincount``, so weeks of
+SKY data (tens of millions of satellite observations) are summarised
+without building a dict or DataFrame row per satellite.
+"""
+
+import numpy as np
+
+from gps_constellations import CONSTELLATIONS
+
+# gnssid values are small non-negative integers; -1 means "not reported"
+MAX_GNSSID = 16
+
+
+def _gnssid_slots(gnssid):
+    """Return the number of bincount slots needed for a gnssid array"""
+    return max(MAX_GNSSID, int(gnssid.max()) + 1 if len(gnssid) else 0)
+
+
+def constellation_name(gnssid):
+    """Return the constellation name for a gnssid"""
+    return CONSTELLATIONS.get(int(gnssid), f"gnssid {int(gnssid)}")
+
+
+def _tracked(sat):
+    """Return a mask of observations with a usable signal strength and elevation"""
+    ss = sat["ss"]
+    return np.isfinite(ss) & (ss > 0) & np.isfinite(sat["el"]) & (sat["gnssid"] >= 0)
+
+
+def _grouped_means(keys, values, size):
+    """Return (count, mean) per integer key in range(size)"""
+    counts = np.bincount(keys, minlength=size)
+    sums = np.bincount(keys, weights=values, minlength=size)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        means = sums / counts
+    return counts, means
+
+
+def cn0_vs_elevation(sat, bin_deg=5):
+    """Return mean C/N0 per constellation and elevation bin
+
+    Only tracked satellites (ss > 0) are included. Returns a dict of
+    ``gnssid``, ``elevation`` (bin centre), ``count`` and ``mean_ss``
+    arrays with one entry per non-empty (constellation, bin) group.
+    """
+    mask = _tracked(sat)
+    el = np.clip(sat["el"][mask], 0, 90)
+    n_bins = int(np.ceil(90 / bin_deg)) + 1
+    el_bin = (el // bin_deg).astype(np.int64)
+    gnssid = sat["gnssid"][mask].astype(np.int64)
+    keys = gnssid * n_bins + el_bin
+    counts, means = _grouped_means(keys, sat["ss"][mask].astype(np.float64),
+                                   _gnssid_slots(gnssid) * n_bins)
+    groups = np.flatnonzero(counts)
+    return {
+        "gnssid": groups // n_bins,
+        "elevation": (groups % n_bins) * bin_deg + bin_deg / 2,
+        "count": counts[groups],
+        "mean_ss": means[groups],
+    }
+
+
+def constellation_usage(sat):
+    """Return per-constellation visibility, usage and signal statistics
+
+    ``visible`` and ``used`` are average satellites per SKY report, so
+    they are comparable across captures of different lengths.
+    """
+    valid = sat["gnssid"] >= 0
+    gnssid = sat["gnssid"][valid].astype(np.int64)
+    used = sat["used"][valid]
+    # Rows of one report are contiguous, so each change of sky_index starts
+    # a new report (this also holds across concatenated files)
+    sky_index = sat["sky_index"]
+    epochs = int(np.count_nonzero(sky_index[1:] != sky_index[:-1])) + 1 if len(sky_index) else 0
+
+    slots = _gnssid_slots(gnssid)
+    visible_counts = np.bincount(gnssid, minlength=slots)
+    used_counts = np.bincount(gnssid[used], minlength=slots)
+    mask = _tracked(sat)
+    _, mean_ss = _grouped_means(sat["gnssid"][mask].astype(np.int64),
+                                sat["ss"][mask].astype(np.float64), slots)
+
+    groups = np.flatnonzero(visible_counts)
+    epochs = max(epochs, 1)
+    return {
+        "gnssid": groups,
+        "visible": visible_counts[groups] / epochs,
+        "used": used_counts[groups] / epochs,
+        "used_ratio": used_counts[groups] / visible_counts[groups],
+        "mean_ss": mean_ss[groups],
+    }
+
+
+def per_satellite_stats(sat):
+    """Return observation count, usage ratio, mean C/N0 and max elevation per satellite"""
+    valid = sat["gnssid"] >= 0
+    gnssid = sat["gnssid"][valid].astype(np.int64)
+    svid = sat["svid"][valid].astype(np.int64)
+    keys = gnssid * 1024 + svid
+    unique_keys, inverse = np.unique(keys, return_inverse=True)
+    size = len(unique_keys)
+
+    counts = np.bincount(inverse, minlength=size)
+    used = np.bincount(inverse, weights=sat["used"][valid], minlength=size)
+    ss = sat["ss"][valid].astype(np.float64)
+    tracked = np.isfinite(ss) & (ss > 0)
+    tracked_counts, mean_ss = _grouped_means(inverse[tracked], ss[tracked], size)
+    max_el = np.full(size, -np.inf)
+    np.maximum.at(max_el, inverse, np.nan_to_num(sat["el"][valid].astype(np.float64), nan=-np.inf))
+
+    return {
+        "gnssid": unique_keys // 1024,
+        "svid": unique_keys % 1024,
+        "count": counts,
+        "used_ratio": used / counts,
+        "tracked": tracked_counts,
+        "mean_ss": mean_ss,
+        "max_el": max_el,
+    }
+
+
+def sky_heatmap(sat, az_bins=36, el_bins=9, used_only=False):
+    """Return (az_edges, el_edges, counts, mean_ss) grids for a sky plot
+
+    Grids are indexed ``[el_bin, az_bin]`` with azimuth in degrees from
+    north and elevation from the horizon. ``mean_ss`` is NaN in cells with
+    no tracked observations.
+    """
+    mask = _tracked(sat) & np.isfinite(sat["az"])
+    if used_only:
+        mask &= sat["used"]
+    az = np.mod(sat["az"][mask].astype(np.float64), 360)
+    el = np.clip(sat["el"][mask].astype(np.float64), 0, 90)
+    az_idx = np.minimum((az / 360 * az_bins).astype(np.int64), az_bins - 1)
+    el_idx = np.minimum((el / 90 * el_bins).astype(np.int64), el_bins - 1)
+    keys = el_idx * az_bins + az_idx
+    counts, means = _grouped_means(keys, sat["ss"][mask].astype(np.float64), az_bins * el_bins)
+    return (
+        np.linspace(0, 360, az_bins + 1),
+        np.linspace(0, 90, el_bins + 1),
+        counts.reshape(el_bins, az_bins),
+        means.reshape(el_bins, az_bins),
+    )
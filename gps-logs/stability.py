@@ -0,0 +1,140 @@
+"""
+Clock stability statistics over time-error (phase) data.
+
+Computes overlapping Allan deviation (ADEV), modified Allan deviation
+(MDEV), time deviation (TDEV) and maximum time interval error (MTIE)
+at octave-spaced averaging factors. Each factor costs a handful of O(N)
+NumPy passes (prefix sums for MDEV, a doubling sliding max/min for
+MTIE), so a full analysis is O(N log N).
+
+Missing samples split the data into contiguous segments; the sums of
+every segment are pooled, which gives the same result as skipping every
+term that would touch a gap.
+"""
+
+import numpy as np
+
+NSEC_PER_SEC = 1_000_000_000
+
+
+def octave_factors(n):
+    """Return averaging factors 1, 2, 4, ... usable with n phase samples"""
+    factors = []
+    m = 1
+    while 2 * m < n:
+        factors.append(m)
+        m *= 2
+    return np.array(factors, dtype=np.int64)
+
+
+def contiguous_segments(sample_index):
+    """Yield (start, stop) slices of runs of consecutive sample indices"""
+    if not len(sample_index):
+        return
+    breaks = np.flatnonzero(np.diff(sample_index) != 1) + 1
+    starts = np.concatenate(([0], breaks))
+    stops = np.concatenate((breaks, [len(sample_index)]))
+    yield from zip(starts, stops)
+
+
+def _window_sums(prefix, m, offset, count):
+    """Return sums of x[j + offset:j + offset + m] for j in range(count)"""
+    return prefix[offset + m:offset + m + count] - prefix[offset:offset + count]
+
+
+def _sliding_extremes(x, factors):
+    """Return the largest max-min spread over windows of m+1 samples
+
+    Uses a doubling table: after k steps ``hi[i]``/``lo[i]`` hold the
+    max/min of ``x[i:i + 2**k]``, and any window of length w is covered
+    by two overlapping power-of-two windows.
+    """
+    spreads = np.full(len(factors), np.nan)
+    hi = lo = x
+    width = 1
+    for idx, m in enumerate(factors):
+        window = m + 1
+        if window > len(x):
+            break
+        while 2 * width <= window:
+            hi = np.maximum(hi[:-width], hi[width:])
+            lo = np.minimum(lo[:-width], lo[width:])
+            width *= 2
+        count = len(x) - window + 1
+        shift = window - width
+        spread = (np.maximum(hi[:count], hi[shift:shift + count])
+                  - np.minimum(lo[:count], lo[shift:shift + count]))
+        spreads[idx] = spread.max()
+    return spreads
+
+
+def stability_analysis(sample_index, phase, tau0=1.0, factors=None):
+    """Compute ADEV, MDEV, TDEV and MTIE from phase (time error) samples
+
+    ``sample_index`` gives each sample's position on a regular grid with
+    spacing ``tau0`` seconds (for 1 Hz PPS, the integer second of the
+    pulse) and must be strictly increasing. ``phase`` is the time error
+    in seconds. Returns a dict of arrays keyed by ``tau``, ``adev``,
+    ``mdev``, ``tdev``, ``mtie`` and ``n`` (number of ADEV terms).
+    """
+    sample_index = np.asarray(sample_index, dtype=np.int64)
+    phase = np.asarray(phase, dtype=np.float64)
+    if factors is None:
+        factors = octave_factors(len(phase))
+    factors = np.asarray(factors, dtype=np.int64)
+
+    adev_sum = np.zeros(len(factors))
+    adev_n = np.zeros(len(factors), dtype=np.int64)
+    mdev_sum = np.zeros(len(factors))
+    mdev_n = np.zeros(len(factors), dtype=np.int64)
+    mtie = np.full(len(factors), np.nan)
+
+    for start, stop in contiguous_segments(sample_index):
+        # Statistics are offset invariant; centring keeps prefix sums small
+        x = phase[start:stop] - phase[start:stop].mean()
+        n = len(x)
+        prefix = np.concatenate(([0.0], np.cumsum(x)))
+
+        for idx, m in enumerate(factors):
+            if n > 2 * m:
+                d = x[2 * m:] - 2 * x[m:n - m] + x[:n - 2 * m]
+                adev_sum[idx] += d @ d
+                adev_n[idx] += len(d)
+            if n >= 3 * m:
+                count = n - 3 * m + 1
+                d = (_window_sums(prefix, m, 2 * m, count)
+                     - 2 * _window_sums(prefix, m, m, count)
+                     + _window_sums(prefix, m, 0, count))
+                mdev_sum[idx] += d @ d
+                mdev_n[idx] += count
+
+        segment_mtie = _sliding_extremes(x, factors)
+        mtie = np.fmax(mtie, segment_mtie)
+
+    tau = factors * tau0
+    with np.errstate(divide="ignore", invalid="ignore"):
+        adev = np.sqrt(adev_sum / (2.0 * tau ** 2 * adev_n))
+        mdev = np.sqrt(mdev_sum / (2.0 * factors ** 2 * tau ** 2 * mdev_n))
+    tdev = tau / np.sqrt(3.0) * mdev
+
+    return {
+        "tau": tau,
+        "adev": np.where(adev_n > 0, adev, np.nan),
+        "mdev": np.where(mdev_n > 0, mdev, np.nan),
+        "tdev": np.where(mdev_n > 0, tdev, np.nan),
+        "mtie": mtie,
+        "n": adev_n,
+    }
+
+
+def pps_stability(real_sec, offset_ns, factors=None):
+    """Compute stability statistics from 1 Hz PPS offsets in nanoseconds"""
+    real_sec = np.asarray(real_sec, dtype=np.int64)
+    offset_ns = np.asarray(offset_ns, dtype=np.int64)
+    order = np.argsort(real_sec, kind="stable")
+    real_sec, first = np.unique(real_sec[order], return_index=True)
+    phase = offset_ns[order][first] / NSEC_PER_SEC
+    if factors is None:
+        spans = [stop - start for start, stop in contiguous_segments(real_sec)]
+        factors = octave_factors(max(spans, default=0))
+    return stability_analysis(real_sec, phase, 1.0, factors)
@@ -0,0 +1,316 @@
+#!/usr/bin/env python3
+"""
+Survey-in of a fixed antenna position from TPV fixes.
+
+A timing receiver in time mode needs the precise position of its
+antenna. ``SurveyEstimator`` folds in TPV columns chunk by chunk: the
+fixes are converted to ECEF, then to a local east/north/up frame, and
+averaged with weights of 1/eph^2 (east, north) and 1/epv^2 (up). Each
+chunk is screened against the estimate so far (the chunk's median
+before there is one). A fix is rejected when it lies more than
+``threshold`` times the larger of its own error estimate and the
+scatter of the accepted fixes from the estimate. Only running sums and
+a decimated convergence curve are kept, so memory stays bounded over
+weeks of 1 Hz fixes.
+
+Successive fixes are strongly correlated, because multipath and the
+atmosphere change over minutes. The uncertainty of the mean therefore
+counts one independent sample per ``decorrelation_s`` of survey time,
+not one per fix.
+
+    python survey.py logs/*.json --curve survey.tsv
+"""
+
+import argparse
+import csv
+
+import numpy as np
+
+from gps_time import NAT_NS, NSEC_PER_SEC
+from gpsd_stream import classes_for_kinds, iter_column_chunks, iter_records
+from timejoin import sort_by_time
+
+# WGS84 ellipsoid
+WGS84_A = 6378137.0
+WGS84_F = 1 / 298.257223563
+WGS84_B = WGS84_A * (1 - WGS84_F)
+WGS84_E2 = WGS84_F * (2 - WGS84_F)
+
+# Error (m) assumed for fixes that report no eph/epv, so they weigh little
+DEFAULT_ERROR_M = 10.0
+
+# Fixes with fewer than this many accepted before them use the chunk median as the centre
+WARMUP_FIXES = 30
+
+CURVE_FIELDS = ("time_ns", "east", "north", "up", "sigma_h", "sigma_v", "accepted")
+
+
+def geodetic_to_ecef(lat, lon, height):
+    """Convert WGS84 latitude/longitude (degrees) and ellipsoidal height (m) to ECEF (m)"""
+    lat = np.radians(lat)
+    lon = np.radians(lon)
+    sin_lat = np.sin(lat)
+    cos_lat = np.cos(lat)
+    n = WGS84_A / np.sqrt(1 - WGS84_E2 * sin_lat ** 2)
+    return np.stack([(n + height) * cos_lat * np.cos(lon),
+                     (n + height) * cos_lat * np.sin(lon),
+                     (n * (1 - WGS84_E2) + height) * sin_lat], axis=-1)
+
+
+def ecef_to_geodetic(xyz):
+    """Convert ECEF (m) to WGS84 (lat, lon, height) using Bowring's formula
+
+    Accurate to well under a millimetre for points near the surface.
+    """
+    x, y, z = np.moveaxis(np.asarray(xyz, dtype=np.float64), -1, 0)
+    p = np.hypot(x, y)
+    second_e2 = (WGS84_A ** 2 - WGS84_B ** 2) / WGS84_B ** 2
+    theta = np.arctan2(z * WGS84_A, p * WGS84_B)
+    lat = np.arctan2(z + second_e2 * WGS84_B * np.sin(theta) ** 3,
+                     p - WGS84_E2 * WGS84_A * np.cos(theta) ** 3)
+    n = WGS84_A / np.sqrt(1 - WGS84_E2 * np.sin(lat) ** 2)
+    height = p / np.cos(lat) - n
+    return np.degrees(lat), np.degrees(np.arctan2(y, x)), height
+
+
+def enu_rotation(lat, lon):
+    """Return the matrix whose rows are the east, north and up unit vectors at a point"""
+    lat = np.radians(lat)
+    lon = np.radians(lon)
+    return np.array([
+        [-np.sin(lon), np.cos(lon), 0.0],
+        [-np.sin(lat) * np.cos(lon), -np.sin(lat) * np.sin(lon), np.cos(lat)],
+        [np.cos(lat) * np.cos(lon), np.cos(lat) * np.sin(lon), np.sin(lat)],
+    ])
+
+
+def fix_heights(tpv):
+    """Return ellipsoidal heights, falling back to MSL ``alt`` where altHAE is missing
+
+    The fallback is off by the local geoid separation, which shifts the
+    height of the mean but not the horizontal position.
+    """
+    alt = np.asarray(tpv["alt"], dtype=np.float64)
+    if "altHAE" not in tpv:
+        return alt
+    hae = np.asarray(tpv["altHAE"], dtype=np.float64)
+    return np.where(np.isfinite(hae), hae, alt)
+
+
+def local_offsets(tpv, lat, lon, height):
+    """Return (east, north, up) metres of each fix from a reference point"""
+    ecef = geodetic_to_ecef(np.asarray(tpv["lat"], dtype=np.float64),
+                            np.asarray(tpv["lon"], dtype=np.float64), fix_heights(tpv))
+    enu = (ecef - geodetic_to_ecef(lat, lon, height)) @ enu_rotation(lat, lon).T
+    return enu[:, 0], enu[:, 1], enu[:, 2]
+
+
+def _errors(values):
+    """Return per-fix error estimates, substituting the default where unknown"""
+    values = np.asarray(values, dtype=np.float64)
+    return np.where(np.isfinite(values) & (values > 0), values, DEFAULT_ERROR_M)
+
+
+class SurveyEstimator:
+    """Streaming eph-weighted robust mean of TPV fixes"""
+
+    def __init__(self, threshold=4.0, min_mode=3, decorrelation_s=600.0,
+                 curve_interval_s=60.0, max_curve_points=2048):
+        self.threshold = threshold
+        self.min_mode = min_mode
+        self.decorrelation_s = decorrelation_s
+        self.curve_interval_ns = int(curve_interval_s * NSEC_PER_SEC)
+        self.max_curve_points = max_curve_points
+        self.accepted = 0
+        self.rejected = 0
+        self.first_ns = None
+        self.last_ns = None
+        # Local frame around the first fixes, so the sums stay small numbers
+        self._origin = None
+        self._rotation = None
+        self._weights = np.zeros(3)
+        self._weighted = np.zeros(3)
+        self._squares = np.zeros(3)
+        self._last_bucket = -1
+        self._curve = {name: [] for name in CURVE_FIELDS}
+
+    def update(self, tpv):
+        """Fold in a chunk of TPV columns (any order within the chunk)"""
+        tpv = sort_by_time(tpv)
+        lat = np.asarray(tpv["lat"], dtype=np.float64)
+        lon = np.asarray(tpv["lon"], dtype=np.float64)
+        height = fix_heights(tpv)
+        time_ns = np.asarray(tpv["time_ns"])
+        usable = ((np.asarray(tpv["mode"]) >= self.min_mode) & (time_ns != NAT_NS)
+                  & np.isfinite(lat) & np.isfinite(lon) & np.isfinite(height))
+        if not usable.any():
+            return self
+        ecef = geodetic_to_ecef(lat[usable], lon[usable], height[usable])
+        if self._origin is None:
+            self._origin = np.median(ecef, axis=0)
+            self._rotation = enu_rotation(*ecef_to_geodetic(self._origin)[:2])
+        enu = (ecef - self._origin) @ self._rotation.T
+        errors = np.column_stack([_errors(tpv["eph"][usable])] * 2 + [_errors(tpv["epv"][usable])])
+
+        keep = self._screen(enu, errors)
+        self.rejected += int(np.count_nonzero(~keep))
+        if not keep.any():
+            return self
+        enu = enu[keep]
+        weights = 1.0 / errors[keep] ** 2
+        time_ns = time_ns[usable][keep]
+        if self.first_ns is None:
+            self.first_ns = int(time_ns[0])
+
+        # Running totals after every fix of the chunk, for the convergence curve
+        cum_weights = self._weights + np.cumsum(weights, axis=0)
+        cum_weighted = self._weighted + np.cumsum(weights * enu, axis=0)
+        cum_squares = self._squares + np.cumsum(weights * enu ** 2, axis=0)
+        cum_accepted = self.accepted + np.arange(1, len(enu) + 1)
+        self._sample_curve(time_ns, cum_weights, cum_weighted, cum_squares, cum_accepted)
+
+        self._weights = cum_weights[-1]
+        self._weighted = cum_weighted[-1]
+        self._squares = cum_squares[-1]
+        self.accepted = int(cum_accepted[-1])
+        self.last_ns = int(time_ns[-1]) if self.last_ns is None else max(self.last_ns, int(time_ns[-1]))
+        return self
+
+    def _screen(self, enu, errors):
+        """Return the mask of fixes close enough to the current centre"""
+        if self.accepted >= WARMUP_FIXES:
+            center = self._weighted / self._weights
+            scatter = np.sqrt(self._variance(self._weights, self._weighted, self._squares))
+        else:
+            center = np.median(enu, axis=0)
+            # Median absolute deviation scaled to a normal sigma
+            scatter = 1.4826 * np.median(np.abs(enu - center), axis=0)
+        residual = enu - center
+        scale = np.maximum(errors, scatter)
+        horizontal = np.hypot(residual[:, 0], residual[:, 1]) <= self.threshold * np.hypot(scale[:, 0], scale[:, 1])
+        vertical = np.abs(residual[:, 2]) <= self.threshold * scale[:, 2]
+        return horizontal & vertical
+
+    @staticmethod
+    def _variance(weights, weighted, squares):
+        """Weighted variance per axis from running sums"""
+        mean = weighted / weights
+        return np.maximum(squares / weights - mean ** 2, 0.0)
+
+    def _uncertainty(self, weights, weighted, squares, accepted, span_ns):
+        """Return (sigma_h, sigma_v) of the mean given correlated fixes"""
+        variance = self._variance(weights, weighted, squares)
+        independent = np.clip(span_ns / (self.decorrelation_s * NSEC_PER_SEC), 1, accepted)
+        # One fix says nothing about the scatter
+        single = np.asarray(accepted) < 2
+        return (np.where(single, np.nan, np.sqrt((variance[..., 0] + variance[..., 1]) / independent)),
+                np.where(single, np.nan, np.sqrt(variance[..., 2] / independent)))
+
+    def _sample_curve(self, time_ns, weights, weighted, squares, accepted):
+        """Record the estimate at the first fix of each new curve interval"""
+        bucket = (time_ns - self.first_ns) // self.curve_interval_ns
+        new = np.flatnonzero(np.diff(np.r_[self._last_bucket, bucket]) > 0)
+        if not len(new):
+            return
+        self._last_bucket = int(bucket[-1])
+        mean = weighted[new] / weights[new]
+        sigma_h, sigma_v = self._uncertainty(weights[new], weighted[new], squares[new], accepted[new],
+                                             time_ns[new] - self.first_ns)
+        for name, values in zip(CURVE_FIELDS, (time_ns[new], mean[:, 0], mean[:, 1], mean[:, 2],
+                                               sigma_h, sigma_v, accepted[new])):
+            self._curve[name].extend(values.tolist())
+        if len(self._curve["time_ns"]) > self.max_curve_points:
+            # Halve the resolution so the curve stays bounded over any survey length
+            for name in CURVE_FIELDS:
+                del self._curve[name][1::2]
+            self.curve_interval_ns *= 2
+            self._last_bucket = int((self._curve["time_ns"][-1] - self.first_ns) // self.curve_interval_ns)
+
+    def position(self):
+        """Return the surveyed position and its uncertainty (None before any fix)"""
+        if not self.accepted:
+            return None
+        mean = self._weighted / self._weights
+        ecef = self._origin + mean @ self._rotation
+        lat, lon, height = ecef_to_geodetic(ecef)
+        sigma_h, sigma_v = self._uncertainty(self._weights, self._weighted, self._squares,
+                                             self.accepted, self.last_ns - self.first_ns)
+        scatter = np.sqrt(self._variance(self._weights, self._weighted, self._squares))
+        return {
+            "lat": float(lat), "lon": float(lon), "height": float(height),
+            "x": float(ecef[0]), "y": float(ecef[1]), "z": float(ecef[2]),
+            "sigma_h": float(sigma_h), "sigma_v": float(sigma_v),
+            "scatter_h": float(np.hypot(scatter[0], scatter[1])), "scatter_v": float(scatter[2]),
+            "accepted": self.accepted, "rejected": self.rejected,
+            "span_s": (self.last_ns - self.first_ns) / NSEC_PER_SEC,
+        }
+
+    def curve(self):
+        """Return the convergence curve as columns, ending at the latest estimate
+
+        ``east``/``north``/``up`` are metres from the final estimate.
+        """
+        curve = {name: np.array(values) for name, values in self._curve.items()}
+        if not self.accepted:
+            return curve
+        if not len(curve["time_ns"]) or curve["time_ns"][-1] != self.last_ns:
+            position = self.position()
+            latest = (self.last_ns, *(self._weighted / self._weights),
+                      position["sigma_h"], position["sigma_v"], self.accepted)
+            curve = {name: np.append(values, value) for (name, values), value in zip(curve.items(), latest)}
+        final = self._weighted / self._weights
+        for axis, name in enumerate(("east", "north", "up")):
+            curve[name] = curve[name] - final[axis]
+        return curve
+
+
+def survey_files(paths, estimator=None, start_ns=None, end_ns=None):
+    """Run the TPV fixes of logs through one estimator, a chunk at a time"""
+    estimator = estimator or SurveyEstimator()
+    classes = classes_for_kinds(("tpv",))
+    for file_path in paths:
+        records = iter_records(file_path, classes, start_ns, end_ns)
+        for _, tpv in iter_column_chunks(records, kinds=("tpv",)):
+            estimator.update(tpv)
+    return estimator
+
+
+def write_curve(curve, curve_path):
+    """Write the convergence curve as a tab-separated file"""
+    with open(curve_path, "w", newline="") as f:
+        writer = csv.writer(f, delimiter="\t", lineterminator="\n")
+        writer.writerow(CURVE_FIELDS)
+        writer.writerows(zip(*(curve[name].tolist() for name in CURVE_FIELDS)))
+
+
+def main(argv=None):
+    """Command line entry point"""
+    parser = argparse.ArgumentParser(description="Survey in a fixed antenna position from gpsd TPV fixes")
+    parser.add_argument("logs", nargs="+", help="gpsd JSON logs or capture segments")
+    parser.add_argument("--threshold", type=float, default=4.0,
+                        help="error estimates (or scatters) from the estimate beyond which a fix is rejected")
+    parser.add_argument("--min-mode", type=int, default=3, help="lowest TPV mode used (3 = 3D fix)")
+    parser.add_argument("--decorrelation", type=float, default=600.0,
+                        help="seconds of survey counted as one independent sample")
+    parser.add_argument("--curve", help="write the convergence curve to this TSV file")
+    args = parser.parse_args(argv)
+
+    estimator = survey_files(args.logs, SurveyEstimator(args.threshold, args.min_mode, args.decorrelation))
+    position = estimator.position()
+    if position is None:
+        print("No usable fixes found")
+        return
+    print(f"Latitude:  {position['lat']:.9f}")
+    print(f"Longitude: {position['lon']:.9f}")
+    print(f"Height:    {position['height']:.3f} m (ellipsoidal)")
+    print(f"ECEF:      {position['x']:.3f} {position['y']:.3f} {position['z']:.3f} m")
+    print(f"Sigma:     {position['sigma_h']:.3f} m horizontal, {position['sigma_v']:.3f} m vertical")
+    print(f"Fixes:     {position['accepted']} used, {position['rejected']} rejected "
+          f"over {position['span_s'] / 3600:.1f} h")
+    if args.curve:
+        write_curve(estimator.curve(), args.curve)
+        print(f"Wrote the convergence curve to {args.curve}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,38 @@
+import json
+
+import pytest
+
+from gps_api import create_app
+from gps_store import GpsStore
+from gpsd_stream import read_columns
+from gpsd_synth import write_log
+
+
+@pytest.fixture
+def client(tmp_path):
+    # Long outages spread a few minutes of data over several hours
+    log_path = str(tmp_path / "synthetic.json")
+    write_log(log_path, 200_000, satellites=8, corrupt_rate=0, gap_rate=0.05, max_gap=3600)
+    db_path = str(tmp_path / "gps.db")
+    with GpsStore(db_path) as store:
+        store.ingest_file(log_path, read_columns(log_path))
+    return create_app(db_path).test_client()
+
+
+@pytest.mark.parametrize("method", ["lttb", "minmax"])
+def test_rollup_series_honours_point_budget(client, method):
+    response = client.get(f"/api/series/sky?fields=hdop&points=3&method={method}")
+    body = json.loads(response.get_data())
+
+    assert body["resolution"] == "1h"
+    assert body["total"] > 3
+    assert len(body["time_ns"]) == body["points"] <= 3
+    assert len(body["hdop_max"]) == body["points"]
+
+
+def test_raw_series_honours_point_budget(client):
+    body = json.loads(client.get("/api/series/pps?fields=offset_ns,jitter_ns&points=50").get_data())
+
+    assert body["resolution"] == "raw"
+    assert body["total"] > 50
+    assert len(body["time_ns"]) == len(body["jitter_ns"]) <= 50
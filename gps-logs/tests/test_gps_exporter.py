@@ -0,0 +1,59 @@
+from gps_exporter import GpsMetrics
+from gpsd_client import GpsdState
+
+TPV = {"class": "TPV", "mode": 3, "lat": 1.0, "lon": 2.0}
+SKY = {"class": "SKY", "hdop": 0.8, "satellites": [{"gnssid": 0, "used": True}, {"gnssid": 2, "used": False}]}
+PPS = {"class": "PPS", "real_sec": 10, "real_nsec": 0, "clock_sec": 10, "clock_nsec": 150}
+
+
+def _samples(metrics):
+    return [line for line in metrics.render().splitlines() if not line.startswith("#")]
+
+
+def _connected_metrics():
+    state = GpsdState()
+    metrics = GpsMetrics(state)
+    state.connected = True
+    for record in (TPV, SKY, PPS):
+        state.update(record)
+    return state, metrics
+
+
+def test_exports_connection_state_and_report_age():
+    state, metrics = _connected_metrics()
+    samples = _samples(metrics)
+    assert "gpsd_up 1" in samples
+    assert "gps_fix_mode 3" in samples
+    assert "gps_pps_offset_seconds 1.5e-07" in samples
+    assert 'gps_satellites_used{constellation="GPS"} 1' in samples
+    ages = [line for line in samples if line.startswith("gps_report_age_seconds")]
+    assert sorted(line.split('"')[1] for line in ages) == ["PPS", "SKY", "TPV"]
+
+    state.updated["TPV"] -= 60
+    age = next(line for line in _samples(metrics) if line.startswith('gps_report_age_seconds{class="TPV"}'))
+    assert float(age.split()[1]) >= 60
+
+
+def test_drops_report_gauges_when_gpsd_goes_away():
+    state, metrics = _connected_metrics()
+    state.connected = False
+    state.clear()
+    samples = _samples(metrics)
+    assert "gpsd_up 0" in samples
+    assert "gps_fix_mode 0" in samples
+    assert not [line for line in samples if line.startswith(
+        ("gps_report_age_seconds", "gps_pps_offset_seconds", "gps_position", "gps_dop", "gps_satellites"))]
+    # Counters and the offset histogram are cumulative and survive the disconnect
+    assert 'gps_reports_total{class="PPS"} 1' in samples
+    assert "gps_pps_offset_abs_seconds_count 1" in samples
+
+
+def test_offset_window_starts_over_after_reconnect():
+    state, metrics = _connected_metrics()
+    state.connected = False
+    state.clear()
+    state.connected = True
+    state.update(dict(PPS, real_sec=20, clock_sec=19, clock_nsec=999_999_900))
+    samples = _samples(metrics)
+    assert 'gps_pps_offset_window_seconds{stat="max"} -1e-07' in samples
+    assert 'gps_pps_offset_window_seconds{stat="min"} -1e-07' in samples
@@ -0,0 +1,39 @@
+from gps_fleet import DEFAULT_REMOTE_ROOT, read_inventory
+
+INVENTORY = """\
+ungrouped.example
+
+[time_servers]
+# comment
+pi1 ansible_host=10.0.0.1 pps_source=gpio18
+pi2 ansible_host=10.0.0.2 ansible_user=admin gps_log_root=/srv/gps ; trailing comment
+
+[lab]
+pi3 ansible_host=10.0.0.3
+
+[time_servers:vars]
+ansible_user=pi
+pps_source = macpin
+
+[all:vars]
+ansible_ssh_private_key_file=~/.ssh/id_ansible_rpi
+
+[fleet:children]
+time_servers
+lab
+"""
+
+
+def test_reads_hosts_from_group_sections_only(tmp_path):
+    path = tmp_path / "inventory.ini"
+    path.write_text(INVENTORY)
+    hosts = {host.name: host for host in read_inventory(str(path))}
+
+    assert sorted(hosts) == ["pi1", "pi2", "pi3", "ungrouped.example"]
+    assert hosts["pi1"].root == f"pi@10.0.0.1:{DEFAULT_REMOTE_ROOT}"
+    assert hosts["pi1"].label == "gpio18"
+    assert hosts["pi2"].root == "admin@10.0.0.2:/srv/gps"
+    assert hosts["pi2"].label == "macpin"
+    assert hosts["pi3"].root == f"10.0.0.3:{DEFAULT_REMOTE_ROOT}"
+    assert hosts["pi3"].label == ""
+    assert all(host.ssh_key == "~/.ssh/id_ansible_rpi" for host in hosts.values())
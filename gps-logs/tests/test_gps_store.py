@@ -0,0 +1,26 @@
+import pytest
+
+from gps_store import RESOLUTIONS, GpsStore
+from gpsd_stream import read_columns
+from gpsd_synth import write_log
+
+
+@pytest.fixture
+def store(tmp_path):
+    # Starts at 05:01:41, partway into an hour and a minute
+    log_path = str(tmp_path / "synthetic.json")
+    write_log(log_path, 200_000, satellites=8, corrupt_rate=0)
+    with GpsStore(str(tmp_path / "gps.db")) as store:
+        store.ingest_file(log_path, read_columns(log_path))
+        yield store
+
+
+@pytest.mark.parametrize("resolution", ["1min", "1h"])
+def test_rollup_range_starting_mid_bucket_includes_that_bucket(store, resolution):
+    first, last = store.time_range("sky")
+    assert first % RESOLUTIONS[resolution]
+    frame = store.query_rollup("hdop", resolution, first, last + 1)
+    raw = store.query_raw("sky", first, last + 1, ("hdop",))
+
+    assert frame["bucket_ns"].iloc[0] == first // RESOLUTIONS[resolution] * RESOLUTIONS[resolution]
+    assert frame["count"].sum() == raw["hdop"].count()
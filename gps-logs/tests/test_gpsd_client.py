@@ -0,0 +1,93 @@
+import asyncio
+import json
+
+from gpsd_client import GpsdClient, GpsdState, telegraf_lines
+
+TPV = {"class": "TPV", "device": "/dev/ttyACM0", "mode": 3, "lat": 1.0, "lon": 2.0}
+
+
+async def _fake_gpsd(sessions):
+    """Serve one scripted list of lines per connection, then hang up (None: stay connected)"""
+    scripts = iter(sessions)
+
+    async def handle(reader, writer):
+        await reader.readline()  # ?WATCH
+        for line in next(scripts, []):
+            if line is None:
+                await reader.read()
+                break
+            writer.write(line)
+            await writer.drain()
+        writer.close()
+
+    server = await asyncio.start_server(handle, "127.0.0.1", 0)
+    return server, server.sockets[0].getsockname()[1]
+
+
+def _lines(*records):
+    return [json.dumps(record).encode() + b"\n" for record in records]
+
+
+async def _run_client(sessions, wait):
+    server, port = await _fake_gpsd(sessions)
+    state = GpsdState()
+    seen = []
+    state.listeners.append(seen.append)
+    client = GpsdClient(state, "127.0.0.1", port, reconnect_delay=0.05)
+    task = asyncio.create_task(client.run())
+    try:
+        await wait(state, seen)
+    finally:
+        task.cancel()
+        server.close()
+    return state, seen
+
+
+async def _until(condition, timeout=5.0):
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not condition():
+        assert asyncio.get_running_loop().time() < deadline
+        await asyncio.sleep(0.01)
+
+
+def test_publishes_latest_fix():
+    async def wait(state, seen):
+        await _until(lambda: "TPV" in state.latest)
+        lines = telegraf_lines(state)
+        assert lines[0].startswith("gps_status,device=ttyACM0 ")
+        assert "mode=3i" in lines[0] and "status=1i" in lines[0]
+
+    asyncio.run(_run_client([_lines({"class": "VERSION"}, TPV) + [None]], wait))
+
+
+def test_stops_publishing_after_gpsd_goes_away():
+    async def wait(state, seen):
+        await _until(lambda: seen)
+        await _until(lambda: not state.connected and not state.latest)
+        assert telegraf_lines(state) == []
+
+    asyncio.run(_run_client([_lines(TPV)], wait))
+
+
+def test_skips_stale_reports():
+    state = GpsdState()
+    state.update(TPV)
+    assert telegraf_lines(state)
+    state.updated["TPV"] -= 60
+    assert telegraf_lines(state, max_age=10) == []
+
+
+def test_reconnects_after_oversized_line_and_listener_error():
+    failures = []
+
+    async def wait(state, seen):
+        def flaky(record):
+            if record.get("mode") == 2 and not failures:
+                failures.append(record)
+                raise RuntimeError("listener failed")
+        state.listeners.insert(0, flaky)
+        await _until(lambda: any(record.get("mode") == 3 for record in seen))
+
+    oversized = [b'{"class":"SKY","pad":"' + b"x" * (2 << 20) + b'"}\n']
+    asyncio.run(_run_client([oversized, _lines(dict(TPV, mode=2)), _lines(TPV)], wait))
+    assert failures
@@ -0,0 +1,69 @@
+import json
+import os
+
+import gpsd_follow
+from gpsd_follow import LogFollower
+
+
+def _line(seq):
+    return json.dumps({"class": "TPV", "seq": seq}).encode() + b"\n"
+
+
+def _seqs(follower):
+    return [record["seq"] for record in follower.read_records()]
+
+
+def test_reads_only_complete_appended_lines(tmp_path):
+    path = tmp_path / "gpsd.log"
+    path.write_bytes(_line(0) + _line(1)[:5])
+    follower = LogFollower(str(path))
+    assert _seqs(follower) == [0]
+    with open(path, "ab") as f:
+        f.write(_line(1)[5:] + _line(2))
+    assert _seqs(follower) == [1, 2]
+    assert _seqs(follower) == []
+    follower.close()
+
+
+def test_rotation_drains_old_file_first(tmp_path):
+    path = tmp_path / "gpsd.log"
+    path.write_bytes(_line(0))
+    follower = LogFollower(str(path))
+    assert _seqs(follower) == [0]
+
+    # The writer appends a last report, including a line it never
+    # terminated, before the log is rotated underneath the follower
+    with open(path, "ab") as f:
+        f.write(_line(1) + _line(2).rstrip(b"\n"))
+    os.rename(path, tmp_path / "gpsd.log.1")
+    assert _seqs(follower) == [1, 2]
+
+    path.write_bytes(_line(3))
+    assert _seqs(follower) == [3]
+    follower.close()
+
+
+def test_truncation_restarts_from_the_beginning(tmp_path):
+    path = tmp_path / "gpsd.log"
+    path.write_bytes(_line(0) + _line(1))
+    follower = LogFollower(str(path))
+    assert _seqs(follower) == [0, 1]
+    with open(path, "r+b") as f:
+        f.truncate(0)
+        f.write(_line(2))
+    assert _seqs(follower) == [2]
+    follower.close()
+
+
+def test_oversized_line_is_skipped(tmp_path, monkeypatch):
+    monkeypatch.setattr(gpsd_follow, "READ_BLOCK", 64)
+    path = tmp_path / "gpsd.log"
+    path.write_bytes(_line(0) + b"x" * 150)
+    follower = LogFollower(str(path))
+    assert _seqs(follower) == [0]
+    assert _seqs(follower) == []
+
+    with open(path, "ab") as f:
+        f.write(b"x" * 10 + b"\n" + _line(1))
+    assert _seqs(follower) == [1]
+    follower.close()
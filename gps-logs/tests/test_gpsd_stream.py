@@ -0,0 +1,26 @@
+import json
+
+from gpsd_stream import iter_records, read_columns
+from gpsd_synth import write_log
+
+
+def test_log_starting_mid_record_skips_only_the_first_line(tmp_path, capsys):
+    full_path = tmp_path / "full.json"
+    write_log(str(full_path), 50_000, satellites=8, corrupt_rate=0)
+    data = full_path.read_bytes()
+    cut_path = tmp_path / "cut.json"
+    cut_path.write_bytes(data[data.index(b"\n") + 20:])
+
+    full = read_columns(str(full_path))
+    for kinds in (None, ("pps",)):
+        cut = read_columns(str(cut_path), kinds=kinds)
+        assert len(cut["pps"]["real_sec"]) == len(full["pps"]["real_sec"]) > 0
+    assert "Skipped 1 malformed lines" in capsys.readouterr().out
+
+
+def test_single_json_document(tmp_path):
+    records = [{"class": "TPV", "mode": 3}, {"class": "SKY", "uSat": 9}]
+    path = tmp_path / "document.json"
+    path.write_text(json.dumps(records, indent=2))
+    assert list(iter_records(str(path))) == records
+    assert list(iter_records(str(path), classes={"SKY"})) == records[1:]
@@ -0,0 +1,13 @@
+from gpsd_events import detect_events
+from gpsd_synth import write_log
+
+
+def test_outages_hold_over_for_the_length_of_the_gap(tmp_path):
+    log_path = str(tmp_path / "synthetic.json")
+    write_log(log_path, 1_000_000, satellites=8, gap_rate=5e-3, corrupt_rate=0)
+    events = list(detect_events([log_path]))
+
+    gaps = [event.value for event in events if event.kind == "pps_gap"]
+    holdovers = [event.value for event in events if event.kind == "fix_recovered"]
+    assert holdovers and len(holdovers) == len(gaps)
+    assert all(held >= 2 for held in holdovers)
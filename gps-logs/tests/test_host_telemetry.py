@@ -0,0 +1,79 @@
+import math
+
+from host_telemetry import HostSampler
+
+# CPU2 is offline, so both files skip it
+INTERRUPTS = """\
+           CPU0       CPU1       CPU3
+ 11:       {timer}          0          0     GICv2  30 Level     arch_timer
+ 66:          {pps0}          0          {pps3}  pinctrl-bcm2835  18 Edge      pps@12.-1
+IPI0:          0          0          0  CPU wakeup interrupts
+"""
+
+STAT = """\
+cpu  {all} 0 0 0 0 0 0 0 0 0
+cpu0 {user0} 0 0 {idle0} 0 0 0 0 0 0
+cpu1 100 0 0 900 0 0 0 0 0 0
+cpu3 {user3} 0 0 {idle3} 0 {irq3} 0 0 0 0
+intr 12345
+ctxt 6789
+"""
+
+
+def _write_proc(proc, timer, pps0, pps3, user0, idle0, user3, idle3, irq3):
+    # Rewrite in place: the sampler keeps the files open
+    with open(proc / "interrupts", "r+") as f:
+        f.truncate(0)
+        f.write(INTERRUPTS.format(timer=timer, pps0=pps0, pps3=pps3))
+    with open(proc / "stat", "r+") as f:
+        f.truncate(0)
+        f.write(STAT.format(all=user0 + user3, user0=user0, idle0=idle0, user3=user3, idle3=idle3, irq3=irq3))
+
+
+def _fake_tree(tmp_path):
+    proc = tmp_path / "proc"
+    proc.mkdir()
+    (proc / "interrupts").touch()
+    (proc / "stat").touch()
+    _write_proc(proc, 1000, 5, 0, 100, 900, 100, 900, 0)
+
+    zone = tmp_path / "sys" / "class" / "thermal" / "thermal_zone0"
+    zone.mkdir(parents=True)
+    (zone / "type").write_text("cpu-thermal\n")
+    (zone / "temp").write_text("48312\n")
+    for cpu, khz in ((0, 1500000), (1, 1500000), (3, 600000)):
+        cpufreq = tmp_path / "sys" / "devices" / "system" / "cpu" / f"cpu{cpu}" / "cpufreq"
+        cpufreq.mkdir(parents=True)
+        (cpufreq / "scaling_cur_freq").write_text(f"{khz}\n")
+    return proc, tmp_path / "sys"
+
+
+def test_columns_are_keyed_by_cpu_number(tmp_path):
+    proc, sys_root = _fake_tree(tmp_path)
+    with HostSampler(str(proc), str(sys_root)) as sampler:
+        assert sampler.cpus == [0, 1, 3]
+        assert sampler.irq_labels == [b"66"]
+        assert sampler.columns == [
+            "time_ns", "pps_irq", "pps_irq_cpu",
+            "cpu0_busy", "cpu0_irq", "cpu1_busy", "cpu1_irq", "cpu3_busy", "cpu3_irq",
+            "temp_cpu_thermal", "cpu0_mhz", "cpu1_mhz", "cpu3_mhz",
+        ]
+
+
+def test_sample_attributes_pps_irqs_and_load_to_the_right_core(tmp_path):
+    proc, sys_root = _fake_tree(tmp_path)
+    with HostSampler(str(proc), str(sys_root)) as sampler:
+        _write_proc(proc, 2000, 5, 2, 150, 950, 160, 920, 20)
+        row = dict(zip(sampler.columns, sampler.sample()))
+
+    assert row["pps_irq"] == 2
+    assert row["pps_irq_cpu"] == 3
+    assert row["cpu0_busy"] == 0.5
+    assert row["cpu0_irq"] == 0.0
+    # cpu3: 60 user + 20 irq busy out of 60 + 20 idle + 20 irq
+    assert row["cpu3_busy"] == 0.8
+    assert row["cpu3_irq"] == 0.2
+    # cpu1 did not tick
+    assert math.isnan(row["cpu1_busy"])
+    assert row["temp_cpu_thermal"] == 48.312
+    assert row["cpu3_mhz"] == 600.0
@@ -0,0 +1,28 @@
+import numpy as np
+
+from timejoin import asof_indices, window_stats
+
+SEC = 1_000_000_000
+
+
+def test_asof_indices_directions_and_tolerance():
+    right = np.array([10, 20, 30]) * SEC
+    left = np.array([5, 20, 24, 29, 100]) * SEC
+    assert asof_indices(left, right).tolist() == [-1, 1, 1, 1, 2]
+    assert asof_indices(left, right, direction="forward").tolist() == [0, 1, 2, 2, -1]
+    assert asof_indices(left, right, direction="nearest").tolist() == [0, 1, 1, 2, 2]
+    assert asof_indices(left, right, tolerance_ns=5 * SEC).tolist() == [-1, 1, 1, -1, -1]
+
+
+def test_window_stats_over_the_preceding_window():
+    right = np.array([0, 10, 20, 30, 40]) * SEC
+    values = np.array([4.0, 2.0, 6.0, 8.0, 1.0])
+    left = np.array([-5, 20, 35, 100]) * SEC
+    stats = window_stats(left, right, values, before_ns=15 * SEC)
+
+    assert stats["count"].tolist() == [0, 2, 2, 0]
+    assert stats["mean"][1:3].tolist() == [4.0, 7.0]
+    assert stats["min"][1:3].tolist() == [2.0, 6.0]
+    assert stats["max"][1:3].tolist() == [6.0, 8.0]
+    assert np.isnan(stats["mean"][[0, 3]]).all()
+    assert np.isnan(stats["min"][[0, 3]]).all()
@@ -0,0 +1,157 @@
+"""
+Time joins between sorted series on an int64 nanosecond epoch index.
+
+Every series is a pair of a sorted ``time_ns`` array and value columns.
+Joins are done with ``np.searchsorted`` over whole arrays, so lining up
+weeks of 1 Hz data from different sources costs O(n log m) with no
+per-row Python work. Series that are already in order (the usual case
+for logs read oldest first) are never re-sorted.
+"""
+
+import numpy as np
+
+from pps_analysis import analyze_pps
+
+# How far from a PPS edge the GPS context of that pulse may be taken
+PPS_CONTEXT_TOLERANCE_NS = 5 * 1_000_000_000
+
+# Look-back of the windowed SKY statistics at each PPS edge; the receiver's
+# timing solution lags a drop in geometry, so the last report is not enough
+PPS_CONTEXT_WINDOW_NS = 60 * 1_000_000_000
+
+
+def sort_by_time(columns, key="time_ns"):
+    """Return columns ordered by ``key`` (stable, so ties keep file order)
+
+    Rows with a missing time (NaT) sort first.
+    """
+    time_ns = columns[key]
+    if len(time_ns) < 2 or (np.diff(time_ns) >= 0).all():
+        return columns
+    order = np.argsort(time_ns, kind="stable")
+    return {name: values[order] for name, values in columns.items()}
+
+
+def asof_indices(left_ns, right_ns, tolerance_ns=None, direction="backward"):
+    """Return, for each left time, the index of the matching right row (-1 if none)
+
+    ``direction`` is ``"backward"`` (latest right row at or before the
+    left time), ``"forward"`` (earliest at or after) or ``"nearest"``.
+    Matches further than ``tolerance_ns`` away are rejected.
+    """
+    left_ns = np.asarray(left_ns, dtype=np.int64)
+    right_ns = np.asarray(right_ns, dtype=np.int64)
+    if not len(right_ns):
+        return np.full(len(left_ns), -1, dtype=np.int64)
+
+    last = len(right_ns) - 1
+    before = np.searchsorted(right_ns, left_ns, side="right") - 1
+    after = np.searchsorted(right_ns, left_ns, side="left")
+    if direction == "backward":
+        index = before
+    elif direction == "forward":
+        index = np.where(after > last, -1, after)
+    elif direction == "nearest":
+        before_gap = np.where(before >= 0, left_ns - right_ns[np.clip(before, 0, last)], np.iinfo(np.int64).max)
+        after_gap = np.where(after <= last, right_ns[np.clip(after, 0, last)] - left_ns, np.iinfo(np.int64).max)
+        index = np.where(after_gap < before_gap, after, before)
+        index = np.where(np.minimum(before_gap, after_gap) == np.iinfo(np.int64).max, -1, index)
+    else:
+        raise ValueError(f"Unknown join direction: {direction}")
+
+    if tolerance_ns is not None:
+        valid = index >= 0
+        gap = np.abs(left_ns[valid] - right_ns[index[valid]])
+        rejected = np.flatnonzero(valid)[gap > tolerance_ns]
+        index[rejected] = -1
+    return index
+
+
+def take(values, index, fill=np.nan):
+    """Gather ``values[index]`` with ``fill`` where the index is -1"""
+    values = np.asarray(values)
+    missing = index < 0
+    if np.issubdtype(values.dtype, np.integer) and missing.any():
+        values = values.astype(np.float64)
+    result = values[np.where(missing, 0, index)] if len(values) else np.full(len(index), fill)
+    if missing.any():
+        result = result.copy()
+        result[missing] = fill
+    return result
+
+
+def asof_join(left_ns, right_ns, right_columns, tolerance_ns=None, direction="backward"):
+    """Return ``right_columns`` aligned to ``left_ns`` by an as-of join
+
+    Unmatched rows are NaN (integer columns are promoted to float when
+    any row is unmatched).
+    """
+    index = asof_indices(left_ns, right_ns, tolerance_ns, direction)
+    return {name: take(values, index) for name, values in right_columns.items()}
+
+
+def window_stats(left_ns, right_ns, values, before_ns, after_ns=0):
+    """Aggregate right values over ``[t - before_ns, t + after_ns]`` for each left time
+
+    Returns a dict of ``count``, ``mean``, ``min`` and ``max`` arrays
+    (NaN for empty windows). Window bounds come from two searchsorted
+    passes and the sums from prefix sums, so the cost does not depend
+    on the window length. NaN values must already be dropped.
+    """
+    left_ns = np.asarray(left_ns, dtype=np.int64)
+    right_ns = np.asarray(right_ns, dtype=np.int64)
+    values = np.asarray(values, dtype=np.float64)
+    start = np.searchsorted(right_ns, left_ns - before_ns, side="left")
+    end = np.searchsorted(right_ns, left_ns + after_ns, side="right")
+    count = end - start
+
+    prefix = np.concatenate(([0.0], np.cumsum(values)))
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean = (prefix[end] - prefix[start]) / count
+    minimum = np.full(len(left_ns), np.nan)
+    maximum = np.full(len(left_ns), np.nan)
+    filled = count > 0
+    if filled.any():
+        # reduceat over interleaved (start, end) bounds reduces each window;
+        # a trailing sentinel keeps an end of len(values) in range
+        padded = np.append(values, np.nan)
+        bounds = np.column_stack((start[filled], end[filled])).ravel()
+        minimum[filled] = np.minimum.reduceat(padded, bounds)[::2]
+        maximum[filled] = np.maximum.reduceat(padded, bounds)[::2]
+    return {"count": count, "mean": mean, "min": minimum, "max": maximum}
+
+
+def _timed(kind_columns, names):
+    """Return (time_ns, columns) of TPV/SKY rows with a valid time, in time order"""
+    time_ns = np.asarray(kind_columns["time_ns"], dtype=np.int64)
+    valid = time_ns > 0
+    columns = {"time_ns": time_ns[valid]}
+    columns.update((name, np.asarray(kind_columns[name])[valid]) for name in names)
+    columns = sort_by_time(columns)
+    return columns.pop("time_ns"), columns
+
+
+def pps_context(columns, tolerance_ns=PPS_CONTEXT_TOLERANCE_NS, window_ns=PPS_CONTEXT_WINDOW_NS):
+    """Line up the satellite geometry and fix state with every PPS edge
+
+    ``columns`` is the ``{"tpv", "sky", "pps"}`` dict from
+    ``gpsd_stream.read_columns``. Each pulse takes the latest SKY
+    (``uSat``, ``nSat``, ``hdop``) and TPV (``mode``, ``eph``) report at or
+    before its edge, within ``tolerance_ns``, plus ``uSat_window_min`` and
+    ``hdop_window_mean`` over the ``window_ns`` before the edge. Returns a
+    dict of per-pulse arrays on the ``edge_ns`` index, including
+    ``offset_ns`` and ``jitter_ns``.
+    """
+    timing = analyze_pps(columns["pps"])
+    edge_ns = timing["edge_ns"]
+    context = {name: timing[name] for name in ("edge_ns", "offset_ns", "jitter_ns")}
+    for kind, names in (("sky", ("uSat", "nSat", "hdop")), ("tpv", ("mode", "eph"))):
+        time_ns, kind_columns = _timed(columns[kind], names)
+        context.update(asof_join(edge_ns, time_ns, kind_columns, tolerance_ns))
+        if kind == "sky":
+            for name, stat in (("uSat", "min"), ("hdop", "mean")):
+                values = kind_columns[name].astype(np.float64)
+                valid = np.isfinite(values)
+                context[f"{name}_window_{stat}"] = window_stats(
+                    edge_ns, time_ns[valid], values[valid], window_ns)[stat]
+    return context
@@ -0,0 +1,337 @@
+"""
+Streaming parsers for chrony and linuxptp logs.
+
+chrony's ``tracking.log``, ``statistics.log`` and ``measurements.log``
+(``log measurements statistics tracking`` in chrony.conf) and the
+``ptp4l``/``phc2sys`` offset lines from the journal or syslog are read
+line by line into the same typed column chunks as the gpsd data, with
+times as int64 nanoseconds since the epoch. ``clock_chain`` lines these
+series up with the gpsd PPS pulses so the whole
+GPS -> PPS -> system clock -> PHC -> PTP chain can be analysed at once.
+"""
+
+import calendar
+import glob
+import gzip
+import os
+import re
+
+import numpy as np
+
+from gps_time import day_start_s
+from gpsd_stream import CHUNK_SIZE, schema_columns
+from pps_analysis import NSEC_PER_SEC, analyze_pps
+from timejoin import asof_join, sort_by_time
+
+# chrony logs: (column name, dtype, field index after the date and time, default)
+CHRONY_TRACKING_SCHEMA = [
+    ("time_ns", np.int64, None, 0),
+    ("source", str, 0, ""),                     # IP address or refclock refid
+    ("stratum", np.int8, 1, 0),
+    ("freq_ppm", np.float64, 2, np.nan),
+    ("skew_ppm", np.float64, 3, np.nan),
+    ("offset_ns", np.float64, 4, np.nan),       # System clock offset at the update
+    ("sources", np.int16, 6, 0),                # Combined sources
+    ("offset_sd_ns", np.float64, 7, np.nan),
+    ("remaining_ns", np.float64, 8, np.nan),    # Remaining correction
+    ("root_delay_ns", np.float64, 9, np.nan),
+    ("root_disp_ns", np.float64, 10, np.nan),
+    ("max_error_ns", np.float64, 11, np.nan),
+]
+
+CHRONY_STATISTICS_SCHEMA = [
+    ("time_ns", np.int64, None, 0),
+    ("source", str, 0, ""),
+    ("std_dev_ns", np.float64, 1, np.nan),
+    ("est_offset_ns", np.float64, 2, np.nan),
+    ("offset_sd_ns", np.float64, 3, np.nan),
+    ("diff_freq_ppm", np.float64, 4, np.nan),
+    ("est_skew_ppm", np.float64, 5, np.nan),
+    ("stress", np.float64, 6, np.nan),
+    ("samples", np.int16, 7, 0),
+    ("runs", np.int16, 9, 0),
+    ("asymmetry", np.float64, 10, np.nan),
+]
+
+CHRONY_MEASUREMENTS_SCHEMA = [
+    ("time_ns", np.int64, None, 0),
+    ("source", str, 0, ""),
+    ("stratum", np.int8, 2, 0),
+    ("valid", np.bool_, None, False),           # All three test groups passed
+    ("score", np.float64, 8, np.nan),
+    ("offset_ns", np.float64, 9, np.nan),
+    ("peer_delay_ns", np.float64, 10, np.nan),
+    ("peer_disp_ns", np.float64, 11, np.nan),
+    ("root_delay_ns", np.float64, 12, np.nan),
+    ("root_disp_ns", np.float64, 13, np.nan),
+]
+
+PTP_SCHEMA = [
+    ("time_ns", np.int64, None, 0),
+    ("program", str, None, ""),                 # ptp4l or phc2sys
+    ("clock", str, None, ""),                   # "master" or the phc2sys clock name
+    ("offset_ns", np.int64, None, 0),
+    ("state", np.int8, None, 0),                # Servo state (s0 unlocked .. s2 locked)
+    ("freq_ppb", np.int64, None, 0),
+    ("delay_ns", np.float64, None, np.nan),
+]
+
+CHRONY_SCHEMAS = {
+    "tracking": CHRONY_TRACKING_SCHEMA,
+    "statistics": CHRONY_STATISTICS_SCHEMA,
+    "measurements": CHRONY_MEASUREMENTS_SCHEMA,
+}
+
+# chrony logs times in seconds and frequencies either in ppm or in
+# seconds per second; columns ending in _ns are scaled from seconds and
+# these from seconds per second
+_PPM_FROM_SECONDS = {"diff_freq_ppm", "est_skew_ppm"}
+
+MONTHS = {name: i for i, name in enumerate(
+    ("Jan", "Feb", "Mar", "Apr", "May", "Jun", "Jul", "Aug", "Sep", "Oct", "Nov", "Dec"), start=1)}
+
+_ISO_PREFIX = re.compile(
+    rb"(\d{4})-(\d\d)-(\d\d)[T ](\d\d):(\d\d):(\d\d)(?:[.,](\d+))?(Z|[+-]\d\d:?\d\d)?")
+_SYSLOG_PREFIX = re.compile(rb"([A-Z][a-z]{2}) +(\d{1,2}) (\d\d):(\d\d):(\d\d)")
+_PTP_PROGRAM = re.compile(rb"(ptp4l|phc2sys)(?:\[([\d.]+)\])?:\s*(?:\[([\d.]+)\])?")
+_PTP_OFFSET = re.compile(
+    rb"(?:(\S+) (?:phc|sys) |master )offset\s+(-?\d+)\s+s(\d)\s+freq\s+([+-]?\d+)"
+    rb"(?:\s+(?:path )?delay\s+(-?\d+))?")
+
+def _chrony_time_ns(line):
+    """Return the epoch nanoseconds of a chrony log line's ``YYYY-MM-DD HH:MM:SS`` prefix"""
+    seconds = day_start_s(line[:10]) + int(line[11:13]) * 3600 + int(line[14:16]) * 60 + int(line[17:19])
+    return seconds * NSEC_PER_SEC
+
+
+def open_log(file_path):
+    """Open a log for binary reading, transparently decompressing ``.gz`` rotations"""
+    if file_path.endswith(".gz"):
+        return gzip.open(file_path, "rb")
+    return open(file_path, "rb")
+
+
+def chrony_log_kind(file_path):
+    """Return the chrony log kind from a file name such as ``tracking.log.1.gz``"""
+    name = os.path.basename(file_path)
+    for kind in CHRONY_SCHEMAS:
+        if name.startswith(kind):
+            return kind
+    raise ValueError(f"Not a chrony tracking/statistics/measurements log: {file_path}")
+
+
+def _field_converters(schema):
+    """Return (column position, field index, converter) for the positional fields"""
+    converters = []
+    for position, (name, dtype, index, _) in enumerate(schema):
+        if index is None:
+            continue
+        if dtype is str:
+            convert = bytes.decode
+        elif np.issubdtype(dtype, np.floating):
+            scale = 1e9 if name.endswith("_ns") else 1e6 if name in _PPM_FROM_SECONDS else 1.0
+            convert = (lambda value, scale=scale: float(value) * scale)
+        else:
+            convert = int
+        converters.append((position, index, convert))
+    return converters
+
+
+def iter_chrony_rows(file_path, kind=None):
+    """Yield schema rows from a chrony log, skipping headers and bad lines"""
+    kind = kind or chrony_log_kind(file_path)
+    schema = CHRONY_SCHEMAS[kind]
+    defaults = [default for _, _, _, default in schema]
+    converters = _field_converters(schema)
+    valid_position = [name for name, _, _, _ in schema].index("valid") if kind == "measurements" else None
+    with open_log(file_path) as f:
+        for line in f:
+            # Data lines start with the date; headers with spaces or '='
+            if not line[:4].isdigit():
+                continue
+            fields = line[20:].split()
+            row = list(defaults)
+            try:
+                row[0] = _chrony_time_ns(line)
+                for position, index, convert in converters:
+                    if index < len(fields):
+                        row[position] = convert(fields[index])
+            except ValueError:
+                continue
+            if valid_position is not None:
+                row[valid_position] = all(set(test) == {ord("1")} for test in fields[3:6])
+            yield row
+
+
+def _wall_time_ns(line, year, utc_offset_s):
+    """Return the epoch nanoseconds of a journal/syslog timestamp prefix, or None"""
+    match = _ISO_PREFIX.match(line)
+    if match:
+        seconds = (day_start_s(line[match.start(1):match.end(3)])
+                   + int(match.group(4)) * 3600 + int(match.group(5)) * 60 + int(match.group(6)))
+        zone = match.group(8)
+        if zone and zone != b"Z":
+            sign = -1 if zone[:1] == b"-" else 1
+            digits = zone[1:].replace(b":", b"")
+            seconds -= sign * (int(digits[:2]) * 3600 + int(digits[2:]) * 60)
+        elif not zone:
+            seconds -= utc_offset_s
+        fraction = match.group(7) or b"0"
+        return seconds * NSEC_PER_SEC + int(fraction[:9].ljust(9, b"0"))
+
+    match = _SYSLOG_PREFIX.match(line)
+    if match and year is not None:
+        month = MONTHS.get(match.group(1).decode("ascii"))
+        if month is None:
+            return None
+        seconds = calendar.timegm((year, month, int(match.group(2)), int(match.group(3)),
+                                   int(match.group(4)), int(match.group(5))))
+        return (seconds - utc_offset_s) * NSEC_PER_SEC
+    return None
+
+
+def iter_ptp_rows(file_path, year=None, boot_time_ns=None, utc_offset_s=0, stats=None):
+    """Yield PTP_SCHEMA rows for the ptp4l/phc2sys offset lines of a log
+
+    Lines are timestamped from an ISO 8601 prefix (``journalctl -o
+    short-iso``), a classic syslog prefix (needs ``year``) or, failing
+    both, the monotonic ``[seconds]`` stamp linuxptp prints, which needs
+    ``boot_time_ns`` (the epoch time of CLOCK_MONOTONIC zero). Prefixes
+    without a zone are taken to be ``utc_offset_s`` ahead of UTC. Lines
+    that cannot be placed in time are counted in ``stats["untimed"]``.
+    """
+    untimed = 0
+    with open_log(file_path) as f:
+        for line in f:
+            program = _PTP_PROGRAM.search(line)
+            if program is None:
+                continue
+            offset = _PTP_OFFSET.search(line, program.end())
+            if offset is None:
+                continue
+
+            time_ns = _wall_time_ns(line, year, utc_offset_s)
+            if time_ns is None:
+                monotonic = program.group(3) or program.group(2)
+                if boot_time_ns is None or monotonic is None or b"." not in monotonic:
+                    untimed += 1
+                    continue
+                time_ns = boot_time_ns + int(float(monotonic) * NSEC_PER_SEC)
+
+            clock, value, state, freq, delay = offset.groups()
+            yield [
+                time_ns,
+                program.group(1).decode("ascii"),
+                clock.decode("ascii", "replace") if clock else "master",
+                int(value),
+                int(state),
+                int(freq),
+                float(delay) if delay is not None else np.nan,
+            ]
+    if stats is not None:
+        stats["untimed"] = stats.get("untimed", 0) + untimed
+
+
+def read_rows(schema, rows, chunk_size=CHUNK_SIZE):
+    """Pack an iterable of schema rows into columns, one chunk at a time"""
+    chunks = []
+    pending = []
+    for row in rows:
+        pending.append(row)
+        if len(pending) >= chunk_size:
+            chunks.append(schema_columns(schema, pending))
+            pending = []
+    if pending or not chunks:
+        chunks.append(schema_columns(schema, pending))
+    if len(chunks) == 1:
+        return chunks[0]
+    return {name: np.concatenate([chunk[name] for chunk in chunks]) for name in chunks[0]}
+
+
+def _log_files(paths):
+    """Expand directories and globs into log files, oldest rotation first"""
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files.extend(glob.glob(os.path.join(path, "*")))
+        else:
+            files.extend(glob.glob(path) or [path])
+
+    def rotation(file_path):
+        # tracking.log.2.gz is older than tracking.log.1, which is older than tracking.log
+        match = re.search(r"\.log\.(\d+)", os.path.basename(file_path))
+        return -int(match.group(1)) if match else 0
+
+    return sorted(set(files), key=lambda file_path: (rotation(file_path), file_path))
+
+
+def read_chrony_logs(paths):
+    """Read chrony logs (files, globs or a log directory) into time-sorted columns per kind
+
+    Returns ``{"tracking": columns, "statistics": columns, "measurements": columns}``;
+    files that are not chrony logs are ignored.
+    """
+    rows = {kind: [] for kind in CHRONY_SCHEMAS}
+    for file_path in _log_files(paths):
+        try:
+            kind = chrony_log_kind(file_path)
+        except ValueError:
+            continue
+        rows[kind].append(iter_chrony_rows(file_path, kind))
+    return {kind: sort_by_time(read_rows(CHRONY_SCHEMAS[kind], (row for it in iterators for row in it)))
+            for kind, iterators in rows.items()}
+
+
+def read_ptp_logs(paths, year=None, boot_time_ns=None, utc_offset_s=0):
+    """Read ptp4l/phc2sys offset lines from logs into time-sorted PTP_SCHEMA columns"""
+    stats = {}
+    rows = (row for file_path in _log_files(paths)
+            for row in iter_ptp_rows(file_path, year, boot_time_ns, utc_offset_s, stats))
+    columns = sort_by_time(read_rows(PTP_SCHEMA, rows))
+    if stats.get("untimed"):
+        print(f"Skipped {stats['untimed']} ptp4l/phc2sys lines without a usable timestamp")
+    return columns
+
+
+def _select(columns, mask):
+    return {name: values[mask] for name, values in columns.items()}
+
+
+# Largest gap between a PPS pulse and the sample joined to it; chrony
+# updates its tracking log once per refclock poll (16 s by default)
+CHAIN_TOLERANCE_NS = {
+    "sysclock": 64 * NSEC_PER_SEC,
+    "phc": 4 * NSEC_PER_SEC,
+    "ptp": 4 * NSEC_PER_SEC,
+}
+
+
+def clock_chain(pps, tracking=None, ptp=None, tolerance_ns=None):
+    """Line up every link of the timing chain on the gpsd PPS pulses
+
+    ``pps`` are gpsd PPS columns, ``tracking`` chrony tracking columns
+    and ``ptp`` PTP_SCHEMA columns. Returns columns on the PPS edges:
+
+    * ``pps_ns``: system clock minus PPS edge as seen by gpsd
+    * ``sysclock_ns``: chrony's estimate of the system clock offset
+    * ``phc_ns``: phc2sys offset between the PHC and the system clock
+    * ``ptp_ns``: ptp4l master offset of the PTP port
+
+    Links without data within the tolerance are NaN.
+    """
+    tolerance_ns = dict(CHAIN_TOLERANCE_NS, **(tolerance_ns or {}))
+    timing = analyze_pps(pps)
+    time_ns = timing["edge_ns"]
+    chain = {"time_ns": time_ns, "pps_ns": timing["offset_ns"].astype(np.float64)}
+
+    links = [("sysclock_ns", tracking, "sysclock")]
+    if ptp is not None:
+        links.append(("phc_ns", _select(ptp, ptp["program"] == "phc2sys"), "phc"))
+        links.append(("ptp_ns", _select(ptp, ptp["program"] == "ptp4l"), "ptp"))
+    for name, series, link in links:
+        if series is None or not len(series["time_ns"]):
+            chain[name] = np.full(len(time_ns), np.nan)
+            continue
+        chain[name] = asof_join(time_ns, series["time_ns"], {"offset_ns": series["offset_ns"]},
+                                tolerance_ns[link])["offset_ns"]
+    return chain
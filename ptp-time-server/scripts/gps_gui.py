@@ -1,62 +1,329 @@
 #!/usr/bin/env python3
 """
-Simple GUI to interact with GPS data from the PTP time server
-using pygpsclient library.
+Simple GUI to interact with GPS data from the PTP time server.
+
+Shows a live panel of PPS offset, satellites used and fix status read
+straight from gpsd, and can launch the full PyGPSClient GUI. A daemon
+thread holds one gpsd connection and appends to bounded ring buffers;
+the Tk loop only redraws from those buffers at a capped frame rate, and
+slow commands (systemctl) run off the Tk thread, so the window stays
+responsive without loading the Pi's shared core.
 """
 
+import argparse
+import json
+import queue
+import socket
 import sys
-import os
 import subprocess
+import threading
 import tkinter as tk
+from collections import deque
 from tkinter import ttk, messagebox
 
-def main():
-    """Launch a simple GUI to interact with PyGPSClient"""
+GPSD_HOST = "127.0.0.1"
+GPSD_PORT = 2947
+WATCH_COMMAND = b'?WATCH={"enable":true,"json":true,"pps":true};\n'
+
+# Samples kept for the live plots (seconds of 1 Hz data)
+HISTORY = 600
+
+# Minimum time between redraws of the live panel
+FRAME_INTERVAL_MS = 250
+
+# How often finished background commands are checked for
+POLL_INTERVAL_MS = 100
+
+RECONNECT_DELAY = 2.0
+
+FIX_MODES = {0: "Unknown", 1: "No fix", 2: "2D fix", 3: "3D fix"}
+
+# Classes the reader decodes; other lines are dropped without parsing
+WANTED_CLASSES = (b'"class":"PPS"', b'"class":"TPV"', b'"class":"SKY"')
+
+
+class GpsdReader(threading.Thread):
+    """Background gpsd connection feeding ring buffers for the live panel"""
+
+    def __init__(self, host=GPSD_HOST, port=GPSD_PORT, history=HISTORY):
+        super().__init__(daemon=True)
+        self.host = host
+        self.port = port
+        self.lock = threading.Lock()
+        self.offsets = deque(maxlen=history)   # PPS offset (ns) per pulse
+        self.used = deque(maxlen=history)      # uSat per SKY report
+        self.fix_mode = 0
+        self.visible = None
+        self.connected = False
+        self.error = None
+        self.version = 0                       # Bumped on every update
+        self._stop_event = threading.Event()
+        self._sock = None
+
+    def run(self):
+        """Read reports until stopped, reconnecting whenever gpsd goes away"""
+        while not self._stop_event.is_set():
+            try:
+                self._session()
+            except Exception as e:
+                # Includes a report with unexpected field types: start over on a
+                # fresh connection rather than let the reader thread die
+                self._sock = None
+                self._set_status(False, str(e) or repr(e))
+            self._stop_event.wait(RECONNECT_DELAY)
+
+    def stop(self):
+        """Ask the thread to exit and unblock any pending read"""
+        self._stop_event.set()
+        sock = self._sock
+        if sock is not None:
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+    def _set_status(self, connected, error=None):
+        with self.lock:
+            self.connected = connected
+            self.error = error
+            self.version += 1
+
+    def _session(self):
+        """Run one WATCH connection until gpsd closes it"""
+        with socket.create_connection((self.host, self.port), timeout=5) as sock:
+            self._sock = sock
+            sock.settimeout(None)
+            sock.sendall(WATCH_COMMAND)
+            self._set_status(True)
+            with sock.makefile("rb") as lines:
+                for line in lines:
+                    if self._stop_event.is_set():
+                        break
+                    if any(tag in line for tag in WANTED_CLASSES):
+                        self._handle(line)
+            self._sock = None
+        self._set_status(False, "gpsd closed the connection")
+
+    def _handle(self, line):
+        """Fold one report into the buffers"""
+        try:
+            record = json.loads(line)
+        except ValueError:
+            return
+        if not isinstance(record, dict):
+            return
+        entry_class = record.get("class")
+        with self.lock:
+            if entry_class == "PPS":
+                offset = ((record.get("clock_sec", 0) - record.get("real_sec", 0)) * 1_000_000_000
+                          + record.get("clock_nsec", 0) - record.get("real_nsec", 0))
+                self.offsets.append(offset)
+            elif entry_class == "TPV":
+                self.fix_mode = record.get("mode", 0)
+            elif entry_class == "SKY":
+                satellites = record.get("satellites") or []
+                used = record.get("uSat", sum(1 for sat in satellites if sat.get("used")))
+                self.visible = record.get("nSat", len(satellites))
+                self.used.append(used)
+            else:
+                return
+            self.version += 1
+
+    def snapshot(self):
+        """Return a consistent copy of the current state"""
+        with self.lock:
+            return {
+                "version": self.version,
+                "connected": self.connected,
+                "error": self.error,
+                "fix_mode": self.fix_mode,
+                "visible": self.visible,
+                "offsets": list(self.offsets),
+                "used": list(self.used),
+            }
+
+
+class Sparkline:
+    """Line plot on a Tk canvas that is updated in place"""
+
+    def __init__(self, parent, title, height=110):
+        self.frame = ttk.LabelFrame(parent, text=title, padding=4)
+        self.canvas = tk.Canvas(self.frame, height=height, background="white", highlightthickness=0)
+        self.canvas.pack(fill=tk.BOTH, expand=True)
+        self.line = self.canvas.create_line(0, 0, 0, 0, fill="#1f77b4", width=1)
+        self.zero = self.canvas.create_line(0, 0, 0, 0, fill="#cccccc", dash=(2, 2))
+        self.top_label = self.canvas.create_text(4, 2, anchor=tk.NW, fill="#555555", font=("Helvetica", 8))
+        self.bottom_label = self.canvas.create_text(4, height - 2, anchor=tk.SW, fill="#555555",
+                                                    font=("Helvetica", 8))
+
+    def draw(self, values, unit=""):
+        """Redraw the trace from a list of values"""
+        width = max(self.canvas.winfo_width(), 2)
+        height = max(self.canvas.winfo_height(), 2)
+        if len(values) < 2:
+            self.canvas.coords(self.line, 0, 0, 0, 0)
+            return
+        low = min(values)
+        high = max(values)
+        if high == low:
+            high += 1
+            low -= 1
+        x_step = (width - 1) / (len(values) - 1)
+        y_scale = (height - 4) / (high - low)
+        coords = []
+        for i, value in enumerate(values):
+            coords.append(i * x_step)
+            coords.append(height - 2 - (value - low) * y_scale)
+        self.canvas.coords(self.line, *coords)
+        if low < 0 < high:
+            y = height - 2 - (0 - low) * y_scale
+            self.canvas.coords(self.zero, 0, y, width, y)
+        else:
+            self.canvas.coords(self.zero, 0, 0, 0, 0)
+        self.canvas.itemconfigure(self.top_label, text=f"{high:g}{unit}")
+        self.canvas.coords(self.bottom_label, 4, height - 2)
+        self.canvas.itemconfigure(self.bottom_label, text=f"{low:g}{unit}")
+
+
+class LivePanel(ttk.Frame):
+    """Live PPS offset, satellites used and fix status"""
+
+    def __init__(self, parent, reader):
+        super().__init__(parent)
+        self.reader = reader
+        self._drawn_version = -1
+
+        status = ttk.Frame(self)
+        status.pack(fill=tk.X, pady=(0, 6))
+        self.connection_label = ttk.Label(status, text="Connecting to gpsd...")
+        self.connection_label.pack(side=tk.LEFT)
+        self.fix_label = ttk.Label(status, text="", font=("Helvetica", 11, "bold"))
+        self.fix_label.pack(side=tk.RIGHT)
+
+        readouts = ttk.Frame(self)
+        readouts.pack(fill=tk.X)
+        self.offset_label = ttk.Label(readouts, text="PPS offset: -")
+        self.offset_label.pack(side=tk.LEFT)
+        self.sats_label = ttk.Label(readouts, text="Satellites: -")
+        self.sats_label.pack(side=tk.RIGHT)
+
+        self.offset_plot = Sparkline(self, "PPS offset (ns)")
+        self.offset_plot.frame.pack(fill=tk.BOTH, expand=True, pady=4)
+        self.used_plot = Sparkline(self, "Satellites used")
+        self.used_plot.frame.pack(fill=tk.BOTH, expand=True, pady=4)
+
+        self.after(FRAME_INTERVAL_MS, self.refresh)
+
+    def refresh(self):
+        """Redraw if the reader has new data, then schedule the next frame"""
+        state = self.reader.snapshot()
+        if state["version"] != self._drawn_version:
+            self._drawn_version = state["version"]
+            self._draw(state)
+        self.after(FRAME_INTERVAL_MS, self.refresh)
+
+    def _draw(self, state):
+        if state["connected"]:
+            self.connection_label.config(text=f"gpsd {self.reader.host}:{self.reader.port}")
+        else:
+            self.connection_label.config(text=f"gpsd unavailable: {state['error'] or 'connecting'}")
+        self.fix_label.config(text=FIX_MODES.get(state["fix_mode"], f"Mode {state['fix_mode']}"),
+                              foreground="#2ca02c" if state["fix_mode"] >= 2 else "#d62728")
+
+        offsets = state["offsets"]
+        if offsets:
+            self.offset_label.config(text=f"PPS offset: {offsets[-1] / 1000:.3f} µs")
+        used = state["used"]
+        if used:
+            self.sats_label.config(text=f"Satellites: {used[-1]} used / {state['visible']} visible")
+        self.offset_plot.draw(offsets)
+        self.used_plot.draw(used)
+
+
+def run_in_background(root, function, on_done):
+    """Run ``function`` on a worker thread and pass its result to ``on_done`` on the Tk thread
+
+    ``on_done`` receives ``(result, error)``.
+    """
+    results = queue.Queue(maxsize=1)
+
+    def worker():
+        try:
+            results.put((function(), None))
+        except Exception as e:
+            results.put((None, e))
+
+    def poll():
+        try:
+            result, error = results.get_nowait()
+        except queue.Empty:
+            root.after(POLL_INTERVAL_MS, poll)
+            return
+        on_done(result, error)
+
+    threading.Thread(target=worker, daemon=True).start()
+    root.after(POLL_INTERVAL_MS, poll)
+
+
+def main(argv=None):
+    """Launch the GPS monitor window"""
+    parser = argparse.ArgumentParser(description="PTP time server GPS monitor")
+    parser.add_argument("--host", default=GPSD_HOST, help="gpsd host")
+    parser.add_argument("--port", type=int, default=GPSD_PORT, help="gpsd port")
+    args = parser.parse_args(argv)
+
     print("Starting GPS GUI Launcher...")
-    
+
     # Create the main application window
     root = tk.Tk()
     root.title("PTP Time Server GPS Monitor")
-    root.geometry("400x300")
-    
+    root.geometry("560x620")
+
     # Set up the frame
     main_frame = ttk.Frame(root, padding="20")
     main_frame.pack(fill=tk.BOTH, expand=True)
-    
+
     # Add a title label
     title_label = ttk.Label(
         main_frame,
         text="PTP Time Server GPS Interface",
         font=("Helvetica", 16)
     )
-    title_label.pack(pady=20)
-    
-    # Add description
-    desc_label = ttk.Label(
-        main_frame,
-        text="Launch PyGPSClient to interact with GPS data",
-        wraplength=350
-    )
-    desc_label.pack(pady=10)
-    
+    title_label.pack(pady=(0, 10))
+
+    # Live data from gpsd, read on a background thread
+    reader = GpsdReader(args.host, args.port)
+    reader.start()
+    live_panel = LivePanel(main_frame, reader)
+    live_panel.pack(fill=tk.BOTH, expand=True)
+
+    buttons = ttk.Frame(main_frame)
+    buttons.pack(pady=(10, 0))
+
     # Add a button to launch the full pygpsclient GUI
     launch_button = ttk.Button(
-        main_frame, 
+        buttons,
         text="Launch PyGPSClient GUI",
         command=launch_pygpsclient_gui,
         width=25
     )
-    launch_button.pack(pady=20)
-    
+    launch_button.pack(side=tk.LEFT, padx=5)
+
     # Add a button to check GPSD status
     status_button = ttk.Button(
-        main_frame, 
+        buttons,
         text="Check GPSD Status",
-        command=check_gpsd_status,
         width=25
     )
-    status_button.pack(pady=10)
-    
+    status_button.config(command=lambda: check_gpsd_status(root, status_button))
+    status_button.pack(side=tk.LEFT, padx=5)
+
+    def on_close():
+        reader.stop()
+        root.destroy()
+
+    root.protocol("WM_DELETE_WINDOW", on_close)
+
     # Start the main loop
     root.mainloop()
 
@@ -68,34 +335,49 @@ def launch_pygpsclient_gui():
     except Exception as e:
         messagebox.showerror("Error", f"Failed to launch PyGPSClient GUI: {str(e)}")
 
-def check_gpsd_status():
-    """Check if GPSD is running and show status"""
-    try:
+def check_gpsd_status(root, button=None):
+    """Check if GPSD is running and show status
+
+    systemctl runs on a worker thread; the result window is opened from
+    the Tk thread once it finishes.
+    """
+    if button is not None:
+        button.config(state=tk.DISABLED)
+
+    def query():
         # This will work on Linux systems with systemd
-        result = subprocess.run(["systemctl", "status", "gpsd"], 
-                               capture_output=True, text=True)
-        status_window = tk.Toplevel()
+        return subprocess.run(["systemctl", "status", "gpsd"],
+                              capture_output=True, text=True, timeout=10)
+
+    def show(result, error):
+        if button is not None:
+            button.config(state=tk.NORMAL)
+        if error is not None:
+            # If the command fails (e.g., on macOS or if systemctl is not available)
+            messagebox.showinfo("GPSD Status",
+                               "Could not check GPSD status using systemctl.\n\n"
+                               "If you're running on the Raspberry Pi:\n"
+                               "1. Make sure GPSD is installed and running\n"
+                               "2. Check if GPS device is connected to /dev/ttyACM0\n"
+                               "3. Verify GPSD configuration in /etc/default/gpsd")
+            return
+
+        status_window = tk.Toplevel(root)
         status_window.title("GPSD Status")
         status_window.geometry("500x400")
-        
+
         status_text = tk.Text(status_window, wrap=tk.WORD)
         status_text.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
-        
+
         if result.returncode == 0:
             status_text.insert(tk.END, "GPSD is running\n\n")
         else:
             status_text.insert(tk.END, "GPSD may not be running\n\n")
-        
+
         status_text.insert(tk.END, result.stdout)
         status_text.config(state=tk.DISABLED)
-    except Exception as e:
-        # If the command fails (e.g., on macOS or if systemctl is not available)
-        messagebox.showinfo("GPSD Status", 
-                           "Could not check GPSD status using systemctl.\n\n"
-                           "If you're running on the Raspberry Pi:\n"
-                           "1. Make sure GPSD is installed and running\n"
-                           "2. Check if GPS device is connected to /dev/ttyACM0\n"
-                           "3. Verify GPSD configuration in /etc/default/gpsd")
+
+    run_in_background(root, query, show)
 
 if __name__ == "__main__":
     main()